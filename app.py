@@ -2,19 +2,30 @@ import streamlit as st
 import os
 import re
 from dotenv import load_dotenv
-from tavily import TavilyClient
-from google import genai
-import json
-from pptx import Presentation
-from pptx.util import Inches, Pt
-from pptx.dml.color import RGBColor
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
-from email.mime.text import MIMEText
-from email import encoders
-import tempfile
 import logging
+import time
+import copy
+import uuid
+from research_pipeline import run_research, run_gather_context, regenerate_section, SECTION_BRIEFS
+from jobs import get_job_manager
+from pptx_builder import build_deck, deck_signature, get_deck_cache, DEFAULT_THEME
+from knowledge_base import get_knowledge_base
+from draft_parser import build_full_draft, parse_draft, draft_sections, replace_section, PROPOSAL_SECTION_KEYS, SECTION_ALIASES
+from contacts import extract_contacts
+from email_generator import generate_emails
+from teams_generator import generate_team_chat
+from mailer import get_mailer
+from store import DEFAULT_REOPEN_MAX_AGE_HOURS, get_store
+from themes import resolve_theme, theme_stats, ThemeError
+from thread_summary import summary_stats
+from session_memory import archive_drafts, compact_session, decompress_text, session_size, state_fingerprint
+from rate_limit import limiter_stats
+from clients import client_stats
+from cache import get_response_cache, get_search_cache
+from tracing import start_span, span, traced, histograms, export_json
+
+# Seconds between reruns while a background job is pending
+JOB_POLL_INTERVAL = 0.75
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -23,9 +34,13 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
-# Mock Data
-MOCK_EMAIL = "Subject: CRM Issues. From: John @ [Prospect]. Hi, we are struggling with data silos. Our current tool is too slow."
-MOCK_TRANSCRIPT = "Teams Meeting: We need AI features. Budget is around $50k/year. Need implementation in Q1."
+# Every script run is one trace; helpers below record their stages as child spans
+rerun_span = start_span("streamlit.rerun", root=True)
+
+def rerun():
+    """st.rerun() that first closes this run's span."""
+    rerun_span.end()
+    st.rerun()
 
 # Page configuration
 st.set_page_config(
@@ -92,6 +107,22 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Conversation ID in the URL, so a reload restores the session from the proposal store
+if "conversation_id" not in st.session_state:
+    st.session_state.conversation_id = st.query_params.get("c") or uuid.uuid4().hex[:12]
+    st.query_params["c"] = st.session_state.conversation_id
+    saved_conversation = get_store().load_conversation(st.session_state.conversation_id)
+    if saved_conversation:
+        st.session_state.messages = saved_conversation["messages"]
+        st.session_state.message_seq = saved_conversation["message_seq"]
+        st.session_state.company_data = saved_conversation["company_data"]
+        snapshot = get_store().research(saved_conversation["company_data"].get("research_id"))
+        if snapshot is not None:
+            research = snapshot.load()
+            st.session_state.company_data["research_context"] = research["research_context"]
+            st.session_state.company_emails = research["emails"]
+            st.session_state.company_chats = research["chats"]
+
 # Initialize Session State
 if "messages" not in st.session_state:
     st.session_state.messages = []
@@ -101,16 +132,12 @@ if "company_data" not in st.session_state:
         "name": "",
         "full_draft": "",
         "edited_full_draft": "",
-        "ppt_theme": {
-            "bg_color": [243, 242, 241],
-            "title_color": [0, 120, 212],
-            "body_color": [50, 49, 48],
-            "accent_color": [0, 120, 212]
-        }
+        "ppt_theme": copy.deepcopy(DEFAULT_THEME)
     }
 
+# Uploads this session has already indexed (the file uploader keeps its file across reruns)
 if "uploaded_files" not in st.session_state:
-    st.session_state.uploaded_files = ["Company_Overview.pdf", "Pricing_Tier_2025.pptx"]
+    st.session_state.uploaded_files = []
 
 if "view_mode" not in st.session_state:
     st.session_state.view_mode = "main"  # or "email_view" or "chat_view"
@@ -133,137 +160,196 @@ if "last_sent_recipients" not in st.session_state:
 if "last_sent_message_id" not in st.session_state:
     st.session_state.last_sent_message_id = None
 
+if "send_batches" not in st.session_state:
+    st.session_state.send_batches = {}  # message id -> delivery batch id
+
 if "selected_recipients" not in st.session_state:
     st.session_state.selected_recipients = []
 
-# Helper Functions
-def research_company(name, emails=None, chats=None):
-    """Research company using Tavily and generate proposal content using the new Gemini SDK."""
-    try:
-        tavily = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
-        client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-
-        # 1. Search Tavily
-        logger.info(f"Searching Tavily for {name}...")
-        search_query = f"{name} strategic goals 2025 financial challenges recent news"
-        search_result = tavily.search(query=search_query, search_depth="advanced")
-        context = search_result.get("results", [])
-        
-        # 2. Format emails for context
-        email_context = ""
-        if emails:
-            email_summaries = []
-            for e in emails[:5]:  # Use up to 5 emails
-                email_summaries.append(f"From {e['sender']} ({e['date']}): {e['subject']}\n{e['body'][:300]}...")
-            email_context = "\n\n".join(email_summaries)
-        else:
-            email_context = MOCK_EMAIL
-        
-        # 3. Format Teams chat for context
-        chat_context = ""
-        if chats and len(chats) > 0:
-            chat = chats[0]
-            chat_messages = []
-            for m in chat['messages']:
-                chat_messages.append(f"{m['sender']} ({m['timestamp']}): {m['content']}")
-            chat_context = "\n".join(chat_messages)
-        else:
-            chat_context = MOCK_TRANSCRIPT
+if "research_job_id" not in st.session_state:
+    # Picks a running/finished research job back up after a browser refresh
+    st.session_state.research_job_id = st.query_params.get("job")
 
-        # 4. Generate Content with Gemini
-        logger.info(f"Generating proposal for {name} using Gemini (gemini-2.0-flash)...")
-        prompt = f"""
-        You are writing a sales proposal from 'NexusCRM' (a CRM software company) to {name}.
-        
-        Context gathered:
-        - Web Research: {json.dumps(context)}
-        - Recent Email Communications:
-{email_context}
-        
-        - Teams Discussion:
-{chat_context}
-        
-        Based on this information, draft a sales proposal with 3 distinct sections.
-        The values for each key MUST be a plain string (markdown formatted), NOT a nested JSON object.
-        
-        1. **Executive Summary**: Brief overview addressing their pain points (data silos, speed issues).
-        2. **The NexusCRM Solution**: How our AI-powered CRM can help with their specific needs.
-        3. **Investment**: Pricing proposal aligned with their ~$50k/year budget, including implementation timeline for Q1.
+if "deck_jobs" not in st.session_state:
+    st.session_state.deck_jobs = {}  # message id -> (deck signature, job id)
+
+if "message_seq" not in st.session_state:
+    # Message ids stay unique after old messages are dropped from the history
+    st.session_state.message_seq = len(st.session_state.messages)
 
-        Return the output strictly as a JSON object with keys: "executive_summary", "solution", "pricing".
-        """
+# Set while rendering when a background job still needs polling
+needs_poll = False
 
-        response = client.models.generate_content(
-            model='gemini-2.0-flash',
-            contents=prompt
+# Helper Functions
+def research_company(name, emails=None, chats=None, refresh=False, on_update=None):
+    """
+    Research company using Tavily and generate proposal content using the new Gemini SDK.
+
+    Errors left after the rate limiter's retries propagate, so the job fails and
+    the error is shown in the chat instead of becoming the draft.
+    """
+    return run_research(name, emails, chats, refresh=refresh, on_update=on_update)
+
+def research_job(job, company_name, refresh=False):
+    """Background job: discover emails/chats for the company and research it."""
+    emails = generate_emails(company_name)
+    chats = [generate_team_chat(company_name)]
+    job.set_progress({"name": company_name, "emails": len(emails), "chats": len(chats), "sections": {}})
+
+    def on_update(sections):
+        job.set_progress({"name": company_name, "emails": len(emails), "chats": len(chats), "sections": sections})
+
+    results = research_company(company_name, emails, chats, refresh=refresh, on_update=on_update)
+    return {"name": company_name, "emails": emails, "chats": chats, "results": results}
+
+def section_job(job, company_name, section_key, sections, research_context, instructions="", emails=None, chats=None):
+    """Background job: regenerate one proposal section against the cached research context."""
+    if not research_context:
+        research_context = run_gather_context(company_name, emails, chats)
+
+    def on_update(text):
+        job.set_progress({"name": company_name, "section": section_key, "text": text})
+
+    text = regenerate_section(company_name, section_key, sections, research_context, instructions, on_update=on_update)
+    return {"name": company_name, "section": section_key, "text": text, "research_context": research_context}
+
+def next_message_id():
+    st.session_state.message_seq += 1
+    return st.session_state.message_seq
+
+def set_draft(new_draft):
+    """Replace the edited draft and reset editor widgets so they pick up the new text."""
+    st.session_state.company_data["edited_full_draft"] = new_draft
+    for key in [k for k in st.session_state if str(k).startswith("full_draft_")]:
+        del st.session_state[key]
+
+def collect_research_job():
+    """Apply a finished research job to the session; returns the job if it is still pending."""
+    job_id = st.session_state.research_job_id
+    if not job_id:
+        return None
+    job = get_job_manager().get(job_id)
+    if job is None:
+        # Expired or from a previous server process
+        st.session_state.research_job_id = None
+        st.query_params.pop("job", None)
+        return None
+    if not job.done:
+        return job
+
+    st.session_state.research_job_id = None
+    st.query_params.pop("job", None)
+
+    if job.status == "done" and job.kind == "section":
+        payload = job.result
+        title = PROPOSAL_SECTION_KEYS[payload["section"]]
+        st.session_state.company_data["research_context"] = payload["research_context"]
+        set_draft(replace_section(st.session_state.company_data["edited_full_draft"], title, payload["text"]))
+        get_store().save_draft(
+            payload["name"], st.session_state.company_data["edited_full_draft"],
+            source="section", conversation_id=st.session_state.conversation_id,
+        )
+        st.session_state.messages.append({
+            "role": "assistant",
+            "content": f"♻️ I've rewritten the **{title}** section in the draft above. The other sections are unchanged."
+        })
+    elif job.status == "done":
+        payload = job.result
+        research_results = payload["results"]
+        st.session_state.company_data["name"] = payload["name"]
+        st.session_state.company_data["research_context"] = research_results.pop("research_context", None)
+        st.session_state.company_emails = payload["emails"]
+        st.session_state.company_chats = payload["chats"]
+
+        # Older editors keep a compressed copy of the draft they were showing
+        archive_drafts(st.session_state.messages, st.session_state.company_data)
+        full_draft = build_full_draft(research_results)
+        st.session_state.company_data["full_draft"] = full_draft
+        st.session_state.company_data["edited_full_draft"] = full_draft
+        st.session_state.company_data["research_id"] = get_store().save_research(
+            payload["name"], payload["emails"], payload["chats"],
+            st.session_state.company_data["research_context"], research_results,
+            conversation_id=st.session_state.conversation_id,
+        )
+        get_store().save_draft(
+            payload["name"], full_draft, source="research", conversation_id=st.session_state.conversation_id
         )
-        content = response.text
-        logger.info(f"Raw AI Response: {content}")
-        
-        if content.startswith("```json"):
-            content = content.replace("```json", "").replace("```", "")
-        if content.startswith("```"):
-            content = content.replace("```", "")
-            
-        data = json.loads(content)
-        
-        # Ensure all values are strings (prevent nested JSON appearing in UI)
-        for key in ["executive_summary", "solution", "pricing"]:
-            if isinstance(data.get(key), (dict, list)):
-                data[key] = json.dumps(data[key], indent=2)
-                
-        logger.info("Successfully parsed and cleaned response.")
-        return data
-
-    except Exception as e:
-        logger.error(f"Error in research_company: {str(e)}", exc_info=True)
-        st.error(f"NexusCRM Agent Error: {e}")
-        return {
-            "executive_summary": f"Research/AI Error: {str(e)}",
-            "solution": "Check your .env for Tavily/Gemini API keys.",
-            "pricing": "Internal Error."
-        }
 
-def extract_contacts(emails, chats):
-    """Extract unique contacts from emails and Teams chats."""
-    contacts = []
-    
-    # Extract from emails
-    for email in emails:
-        sender = email['sender']
-        # Parse email to get name and address
-        if '@' in sender:
-            name_part = sender.split('@')[0].replace('.', ' ').title()
-            contacts.append({
-                'email': sender,
-                'name': name_part,
-                'source': 'Email'
-            })
-    
-    # Extract from Teams chat participants
-    if chats:
-        for chat in chats:
-            for participant in chat.get('participants', []):
-                # Extract name from "Name (Role)" format
-                name = participant.split('(')[0].strip()
-                # Generate email from name
-                email_name = name.lower().replace(' ', '.')
-                company_domain = st.session_state.company_data.get('name', 'company').lower().replace(' ', '').replace(',', '')
-                contacts.append({
-                    'email': f"{email_name}@{company_domain}.com",
-                    'name': name,
-                    'source': 'Teams Chat'
-                })
-    
-    # Remove duplicates based on email
-    seen = set()
-    unique_contacts = []
-    for contact in contacts:
-        if contact['email'] not in seen:
-            seen.add(contact['email'])
-            unique_contacts.append(contact)
-    
-    return unique_contacts
+        st.session_state.messages.append({
+            "role": "assistant",
+            "content": f"I've gathered insights on **{payload['name']}** from web research, your email/Teams history, and the knowledge base. Here's a draft proposal - please review and edit:",
+            "show_editor": True,
+            "company": payload["name"],
+            "id": next_message_id()
+        })
+    elif job.status == "cancelled":
+        st.session_state.messages.append({"role": "assistant", "content": "Research cancelled."})
+    else:
+        company_name = (job.progress or {}).get("name") or st.session_state.company_data.get("name", "")
+        action = "rewrite the section" if job.kind == "section" else "complete research"
+        st.session_state.messages.append({
+            "role": "assistant",
+            "content": f"NexusCRM Agent Error: unable to {action} for **{company_name}**: {job.error}",
+            "error": True,
+        })
+    return None
+
+def render_research_status(job):
+    """Show progress of the pending research job, including any streamed sections."""
+    progress = job.progress or {}
+    company_name = progress.get("name", st.session_state.company_data.get("name", ""))
+    if job.kind == "section":
+        section_label = SECTION_BRIEFS[progress["section"]][0] if "section" in progress else "section"
+        st.info(f"✍️ Rewriting the {section_label} section for {company_name}...")
+        if progress.get("text"):
+            st.markdown(progress["text"])
+    else:
+        st.info(f"🔍 Researcher: Searching Web, your emails and chats for details on {company_name}...")
+    if "emails" in progress:
+        st.write(f"**Found {progress['emails']} emails and {progress['chats']} group chat**")
+        st.write(f"**Analyzing {get_knowledge_base().stats()['documents']} knowledge base files...**")
+    if progress.get("sections"):
+        render_streaming_draft(st.container(), progress["sections"])
+    if job.cancel_requested:
+        st.caption("Cancelling...")
+    elif st.button("Cancel", key=f"cancel_job_{job.id}"):
+        get_job_manager().cancel(job.id)
+        rerun()
+
+def deck_for(message_id):
+    """
+    Return (deck_bytes, None) when the current deck is cached, otherwise (None, job)
+    for the background render, resubmitting when the draft/theme changed.
+    """
+    data = st.session_state.company_data
+    signature = deck_signature(data)
+    deck = get_deck_cache().get(signature)
+    if deck is None:
+        # Decks rendered before a restart (or by another worker) are on disk
+        deck = get_store().deck(signature)
+        if deck is not None:
+            get_deck_cache().put(signature, deck)
+    if deck is not None:
+        return deck, None
+    entry = st.session_state.deck_jobs.get(message_id)
+    job = get_job_manager().get(entry[1]) if entry and entry[0] == signature else None
+    if job is None:
+        snapshot = copy.deepcopy(data)
+        job = get_job_manager().submit("pptx", lambda job: generate_pptx(snapshot))
+        st.session_state.deck_jobs[message_id] = (signature, job.id)
+    return None, job
+
+def render_streaming_draft(placeholder, sections):
+    """Show the sections received so far while the proposal streams in."""
+    with placeholder.container():
+        st.subheader("Edit Proposal Draft")
+        st.caption("Drafting... sections appear as they are written.")
+        if "executive_summary" in sections:
+            st.markdown(f"## Executive Summary\n{sections['executive_summary']}")
+        if "solution" in sections:
+            st.markdown(f"## Solution\n{sections['solution']}")
+        if "pricing" in sections:
+            st.markdown(f"## Investment\n{sections['pricing']}")
 
 def render_send_modal(message_id):
     """Render the recipient selection modal for sending proposals."""
@@ -278,7 +364,8 @@ def render_send_modal(message_id):
 
     contacts = extract_contacts(
         st.session_state.company_emails,
-        st.session_state.company_chats
+        st.session_state.company_chats,
+        st.session_state.company_data.get('name', 'company')
     )
 
     for i, contact in enumerate(contacts):
@@ -302,13 +389,23 @@ def render_send_modal(message_id):
 
     st.markdown("---")
 
+    # Attach the deck the preview already rendered (or is rendering) instead of building it again
+    deck, deck_job = deck_for(message_id)
+    if deck_job is not None:
+        if deck_job.status == "done":
+            deck = deck_job.result
+        elif deck_job.status == "failed":
+            st.error(f"Error: {deck_job.error}")
+        else:
+            st.caption("⏳ Rendering deck... sending is enabled once it is attached.")
+
     btn_col1, btn_col2, btn_col3 = st.columns([1, 1, 1])
     
     with btn_col1:
         if st.button("Cancel", key=f"cancel_send_{message_id}"):
             st.session_state.show_send_modal = False
             st.session_state.send_modal_message_id = None
-            st.rerun()
+            rerun()
     
     with btn_col3:
         selected_count = len(st.session_state.selected_recipients)
@@ -317,117 +414,141 @@ def render_send_modal(message_id):
             key=f"confirm_send_{message_id}", 
             type="primary",
             use_container_width=True,
-            disabled=(selected_count == 0)
+            disabled=(selected_count == 0 or deck is None)
         ):
             if st.session_state.selected_recipients:
                 recipients = list(st.session_state.selected_recipients)
+                data = st.session_state.company_data
+                # Delivery runs on the mailer's workers; the preview polls its status
+                batch = get_mailer().send(
+                    recipients,
+                    f"NexusCRM Proposal for {data['name']}",
+                    proposal_email_body(data),
+                    attachment=deck,
+                    filename=f"NexusCRM_Proposal_{data['name']}.pptx",
+                    on_result=lambda batch_id, email, state, name=data['name']: get_store().record_send(
+                        name, batch_id, email, state["status"], state["attempts"], state["error"]
+                    )
+                )
+                st.session_state.send_batches[message_id] = batch.id
                 st.session_state.last_sent_recipients = recipients
                 st.session_state.last_sent_message_id = message_id
                 st.session_state.show_send_modal = False
                 st.session_state.send_modal_message_id = None
-                st.rerun()
+                rerun()
+
+def proposal_email_body(data):
+    """Plain-text cover note for the emailed deck."""
+    summary = parse_draft(data.get("edited_full_draft", "")).body("Executive Summary")
+    return (
+        f"Hello,\n\n"
+        f"Please find attached our proposal for {data['name']}.\n\n"
+        f"{summary}\n\n"
+        f"Best regards,\nThe NexusCRM Team"
+    )
 
-def get_theme_update(user_suggestion, current_theme):
-    """Use Gemini to translate a theme suggestion into RGB values."""
-    client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-    prompt = f"""
-    Current PPT Theme (RGB):
-    {json.dumps(current_theme)}
-    
-    User Suggestion: "{user_suggestion}"
-    
-    Translate this suggestion into a new RGB theme. 
-    Return strictly a JSON object with these keys:
-    - bg_color: [R, G, B]
-    - title_color: [R, G, B]
-    - body_color: [R, G, B]
-    - accent_color: [R, G, B]
+def render_delivery_status(batch):
+    """Per-recipient delivery status of a sent proposal; returns True while delivery is in progress."""
+    icons = {"queued": "⏳", "sending": "📤", "retrying": "🔁", "sent": "✅", "failed": "❌"}
+    statuses = batch.status()
+    counts = batch.counts()
+    sent, total = counts.get("sent", 0), len(statuses)
+    if not batch.done:
+        st.info(f"📤 Sending proposal... {sent}/{total} delivered")
+    elif sent == total:
+        st.success(f"✅ Proposal sent to: {', '.join(statuses)}")
+    else:
+        st.warning(f"Proposal delivered to {sent} of {total} recipients.")
+    for email, state in statuses.items():
+        detail = f" ({state['error']})" if state["error"] and state["status"] != "sent" else ""
+        st.caption(f"{icons[state['status']]} {email}: {state['status']}{detail}")
+    return not batch.done
+
+def reopen_proposal(company_name, shared=False):
     """
-    try:
-        response = client.models.generate_content(
-            model='gemini-2.0-flash',
-            contents=prompt
-        )
-        content = response.text
-        if "```json" in content:
-            content = content.split("```json")[1].split("```")[0]
-        elif "```" in content:
-            content = content.split("```")[1].split("```")[0]
-        return json.loads(content.strip())
-    except:
-        return current_theme
+    Load saved research and its draft for a company; returns False when there is none to reopen.
 
-def generate_pptx(data):
-    """Generate PowerPoint presentation based on content and theme."""
-    prs = Presentation()
-    theme = data.get('ppt_theme', {})
-    
-    def rgb_to_color(rgb_list):
-        return RGBColor(rgb_list[0], rgb_list[1], rgb_list[2])
+    By default only research made in this conversation within SPG_REOPEN_MAX_AGE_HOURS
+    is reopened, with this conversation's latest draft. `shared` (an explicit
+    "@SPG reopen") takes the latest research and draft saved from any conversation.
+    """
+    store = get_store()
+    conversation_id = None if shared else st.session_state.conversation_id
+    max_age_hours = None if shared else float(os.getenv("SPG_REOPEN_MAX_AGE_HOURS", DEFAULT_REOPEN_MAX_AGE_HOURS))
+    with span("store.reopen", company=company_name, shared=shared):
+        snapshot = store.latest_research(company_name, conversation_id, max_age_hours)
+        draft = store.latest_draft(company_name, conversation_id) if snapshot else None
+        if draft is None:
+            return False
+        research = snapshot.load()
+        text = draft.load()
+
+    archive_drafts(st.session_state.messages, st.session_state.company_data)
+    data = st.session_state.company_data
+    data["name"] = company_name
+    data["research_id"] = snapshot.key
+    data["research_context"] = research["research_context"]
+    data["full_draft"] = build_full_draft(research["results"])
+    set_draft(text)
+    st.session_state.company_emails = research["emails"]
+    st.session_state.company_chats = research["chats"]
+    st.session_state.messages.append({
+        "role": "assistant",
+        "content": (
+            f"I've reopened your saved proposal for **{company_name}** (draft v{draft.version}, researched "
+            f"{time.strftime('%b %d', time.localtime(snapshot.created))}). Use `@SPG refresh proposal for "
+            f"{company_name}` to research it again."
+        ),
+        "show_editor": True,
+        "company": company_name,
+        "id": next_message_id()
+    })
+    return True
+
+def persist_session():
+    """Save a new draft version and the conversation when they changed since the last run."""
+    data = st.session_state.company_data
+    if data.get("name") and data.get("edited_full_draft"):
+        get_store().save_draft(data["name"], data["edited_full_draft"], conversation_id=st.session_state.conversation_id)
+    if st.session_state.messages:
+        state = {
+            "messages": st.session_state.messages,
+            "message_seq": st.session_state.message_seq,
+            "company_data": {k: v for k, v in data.items() if k != "research_context"},
+        }
+        # Packing the whole conversation is the expensive part, so skip it on reruns that changed nothing
+        fingerprint = state_fingerprint(state)
+        if fingerprint == st.session_state.get("conversation_fingerprint"):
+            return
+        st.session_state.conversation_digest = get_store().save_conversation(
+            st.session_state.conversation_id,
+            data.get("name"),
+            state,
+            previous=st.session_state.get("conversation_digest"),
+        )
+        st.session_state.conversation_fingerprint = fingerprint
 
-    bg_color = rgb_to_color(theme.get('bg_color', [255, 255, 255]))
-    title_color = rgb_to_color(theme.get('title_color', [0, 120, 212]))
-    body_color = rgb_to_color(theme.get('body_color', [0, 0, 0]))
+def get_theme_update(user_suggestion, current_theme):
+    """Translate a theme suggestion into RGB values; returns None (with a warning shown) if it can't be applied."""
+    try:
+        return resolve_theme(user_suggestion, current_theme)
+    except ThemeError as e:
+        logger.warning(f"Theme suggestion {user_suggestion!r} failed: {e}")
+        st.warning("Couldn't turn that suggestion into a theme. Try naming colours, e.g. \"navy with gold accents\".")
+        return None
 
-    def add_slide(title_text, content_text):
-        slide_layout = prs.slide_layouts[1]
-        slide = prs.slides.add_slide(slide_layout)
-        
-        # Set background
-        background = slide.background
-        fill = background.fill
-        fill.solid()
-        fill.fore_color.rgb = bg_color
-        
-        title = slide.shapes.title
-        title.text = title_text
-        title.text_frame.paragraphs[0].font.color.rgb = title_color
-        title.text_frame.paragraphs[0].font.bold = True
-        
-        content = slide.placeholders[1]
-        content.text = content_text
-        # Optional: Set body color if needed (more complex to iterate all runs)
-
-    # Parsing logic
-    draft = data.get('edited_full_draft', '')
-    sections = {}
-    current_key = "Executive Summary"
-    for line in draft.split('\n'):
-        if re.match(r'^(#|##|\*\*)\s*(Executive Summary|Understanding)', line, re.I):
-            current_key = "Executive Summary"
-            sections[current_key] = ""
-        elif re.match(r'^(#|##|\*\*)\s*(Solution|The Nexus)', line, re.I):
-            current_key = "Solution"
-            sections[current_key] = ""
-        elif re.match(r'^(#|##|\*\*)\s*(Investment|Pricing)', line, re.I):
-            current_key = "Investment"
-            sections[current_key] = ""
-        else:
-            if current_key:
-                sections[current_key] = sections.get(current_key, "") + line + "\n"
-
-    # Slide 1: Title
-    slide_layout = prs.slide_layouts[0]
-    slide = prs.slides.add_slide(slide_layout)
-    fill = slide.background.fill
-    fill.solid()
-    fill.fore_color.rgb = bg_color
-    
-    title = slide.shapes.title
-    title.text = f"NexusCRM → {data['name']}"
-    title.text_frame.paragraphs[0].font.color.rgb = title_color
-    
-    subtitle = slide.placeholders[1]
-    subtitle.text = "Strategic Proposal for Digital Transformation"
+@traced()
+def generate_pptx(data):
+    """Generate PowerPoint presentation based on content and theme; returns the .pptx bytes."""
+    deck = build_deck(data)
+    get_store().save_deck(data["name"], deck_signature(data), deck)
+    return deck
 
-    # slides 2-4
-    add_slide("Understanding Your Needs", sections.get("Executive Summary", "Details in full draft."))
-    add_slide("The NexusCRM Solution", sections.get("Solution", "Details in full draft."))
-    add_slide("Investment/Pricing", sections.get("Investment", "Details in full draft."))
+# Collect finished background research before rendering
+pending_research = collect_research_job()
 
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pptx")
-    prs.save(temp_file.name)
-    return temp_file.name
+# Collapse old editors/previews and trim the history before rendering it
+compact_session(st.session_state)
 
 # Main Layout: Two Columns
 chat_col, right_panel = st.columns([0.7, 0.3])
@@ -446,12 +567,12 @@ with right_panel:
         st.success(f"📧 {len(st.session_state.company_emails)} emails found")
         if st.button("View Emails", key="view_emails_btn", use_container_width=True):
             st.session_state.view_mode = "email_view"
-            st.rerun()
+            rerun()
         
         st.success(f"💬 {len(st.session_state.company_chats)} group chat found")
         if st.button("View Chat", key="view_chat_btn", use_container_width=True):
             st.session_state.view_mode = "chat_view"
-            st.rerun()
+            rerun()
     else:
         # Default state before search
         st.info("✅ Outlook - Active")
@@ -469,11 +590,80 @@ with right_panel:
     
     if uploaded_file:
         if uploaded_file.name not in st.session_state.uploaded_files:
-            st.session_state.uploaded_files.append(uploaded_file.name)
+            with st.spinner(f"Indexing {uploaded_file.name}..."):
+                try:
+                    added = get_knowledge_base().add_document(uploaded_file.name, uploaded_file.getvalue())
+                    st.session_state.uploaded_files.append(uploaded_file.name)
+                    if added:
+                        st.caption(f"Indexed {added} passages from {uploaded_file.name}")
+                except Exception as e:
+                    logger.error(f"Failed to index {uploaded_file.name}: {e}", exc_info=True)
+                    st.error(f"Could not index {uploaded_file.name}: {e}")
     
+    kb = get_knowledge_base()
+    kb_stats = kb.stats()
     st.markdown("**Active Files:**")
-    for file in st.session_state.uploaded_files:
+    documents = list(dict.fromkeys(kb.documents()))
+    for file in documents:
         st.markdown(f"- 📄 {file}")
+    if not documents:
+        st.caption("No documents indexed yet.")
+    st.caption(f"Knowledge base: {kb_stats['documents']} documents, {kb_stats['passages']} passages indexed (shared across sessions)")
+    
+    # Optional performance panel (SPG_DEBUG_PANEL=1 or ?debug=1 in the URL)
+    if os.getenv("SPG_DEBUG_PANEL") or st.query_params.get("debug"):
+        st.markdown("---")
+        with st.expander("⏱️ Performance", expanded=False):
+            stages = histograms()
+            if stages:
+                st.dataframe(
+                    [
+                        {"stage": name, "count": h["count"], "errors": h["errors"], "mean ms": round(h["mean_ms"], 1),
+                         "p50 ms": round(h["p50_ms"], 1), "p95 ms": round(h["p95_ms"], 1), "max ms": round(h["max_ms"], 1)}
+                        for name, h in stages.items()
+                    ],
+                    hide_index=True,
+                    use_container_width=True,
+                )
+            else:
+                st.caption("No spans recorded yet.")
+            for provider, stats in limiter_stats().items():
+                st.caption(
+                    f"{provider}: {stats['calls']} calls, {stats['retries']} retries, {stats['throttled']} throttled, "
+                    f"queue wait p95 {stats['queue_wait_p95'] * 1000:.0f} ms"
+                )
+            for provider, stats in client_stats().items():
+                st.caption(
+                    f"{provider} client: {stats['created']} created, {stats['reused']}/{stats['acquired']} reused "
+                    f"({stats['reuse_rate']:.0%}), pool size {stats['pool_size']}"
+                )
+            st.caption(f"Jobs: {get_job_manager().stats()}")
+            store_stats = get_store().stats()
+            st.caption(
+                f"Store: {store_stats['drafts']} draft versions, {store_stats['research']} research snapshots, "
+                f"{store_stats['writes_per_transaction']:.1f} writes per transaction, {store_stats['pending_writes']} pending, "
+                f"{store_stats['pruned']} pruned"
+            )
+            for label, cache in (("Search cache", get_search_cache()), ("Response cache", get_response_cache())):
+                cache_stats = cache.stats()
+                st.caption(
+                    f"{label}: {cache_stats['hits']} hits, {cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%}), "
+                    f"{cache_stats['entries']}/{cache_stats['max_entries']} entries, {cache_stats['evictions']} evicted"
+                )
+            themes = theme_stats()
+            st.caption(
+                f"Themes: {themes['lookups']} lookups, {themes['hit_rate']:.0%} cache hits, "
+                f"{themes['local']} resolved locally, {themes['llm']} via Gemini ({themes['llm_failures']} failed)"
+            )
+            summaries = summary_stats()
+            st.caption(
+                f"Thread summaries: {summaries['briefs']} briefs from {summaries['chunks']} chunks, "
+                f"{summaries['generated']} summaries generated, {summaries['cached']} from cache"
+            )
+            memory = session_size(st.session_state)
+            largest = ", ".join(f"{key} {size / 1024:.1f} KiB" for key, size in list(memory["keys"].items())[:3])
+            st.caption(f"Session memory: {memory['total_bytes'] / 1024:.1f} KiB, {memory['messages']} messages (largest: {largest})")
+            st.download_button("Export traces (JSON)", export_json(), file_name="spg_traces.json", mime="application/json")
     
     st.markdown('</div>', unsafe_allow_html=True)
 
@@ -486,7 +676,7 @@ with chat_col:
         
         if st.button("← Back to Proposal", key="back_from_emails"):
             st.session_state.view_mode = "main"
-            st.rerun()
+            rerun()
         
         st.markdown("---")
         
@@ -509,7 +699,7 @@ with chat_col:
             
             if st.button("← Back to Proposal", key="back_from_chat"):
                 st.session_state.view_mode = "main"
-                st.rerun()
+                rerun()
             
             st.markdown("---")
             st.markdown(f"**Participants:** {', '.join(chat['participants'])}")
@@ -527,11 +717,29 @@ with chat_col:
         st.title("🤖 NexusCRM Sales Proposal Copilot")
     st.markdown("---")
     
+    if st.session_state.get("dropped_messages"):
+        st.caption(f"{st.session_state.dropped_messages} earlier messages were cleared from this conversation.")
+
     # Display chat messages
     for message in st.session_state.messages:
         avatar = "https://upload.wikimedia.org/wikipedia/en/a/aa/Microsoft_Copilot_Icon.svg" if message["role"] == "assistant" else "https://ui-avatars.com/api/?name=User&background=random"
         with st.chat_message(message["role"], avatar=avatar):
-            st.markdown(message["content"])
+            if message.get("error"):
+                st.error(message["content"])
+            else:
+                st.markdown(message["content"])
+
+            # Collapsed proposal: summary plus the archived draft while it is kept
+            if message.get("summary"):
+                st.caption(message["summary"])
+            if message.get("archived_draft") and not message.get("show_editor"):
+                st.download_button(
+                    "📄 Download archived draft (.md)",
+                    decompress_text(message["archived_draft"]),
+                    file_name=f"NexusCRM_Draft_{message.get('archived_company') or 'proposal'}.md",
+                    mime="text/markdown",
+                    key=f"archived_draft_{message.get('id', 0)}"
+                )
             
             # Show draft editor if this message has it
             if message.get("show_editor"):
@@ -550,9 +758,9 @@ with chat_col:
                             "role": "assistant",
                             "content": "Generating your PowerPoint presentation...",
                             "show_download": True,
-                            "id": len(st.session_state.messages)
+                            "id": next_message_id()
                         })
-                        st.rerun()
+                        rerun()
                     
                     st.markdown('</div>', unsafe_allow_html=True)
             
@@ -562,7 +770,12 @@ with chat_col:
                     st.markdown('<div class="draft-container">', unsafe_allow_html=True)
                     st.subheader("PPT Preview & Customization")
 
-                    if (
+                    batch_id = st.session_state.send_batches.get(message.get('id', 0))
+                    batch = get_mailer().get(batch_id) if batch_id else None
+                    if batch is not None:
+                        if render_delivery_status(batch):
+                            needs_poll = True
+                    elif (
                         st.session_state.last_sent_message_id == message.get('id', 0)
                         and st.session_state.last_sent_recipients
                     ):
@@ -572,16 +785,8 @@ with chat_col:
                     # PPT Viewer Simulation
                     tabs = st.tabs(["Slide 1", "Slide 2", "Slide 3", "Slide 4"])
                     
-                    # Render mock slides in tabs
-                    draft_text = st.session_state.company_data["edited_full_draft"]
-                    # (Quick split for preview)
-                    prev_sections = {"Executive Summary": "", "Solution": "", "Investment": ""}
-                    curr = "Executive Summary"
-                    for l in draft_text.split('\n'):
-                        if "Executive Summary" in l: curr = "Executive Summary"
-                        elif "Solution" in l: curr = "Solution"
-                        elif "Investment" in l: curr = "Investment"
-                        else: prev_sections[curr] += l + "\n"
+                    # Render mock slides in tabs (same memoized parse the PPTX builder uses)
+                    parsed_draft = parse_draft(st.session_state.company_data["edited_full_draft"])
 
                     theme = st.session_state.company_data["ppt_theme"]
                     bg_hex = '#%02x%02x%02x' % tuple(theme['bg_color'])
@@ -596,9 +801,9 @@ with chat_col:
                         """
 
                     tabs[0].markdown(slide_style({"title": f"NexusCRM → {st.session_state.company_data['name']}", "body": "Strategic Proposal"}), unsafe_allow_html=True)
-                    tabs[1].markdown(slide_style({"title": "Needs", "body": prev_sections["Executive Summary"]}), unsafe_allow_html=True)
-                    tabs[2].markdown(slide_style({"title": "Solution", "body": prev_sections["Solution"]}), unsafe_allow_html=True)
-                    tabs[3].markdown(slide_style({"title": "Investment", "body": prev_sections["Investment"]}), unsafe_allow_html=True)
+                    tabs[1].markdown(slide_style({"title": "Needs", "body": parsed_draft.body("Executive Summary")}), unsafe_allow_html=True)
+                    tabs[2].markdown(slide_style({"title": "Solution", "body": parsed_draft.body("Solution")}), unsafe_allow_html=True)
+                    tabs[3].markdown(slide_style({"title": "Investment", "body": parsed_draft.body("Investment")}), unsafe_allow_html=True)
 
                     st.markdown("---")
                     theme_suggestion = st.text_input("🎨 Suggest your theme changes", placeholder="e.g. Dark mode with gold accents", key=f"theme_input_{message.get('id', 0)}")
@@ -608,104 +813,122 @@ with chat_col:
                         if theme_suggestion:
                             with st.spinner("Applying theme changes..."):
                                 new_theme = get_theme_update(theme_suggestion, st.session_state.company_data["ppt_theme"])
+                            if new_theme is not None:
                                 st.session_state.company_data["ppt_theme"] = new_theme
-                                st.rerun()
-
-                    pptx_path = None
-                    try:
-                        pptx_path = generate_pptx(st.session_state.company_data)
-                    except Exception as e:
-                        st.error(f"Error: {e}")
-
-                    if pptx_path:
-                        with open(pptx_path, "rb") as f:
-                            cta_download.download_button(
-                                "📥 Download Final (PPTX)",
-                                f,
-                                file_name=f"NexusCRM_Proposal_{st.session_state.company_data['name']}.pptx",
-                                mime="application/vnd.openxmlformats-officedocument.presentationml.presentation",
-                                key=f"download_{message.get('id', 0)}",
-                                use_container_width=True
-                            )
+                                rerun()
+
+                    pptx_bytes, deck_job = deck_for(message.get('id', 0))
+                    if deck_job is not None:
+                        if deck_job.status == "done":
+                            pptx_bytes = deck_job.result
+                        elif deck_job.status == "failed":
+                            st.error(f"Error: {deck_job.error}")
+                        else:
+                            cta_download.caption("⏳ Rendering deck...")
+                            needs_poll = True
+
+                    if pptx_bytes:
+                        cta_download.download_button(
+                            "📥 Download Final (PPTX)",
+                            pptx_bytes,
+                            file_name=f"NexusCRM_Proposal_{st.session_state.company_data['name']}.pptx",
+                            mime="application/vnd.openxmlformats-officedocument.presentationml.presentation",
+                            key=f"download_{message.get('id', 0)}",
+                            use_container_width=True
+                        )
 
                     if cta_send.button("📧 Send Proposal", key=f"send_proposal_preview_{message.get('id', 0)}", type="primary", use_container_width=True):
                         st.session_state.show_send_modal = True
                         st.session_state.send_modal_message_id = message.get('id', 0)
                         contacts = extract_contacts(
                             st.session_state.company_emails,
-                            st.session_state.company_chats
+                            st.session_state.company_chats,
+                            st.session_state.company_data.get('name', 'company')
                         )
                         st.session_state.selected_recipients = [c['email'] for c in contacts]
-                        st.rerun()
+                        rerun()
 
                     render_send_modal(message.get('id', 0))
                     
                     st.markdown('</div>', unsafe_allow_html=True)
 
+    # Pending background research
+    if pending_research:
+        with st.chat_message("assistant", avatar="https://upload.wikimedia.org/wikipedia/en/a/aa/Microsoft_Copilot_Icon.svg"):
+            render_research_status(pending_research)
+        needs_poll = True
+
     # Chat input
     if prompt := st.chat_input("Ask Copilot... (Try: @SPG create proposal for Tesla)"):
         # Add user message
         st.session_state.messages.append({"role": "user", "content": prompt})
         
-        # Check for @SPG trigger
+        # Check for @SPG triggers ("regenerate <section>" is checked first since it may contain "for")
+        regen_match = re.search(
+            r"@SPG\s+(?:regenerate|rewrite|redo)\s+(?:the\s+)?(executive summary|summary|solution|pricing|investment)(?:\s+section)?\s*[:\-–]?\s*(.*)",
+            prompt,
+            re.IGNORECASE
+        )
         spg_match = re.search(r"@SPG.*for\s+(.+)", prompt, re.IGNORECASE)
         
-        if spg_match:
+        if regen_match and not st.session_state.company_data.get("edited_full_draft"):
+            st.session_state.messages.append({
+                "role": "assistant",
+                "content": "There's no draft yet. Start with `@SPG create proposal for [Company Name]`."
+            })
+            rerun()
+        elif regen_match:
+            section_key = SECTION_ALIASES[regen_match.group(1).lower()]
+            if st.session_state.research_job_id:
+                get_job_manager().cancel(st.session_state.research_job_id)
+            job = get_job_manager().submit(
+                "section",
+                section_job,
+                st.session_state.company_data["name"],
+                section_key,
+                draft_sections(st.session_state.company_data["edited_full_draft"]),
+                st.session_state.company_data.get("research_context"),
+                regen_match.group(2).strip(),
+                emails=st.session_state.company_emails,
+                chats=st.session_state.company_chats
+            )
+            st.session_state.research_job_id = job.id
+            st.query_params["job"] = job.id
+            rerun()
+        elif spg_match:
             company_name = spg_match.group(1).strip()
+            # "@SPG refresh proposal for X" skips cached web research; "@SPG reopen proposal
+            # for X" picks up the latest proposal saved from any conversation
+            refresh = bool(re.search(r"@SPG\s+refresh\b", prompt, re.IGNORECASE))
+            shared = bool(re.search(r"@SPG\s+reopen\b", prompt, re.IGNORECASE))
+            if st.session_state.research_job_id:
+                get_job_manager().cancel(st.session_state.research_job_id)
+                st.session_state.research_job_id = None
+                st.query_params.pop("job", None)
+
+            # A proposal researched before reopens from the store instead of a new research cycle
+            if not refresh and reopen_proposal(company_name, shared=shared):
+                rerun()
             st.session_state.company_data["name"] = company_name
             
-            # Generate contextual emails and chats
-            from email_generator import generate_emails
-            from teams_generator import generate_team_chat
+            # Research runs on the background worker pool; progress is polled on rerun
+            job = get_job_manager().submit("research", research_job, company_name, refresh=refresh)
+            st.session_state.research_job_id = job.id
+            st.query_params["job"] = job.id
             
-            st.session_state.company_emails = generate_emails(company_name)
-            st.session_state.company_chats = [generate_team_chat(company_name)]
-            
-            # Show thinking message
-            with st.chat_message("assistant", avatar="https://upload.wikimedia.org/wikipedia/en/a/aa/Microsoft_Copilot_Icon.svg"):
-                # Status 1: Web Search
-                with st.spinner(f"🔍 Researcher: Searching Web, your emails and chats for details on {company_name}..."):
-                    try:
-                        research_results = research_company(
-                            company_name,
-                            st.session_state.company_emails,
-                            st.session_state.company_chats
-                        )
-                    except Exception as e:
-                        st.error(f"Error during research: {e}")
-                        research_results = {
-                            "executive_summary": "Unable to complete research.",
-                            "solution": "Unable to complete research.",
-                            "pricing": "Unable to complete research."
-                        }
-                
-                # Status 2: Reading Emails & Teams
-                with st.spinner("📧 Reading Emails & Teams Logs..."):
-                    st.write(f"**Found {len(st.session_state.company_emails)} emails and {len(st.session_state.company_chats)} group chat**")
-                
-                # Status 3: Analyzing Knowledge
-                with st.spinner("📂 Analyzing Knowledge Base..."):
-                    st.write(f"**Analyzing {len(st.session_state.uploaded_files)} files...**")
-                
-                full_draft = f"## Executive Summary\n{research_results.get('executive_summary', '')}\n\n"
-                full_draft += f"## Solution\n{research_results.get('solution', '')}\n\n"
-                full_draft += f"## Investment\n{research_results.get('pricing', '')}"
-                
-                st.session_state.company_data["full_draft"] = full_draft
-                st.session_state.company_data["edited_full_draft"] = full_draft
-                
-                st.session_state.messages.append({
-                    "role": "assistant",
-                    "content": f"I've gathered insights on **{company_name}** from web research, your email/Teams history, and the knowledge base. Here's a draft proposal - please review and edit:",
-                    "show_editor": True,
-                    "id": len(st.session_state.messages)
-                })
-            
-            st.rerun()
+            rerun()
         else:
             # Generic response
             st.session_state.messages.append({
                 "role": "assistant",
-                "content": "👋 I'm the **NexusCRM Sales Proposal Agent**. Tag me with `@SPG create proposal for [Company Name]` to get started!"
+                "content": "👋 I'm the **NexusCRM Sales Proposal Agent**. Tag me with `@SPG create proposal for [Company Name]` to get started, then `@SPG regenerate pricing: <what to change>` to rework a single section. `@SPG reopen proposal for [Company Name]` picks up the latest proposal your team saved."
             })
-            st.rerun()
+            rerun()
+
+persist_session()
+rerun_span.end()
+
+# Poll background jobs until they finish
+if needs_poll:
+    time.sleep(JOB_POLL_INTERVAL)
+    st.rerun()
@@ -0,0 +1,208 @@
+"""
+Batch Proposal Module
+Headless entry point that pre-builds proposal decks for a list of accounts.
+
+Usage:
+    python batch.py accounts.csv --out decks/ --concurrency 4
+
+The input is a CSV with a `company` (or `name`) column, or JSONL with the same
+key per line. Each company goes through generate_emails, generate_team_chat,
+research and deck rendering. Completed companies are appended to a checkpoint
+file, so re-running the same command resumes where an interrupted run stopped.
+"""
+
+import argparse
+import copy
+import csv
+import json
+import logging
+import os
+import re
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+from draft_parser import build_full_draft
+from email_generator import generate_emails
+from pptx_builder import DEFAULT_THEME, deck_signature, render_pptx
+from rate_limit import limiter_stats
+from research_pipeline import run_research
+from store import get_store
+from teams_generator import generate_team_chat
+from tracing import histograms
+
+logger = logging.getLogger(__name__)
+
+STAGES = ["emails", "chats", "research", "pptx"]
+
+
+def read_companies(path):
+    """Read company names from a CSV (company/name column) or JSONL file, skipping duplicates."""
+    names = []
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        for row in rows:
+            name = (row.get("company") or row.get("name") or "").strip()
+            if name and name not in names:
+                names.append(name)
+    return names
+
+
+def deck_filename(company_name):
+    slug = re.sub(r"[^\w\-]+", "_", company_name).strip("_") or "company"
+    return f"NexusCRM_Proposal_{slug}.pptx"
+
+
+def load_checkpoint(path):
+    """Return {company: record} for companies that completed successfully in earlier runs."""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # partial line from an interrupted write
+            if record.get("status") == "ok":
+                done[record["company"]] = record
+    return done
+
+
+def build_proposal(company_name, out_dir, refresh=False):
+    """
+    Run the full pipeline for one company and write its deck.
+
+    Returns:
+        Record with status, deck path, error and per-stage timings in seconds
+    """
+    timings = {}
+    record = {"company": company_name, "timings": timings}
+    try:
+        start = time.perf_counter()
+        emails = generate_emails(company_name)
+        timings["emails"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        chats = [generate_team_chat(company_name)]
+        timings["chats"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = run_research(company_name, emails, chats, refresh=refresh)
+        timings["research"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        research_context = results.pop("research_context", None)
+        draft = build_full_draft(results)
+        deck_data = {
+            "name": company_name,
+            "edited_full_draft": draft,
+            "ppt_theme": copy.deepcopy(DEFAULT_THEME),
+        }
+        deck = render_pptx(deck_data)
+        # Reps reopen batch-built proposals from the store without another research cycle
+        store = get_store()
+        store.save_research(company_name, emails, chats, research_context, results)
+        store.save_draft(company_name, draft, source="batch")
+        store.save_deck(company_name, deck_signature(deck_data), deck)
+        deck_path = os.path.join(out_dir, deck_filename(company_name))
+        with open(deck_path, "wb") as f:
+            f.write(deck)
+        timings["pptx"] = time.perf_counter() - start
+
+        record.update(status="ok", deck=deck_path)
+    except Exception as e:
+        logger.error(f"Batch proposal failed for {company_name}: {e}", exc_info=True)
+        record.update(status="failed", error=str(e))
+    return record
+
+
+def summarize(records, wall_time):
+    """Aggregate per-stage timings (mean/p50/p95/max) and throughput for the report."""
+    stages = {}
+    for stage in STAGES:
+        values = sorted(r["timings"][stage] for r in records if stage in r.get("timings", {}))
+        if not values:
+            continue
+        stages[stage] = {
+            "count": len(values),
+            "mean": statistics.fmean(values),
+            "p50": values[len(values) // 2],
+            "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+            "max": values[-1],
+        }
+    ok = sum(1 for r in records if r.get("status") == "ok")
+    return {
+        "companies": len(records),
+        "succeeded": ok,
+        "failed": len(records) - ok,
+        "wall_time": wall_time,
+        "throughput_per_min": (ok / wall_time * 60) if wall_time else 0.0,
+        "stages": stages,
+    }
+
+
+def run_batch(companies, out_dir, concurrency=4, checkpoint_path=None, refresh=False):
+    """
+    Build decks for `companies` with at most `concurrency` in flight.
+
+    Companies already recorded as ok in the checkpoint are skipped.
+
+    Returns:
+        Summary report dict (also written to <out_dir>/summary.json)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    checkpoint_path = checkpoint_path or os.path.join(out_dir, "checkpoint.jsonl")
+    completed = load_checkpoint(checkpoint_path)
+    todo = [c for c in companies if c not in completed]
+    logger.info(f"{len(companies)} companies, {len(completed)} already done, {len(todo)} to build")
+
+    write_lock = threading.Lock()
+    records = [completed[c] for c in companies if c in completed]
+    start = time.perf_counter()
+    with open(checkpoint_path, "a", encoding="utf-8") as checkpoint, \
+            ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch") as pool:
+        futures = {pool.submit(build_proposal, name, out_dir, refresh): name for name in todo}
+        for future in as_completed(futures):
+            record = future.result()
+            with write_lock:
+                checkpoint.write(json.dumps(record) + "\n")
+                checkpoint.flush()
+            records.append(record)
+            logger.info(f"[{len(records)}/{len(companies)}] {record['company']}: {record['status']}")
+    wall_time = time.perf_counter() - start
+    get_store().flush()
+
+    report = summarize(records, wall_time)
+    report["rate_limits"] = limiter_stats()
+    report["spans"] = histograms()
+    report["results"] = records
+    with open(os.path.join(out_dir, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-build NexusCRM proposal decks for a list of accounts.")
+    parser.add_argument("input", help="CSV (company/name column) or JSONL file of accounts")
+    parser.add_argument("--out", default="batch_output", help="Directory for decks, checkpoint and summary")
+    parser.add_argument("--concurrency", type=int, default=4, help="Companies processed in parallel")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <out>/checkpoint.jsonl)")
+    parser.add_argument("--refresh", action="store_true", help="Bypass cached research and responses")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    load_dotenv()
+
+    report = run_batch(read_companies(args.input), args.out, args.concurrency, args.checkpoint, args.refresh)
+    print(json.dumps({k: v for k, v in report.items() if k != "results"}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
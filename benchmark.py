@@ -0,0 +1,389 @@
+"""
+Benchmark Module
+Offline, reproducible benchmarks of the proposal pipeline against fake Tavily and Gemini clients.
+
+Usage:
+    python benchmark.py                      # run and compare with the stored baseline
+    python benchmark.py --save-baseline      # run and overwrite the baseline
+    python benchmark.py --scenario research_cold --gemini-latency 1.0 --error-rate 0.05
+    python benchmark.py --cassette cassettes/slow_session.jsonl.gz --latency-scale 0
+
+Every scenario runs against a throwaway cache directory, with seeded fakes and a
+seeded random module, so two runs with the same flags do the same work. The
+baseline stores p50/p95/min per scenario and is recorded with
+BASELINE_ITERATION_FACTOR times the default iterations. A scenario whose p50 and
+fastest run both grow by more than --threshold (or its TOLERANCES entry, if
+larger) is reported as a regression and the exit code is 1; a few slow
+iterations in a short run move the p50 but not the minimum.
+
+With --cassette, API calls are replayed from a recorded session (see
+cassettes.py) instead of the fakes; --latency-scale 0 removes network time so
+only the pipeline's own work is measured.
+"""
+
+import argparse
+import copy
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASELINE_PATH = os.path.join("benchmarks", "baseline.json")
+DEFAULT_THRESHOLD = 0.25
+
+# Differences below this many milliseconds are noise, whatever the ratio
+NOISE_FLOOR_MS = 2.0
+
+# Scenarios whose timings swing more between runs (fake network jitter, GC of
+# large object graphs) get a wider allowed growth than --threshold
+TOLERANCES = {
+    "research_cold": 0.5,
+    "research_stream_cold": 0.5,
+    "research_warm": 0.5,
+    "generate_pptx_cold": 0.5,
+    "mailbox_generate": 0.5,
+    "mailbox_contacts": 0.5,
+}
+
+# --save-baseline runs this many times each scenario's default iterations
+BASELINE_ITERATION_FACTOR = 3
+
+COMPANY = "Acme Corp"
+
+# Synthetic corpus size for the mailbox_* scenarios
+MAILBOX_EMAILS = 5000
+MAILBOX_CHAT_MESSAGES = 2000
+
+# name -> (description, default iterations); the functions are defined below
+SCENARIOS = {
+    "generators": ("generate_emails + generate_team_chat", 200),
+    "extract_contacts": ("contacts from generated emails and chat", 500),
+    "context_build": ("rank and pack web/email/chat context into the token budget", 200),
+    "parse_draft": ("parse a full draft into sections (memo cleared)", 500),
+    "research_cold": ("run_research with caches bypassed", 10),
+    "research_stream_cold": ("run_research streaming partial sections, caches bypassed", 10),
+    "research_warm": ("run_research served from the search and response caches", 50),
+    "generate_pptx_cold": ("render a deck", 20),
+    "generate_pptx_cached": ("deck served from the deck cache", 500),
+    "store_reopen": ("load the latest research snapshot and draft from the proposal store", 500),
+    "mailbox_generate": (f"stream a {MAILBOX_EMAILS}-email mailbox and {MAILBOX_CHAT_MESSAGES}-message chat", 20),
+    "mailbox_contacts": ("contacts from the synthetic mailbox and chat", 20),
+    "mailbox_context": ("rank and pack the synthetic mailbox and chat into the token budget", 10),
+    "theme_local": ("resolve a theme suggestion without Gemini (parser only, cache bypassed)", 2000),
+}
+
+
+def _percentile(values, q):
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def _inputs():
+    from email_generator import generate_emails
+    from teams_generator import generate_team_chat
+    return generate_emails(COMPANY), [generate_team_chat(COMPANY)]
+
+
+def _mailbox(seed=0):
+    from email_generator import generate_emails
+    from teams_generator import generate_team_chat
+    return (
+        generate_emails(COMPANY, count=MAILBOX_EMAILS, seed=seed),
+        [generate_team_chat(COMPANY, count=MAILBOX_CHAT_MESSAGES, seed=seed)],
+    )
+
+
+def _deck_data():
+    from draft_parser import build_full_draft
+    from fakes import SAMPLE_PROPOSAL
+    from pptx_builder import DEFAULT_THEME
+    sections = {key: text.format(name=COMPANY) for key, text in SAMPLE_PROPOSAL.items()}
+    return {"name": COMPANY, "edited_full_draft": build_full_draft(sections), "ppt_theme": copy.deepcopy(DEFAULT_THEME)}
+
+
+def setup_scenario(name):
+    """Prepare a scenario and return the zero-argument callable that is timed."""
+    if name == "generators":
+        return _inputs
+
+    if name == "extract_contacts":
+        from contacts import extract_contacts
+        emails, chats = _inputs()
+        return lambda: extract_contacts(emails, chats, COMPANY)
+
+    if name == "context_build":
+        from clients import get_tavily_client
+        from context_builder import assemble_context, chat_candidates, email_candidates, web_candidates
+        from research_pipeline import SEARCH_QUERIES
+        emails, chats = _inputs()
+        tavily = get_tavily_client()
+        web = []
+        for template in SEARCH_QUERIES.values():
+            web.extend(tavily.search(template.format(name=COMPANY))["results"])
+        return lambda: assemble_context(web_candidates(web), email_candidates(emails), chat_candidates(chats))
+
+    if name == "parse_draft":
+        from draft_parser import parse_draft
+        draft = _deck_data()["edited_full_draft"]
+
+        def run():
+            parse_draft.cache_clear()
+            return parse_draft(draft)
+        return run
+
+    if name in ("research_cold", "research_stream_cold", "research_warm"):
+        from research_pipeline import run_research
+        emails, chats = _inputs()
+        refresh = name != "research_warm"
+        on_update = (lambda sections: None) if name == "research_stream_cold" else None
+        if not refresh:
+            run_research(COMPANY, emails, chats)
+        return lambda: run_research(COMPANY, emails, chats, refresh=refresh, on_update=on_update)
+
+    if name == "generate_pptx_cold":
+        from pptx_builder import render_pptx
+        data = _deck_data()
+        return lambda: render_pptx(data)
+
+    if name == "generate_pptx_cached":
+        from pptx_builder import build_deck
+        data = _deck_data()
+        build_deck(data)
+        return lambda: build_deck(data)
+
+    if name == "store_reopen":
+        from fakes import SAMPLE_PROPOSAL
+        from store import get_store
+        emails, chats = _inputs()
+        store = get_store()
+        store.save_research(COMPANY, emails, chats, "context " * 2000, dict(SAMPLE_PROPOSAL))
+        store.save_draft(COMPANY, _deck_data()["edited_full_draft"], source="research")
+
+        def run():
+            research = store.latest_research(COMPANY).load()
+            return research, store.latest_draft(COMPANY).load()
+        return run
+
+    if name == "mailbox_generate":
+        return _mailbox
+
+    if name == "mailbox_contacts":
+        from contacts import extract_contacts
+        emails, chats = _mailbox()
+        return lambda: extract_contacts(emails, chats, COMPANY)
+
+    if name == "mailbox_context":
+        from context_builder import assemble_context, chat_candidates, email_candidates
+        emails, chats = _mailbox()
+        return lambda: assemble_context([], email_candidates(emails), chat_candidates(chats))
+
+    if name == "theme_local":
+        from pptx_builder import DEFAULT_THEME
+        from themes import parse_suggestion
+        return lambda: parse_suggestion("Navy background with white text and gold accents", DEFAULT_THEME)
+
+    raise ValueError(f"Unknown scenario: {name}")
+
+
+def run_scenario(name, iterations, seed):
+    """Time `iterations` calls of a scenario after one warm-up call."""
+    random.seed(seed)
+    run = setup_scenario(name)
+    run()
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "iterations": iterations,
+        "mean_ms": statistics.fmean(timings),
+        "p50_ms": _percentile(timings, 0.5),
+        "p95_ms": _percentile(timings, 0.95),
+        "min_ms": timings[0],
+        "max_ms": timings[-1],
+    }
+
+
+def _grew(before, after, tolerance):
+    return bool(before) and (after - before) / before > tolerance and after - before > NOISE_FLOOR_MS
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare latencies with a baseline.
+
+    A scenario regresses when its p50 and its fastest run both grew by more than
+    `threshold` (or its TOLERANCES entry, if larger) and by more than NOISE_FLOOR_MS.
+
+    Returns:
+        List of (scenario, baseline p50, current p50, p50 change ratio, regressed) for
+        scenarios present in both
+    """
+    rows = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        tolerance = max(threshold, TOLERANCES.get(name, 0.0))
+        before, after = previous["p50_ms"], current["p50_ms"]
+        change = (after - before) / before if before else 0.0
+        regressed = _grew(before, after, tolerance)
+        if regressed and "min_ms" in previous:
+            regressed = _grew(previous["min_ms"], current["min_ms"], tolerance)
+        rows.append((name, before, after, change, regressed))
+    return rows
+
+
+def run_benchmarks(scenarios, iterations=None, seed=0, tavily_latency=0.05, gemini_latency=0.2, error_rate=0.0,
+                   cassette=None, latency_scale=1.0, strict_replay=False, min_factor=1):
+    """
+    Run scenarios against fresh fakes (or a replayed cassette) and an isolated cache directory.
+
+    Each scenario runs `iterations` times (default per scenario), but at least
+    `min_factor` times its default.
+
+    Returns:
+        Report dict with settings, per-scenario results and per-span histograms
+    """
+    import cassettes
+    import clients
+    import fakes
+    import tracing
+
+    # Scenarios read their settings from the environment; put it back afterwards
+    saved_environ = dict(os.environ)
+    try:
+        workdir = tempfile.mkdtemp(prefix="spg-bench-")
+        os.environ.update({
+            "SPG_CACHE_PATH": os.path.join(workdir, "cache.sqlite"),
+            "KB_INDEX_PATH": os.path.join(workdir, "knowledge.sqlite"),
+            "SPG_STORE_PATH": os.path.join(workdir, "proposals.sqlite"),
+            "TAVILY_API_KEY": "fake",
+            "GEMINI_API_KEY": "fake",
+        })
+        # The fakes model provider latency; client-side rate limiting would only add queueing
+        os.environ.setdefault("GEMINI_RPM", "100000")
+        os.environ.setdefault("TAVILY_RPM", "100000")
+        os.environ.pop("TRACE_EXPORT_PATH", None)
+
+        if cassette:
+            os.environ.update({
+                "SPG_CASSETTE_MODE": "replay",
+                "SPG_CASSETTE_PATH": cassette,
+                "SPG_CASSETTE_LATENCY_SCALE": str(latency_scale),
+                "SPG_CASSETTE_STRICT": "1" if strict_replay else "0",
+            })
+            clients.reset_clients()
+        else:
+            os.environ.pop("SPG_CASSETTE_MODE", None)
+            fakes.install(
+                fakes.FakeTavilyClient(latency=tavily_latency, jitter=tavily_latency / 4, error_rate=error_rate, seed=seed),
+                fakes.FakeGeminiClient(latency=gemini_latency, jitter=gemini_latency / 4, error_rate=error_rate, seed=seed,
+                                       chunk_latency=gemini_latency / 40),
+            )
+        tracing.reset()
+
+        results = {}
+        for name in scenarios:
+            default = SCENARIOS[name][1]
+            count = max(iterations or default, default * min_factor)
+            logger.info(f"Running {name} x{count}")
+            results[name] = run_scenario(name, count, seed)
+
+        return {
+            "meta": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "seed": seed,
+                "tavily_latency": tavily_latency,
+                "gemini_latency": gemini_latency,
+                "error_rate": error_rate,
+                "cassette": cassette,
+                "latency_scale": latency_scale if cassette else None,
+                "replay": cassettes.get_cassette().stats() if cassette else None,
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            },
+            "results": results,
+            "spans": {name: {k: v for k, v in h.items() if k != "buckets"} for name, h in tracing.histograms().items()},
+        }
+
+    finally:
+        os.environ.clear()
+        os.environ.update(saved_environ)
+        clients.set_client_factory(None)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks of the proposal pipeline.")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="Scenario to run (repeatable; default all)")
+    parser.add_argument("--iterations", type=int, help="Timed iterations per scenario (default per scenario)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tavily-latency", type=float, default=0.05, help="Mean fake Tavily latency in seconds")
+    parser.add_argument("--gemini-latency", type=float, default=0.2, help="Mean fake Gemini latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake API calls that fail with 429/5xx")
+    parser.add_argument("--cassette", help="Replay API calls from this recorded cassette instead of the fakes")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiplier for replayed latencies (0 = instant)")
+    parser.add_argument("--strict-replay", action="store_true", help="Fail on calls the cassette has no exact recording of")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed p50/min growth before a regression is reported")
+    parser.add_argument("--output", help="Also write the full report to this JSON file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger.setLevel(logging.INFO)
+
+    report = run_benchmarks(
+        args.scenario or list(SCENARIOS), args.iterations, args.seed,
+        args.tavily_latency, args.gemini_latency, args.error_rate,
+        args.cassette, args.latency_scale, args.strict_replay,
+        min_factor=BASELINE_ITERATION_FACTOR if args.save_baseline else 1,
+    )
+    results = report["results"]
+
+    print(f"{'scenario':<24}{'iters':>7}{'mean ms':>11}{'p50 ms':>11}{'p95 ms':>11}")
+    for name, r in results.items():
+        print(f"{name:<24}{r['iterations']:>7}{r['mean_ms']:>11.2f}{r['p50_ms']:>11.2f}{r['p95_ms']:>11.2f}")
+    replay = report["meta"]["replay"]
+    if replay and replay["fallbacks"]:
+        print(f"\nWarning: {replay['fallbacks']} calls had no exact recording in {replay['path']} and replayed a "
+              f"different request (--strict-replay fails instead)")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        directory = os.path.dirname(args.baseline)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"meta": report["meta"], "results": results}, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one.")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline["meta"].get("python") != report["meta"]["python"]:
+        print(f"Note: baseline was recorded on Python {baseline['meta'].get('python')}")
+
+    regressions = 0
+    print(f"\n{'scenario':<24}{'baseline':>11}{'current':>11}{'change':>9}")
+    for name, before, after, change, regressed in compare(results, baseline["results"], args.threshold):
+        regressions += regressed
+        print(f"{name:<24}{before:>11.2f}{after:>11.2f}{change:>+9.0%}{'  REGRESSION' if regressed else ''}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""
+Disk Cache Module
+SQLite-backed key/value cache with TTL expiry, size-bounded LRU eviction and hit/miss counters.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "spg_cache.sqlite")
+
+
+class DiskCache:
+    """
+    A JSON value cache stored in one SQLite table.
+
+    Entries older than `ttl_seconds` are treated as misses and removed. When the
+    table grows past `max_entries`, the least recently read entries are evicted.
+    Safe to share between threads and Streamlit sessions.
+    """
+
+    def __init__(self, path, table, ttl_seconds, max_entries):
+        if not re.match(r"^\w+$", table):
+            raise ValueError(f"Invalid cache table name: {table}")
+        self.path = path
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_accessed ON {table} (accessed)")
+
+    def get(self, key):
+        """Return the cached value for `key`, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(f"SELECT value, created FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, created = row
+            if self.ttl_seconds and now - created > self.ttl_seconds:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            self._conn.execute(f"UPDATE {self.table} SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(value)
+
+    def set(self, key, value):
+        """Store a JSON-serializable value, evicting LRU entries beyond max_entries."""
+        now = time.time()
+        payload = json.dumps(value)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, payload, now, now),
+            )
+            count = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    f"DELETE FROM {self.table} WHERE key IN "
+                    f"(SELECT key FROM {self.table} ORDER BY accessed ASC LIMIT ?)",
+                    (overflow,),
+                )
+                self.evictions += overflow
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+
+    def stats(self):
+        """Return hit/miss/eviction counters and the current entry count."""
+        with self._lock:
+            entries = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def _shared_cache(table, ttl_env, ttl_default_hours, size_env, size_default):
+    with _caches_lock:
+        cache = _caches.get(table)
+        if cache is None:
+            cache = DiskCache(
+                os.getenv("SPG_CACHE_PATH", DEFAULT_CACHE_PATH),
+                table,
+                ttl_seconds=float(os.getenv(ttl_env, ttl_default_hours)) * 3600,
+                max_entries=int(os.getenv(size_env, size_default)),
+            )
+            _caches[table] = cache
+        return cache
+
+
+def normalize_company(name):
+    """Normalize a company name for cache keys ("  ACME, Inc. " -> "acme inc")."""
+    name = re.sub(r"[^\w\s]", " ", name.lower())
+    return " ".join(name.split())
+
+
+def get_search_cache():
+    """Shared cache for Tavily results (SEARCH_CACHE_TTL_HOURS, SEARCH_CACHE_MAX_ENTRIES)."""
+    return _shared_cache("tavily_search", "SEARCH_CACHE_TTL_HOURS", 168, "SEARCH_CACHE_MAX_ENTRIES", 5000)
+
+
+def search_cache_key(company_name, query, search_depth):
+    return f"{normalize_company(company_name)}|{query}|{search_depth}"
+
+
+def get_response_cache():
+    """Shared cache for Gemini responses (RESPONSE_CACHE_TTL_HOURS, RESPONSE_CACHE_MAX_ENTRIES)."""
+    return _shared_cache("gemini_response", "RESPONSE_CACHE_TTL_HOURS", 720, "RESPONSE_CACHE_MAX_ENTRIES", 2000)
+
+
+def get_summary_cache():
+    """Shared cache for thread chunk summaries (SUMMARY_CACHE_TTL_HOURS, SUMMARY_CACHE_MAX_ENTRIES)."""
+    return _shared_cache("thread_summary", "SUMMARY_CACHE_TTL_HOURS", 720, "SUMMARY_CACHE_MAX_ENTRIES", 20000)
+
+
+def response_cache_key(model, prompt):
+    """Content address of a generation request: sha256 over model name and final prompt."""
+    digest = hashlib.sha256()
+    digest.update(model.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(prompt.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def response_cache_disabled():
+    return os.getenv("RESPONSE_CACHE_DISABLED", "").lower() in ("1", "true", "yes")
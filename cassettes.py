@@ -0,0 +1,315 @@
+"""
+Cassettes Module
+Record/replay of Tavily and Gemini calls to compressed files, for reproducing sessions offline.
+
+SPG_CASSETTE_MODE=record wraps the real clients and appends every call to
+SPG_CASSETTE_PATH (gzip JSON lines): the request, the response (or error) and its
+latency, with per-chunk timings for streamed generations. SPG_CASSETTE_MODE=replay
+serves those interactions back without network access or API keys, sleeping for
+the recorded latency multiplied by SPG_CASSETTE_LATENCY_SCALE (0 replays instantly).
+
+Requests are matched by a hash of their parameters; identical requests replay
+in recorded order. With SPG_CASSETTE_STRICT=1 a request with no exact match raises
+CassetteMiss, naming the parameter where it first differs from the recordings, so a
+changed prompt cannot go unnoticed. Otherwise (e.g. replaying on a later day, when
+the generated email dates have moved, or benchmarks replaying a session recorded
+with other inputs) it falls back
+to the next unused recording of the same call type, cycling through them once all
+have been used; every fallback is logged as a warning and counted in stats().
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CASSETTE_PATH = os.path.join("cassettes", "session.jsonl.gz")
+
+
+class CassetteMiss(LookupError):
+    """Raised in replay mode when the cassette has no recording for a call."""
+
+
+class ReplayedAPIError(Exception):
+    """A provider error captured while recording; `code` is the original HTTP status."""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+def cassette_mode():
+    """The configured mode: "record", "replay" or None."""
+    mode = (os.getenv("SPG_CASSETTE_MODE") or "").strip().lower()
+    return mode if mode in ("record", "replay") else None
+
+
+def request_key(provider, method, params):
+    payload = json.dumps([provider, method, params], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """One cassette file: appends interactions when recording, serves them when replaying."""
+
+    def __init__(self, path, latency_scale=1.0, strict=False):
+        self.path = path
+        self.latency_scale = latency_scale
+        self.strict = strict
+        self._lock = threading.Lock()
+        self._by_key = None
+        self._by_call = None
+        self._used = set()
+        self._cursor = defaultdict(int)
+        self.hits = 0
+        self.fallbacks = 0
+
+    def record(self, provider, method, params, latency, response=None, chunks=None, error=None):
+        entry = {
+            "provider": provider,
+            "method": method,
+            "key": request_key(provider, method, params),
+            "params": params,
+            "latency": latency,
+            "response": response,
+            "chunks": chunks,
+            "error": error,
+            "recorded": time.time(),
+        }
+        line = json.dumps(entry, default=str) + "\n"
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Each append is its own gzip member; readers see one continuous stream
+            with gzip.open(self.path, "at", encoding="utf-8") as f:
+                f.write(line)
+
+    def _load(self):
+        self._by_key = defaultdict(deque)
+        self._by_call = defaultdict(list)
+        if not os.path.exists(self.path):
+            logger.warning(f"Cassette {self.path} does not exist; every replayed call will miss.")
+            return
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for index, line in enumerate(f):
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                entry["index"] = index
+                self._by_key[entry["key"]].append(entry)
+                self._by_call[(entry["provider"], entry["method"])].append(entry)
+        logger.info(f"Loaded cassette {self.path}")
+
+    def match(self, provider, method, params):
+        """Return the recording for a call (exact match first, then the next one of its type)."""
+        key = request_key(provider, method, params)
+        with self._lock:
+            if self._by_key is None:
+                self._load()
+            candidates = self._by_key.get(key)
+            if candidates:
+                entry = candidates[0]
+                if len(candidates) > 1:
+                    candidates.rotate(-1)
+                self.hits += 1
+            else:
+                entries = self._by_call.get((provider, method))
+                if not entries:
+                    raise CassetteMiss(f"No recorded {provider}.{method} call in {self.path}")
+                if self.strict:
+                    raise CassetteMiss(
+                        f"No recording of this {provider}.{method} request in {self.path} "
+                        f"({_diff_hint(params, entries)})"
+                    )
+                unused = [e for e in entries if e["index"] not in self._used]
+                if unused:
+                    entry = unused[0]
+                else:
+                    entry = entries[self._cursor[(provider, method)] % len(entries)]
+                    self._cursor[(provider, method)] += 1
+                self.fallbacks += 1
+                logger.warning(
+                    f"Cassette miss: replaying recorded {provider}.{method} #{entry['index']} for a different "
+                    f"request ({_diff_hint(params, [entry])}). Set SPG_CASSETTE_STRICT=1 to fail instead."
+                )
+            self._used.add(entry["index"])
+            return entry
+
+    def sleep(self, seconds):
+        if seconds and self.latency_scale > 0:
+            time.sleep(seconds * self.latency_scale)
+
+    def stats(self):
+        with self._lock:
+            return {"path": self.path, "strict": self.strict, "hits": self.hits, "fallbacks": self.fallbacks}
+
+
+def _diff_hint(params, entries):
+    """Where a request first differs from the closest recording, e.g. 'contents differs at char 812: ...'."""
+    best = None
+    for entry in entries:
+        recorded = entry["params"]
+        for name in sorted(set(params) | set(recorded)):
+            ours, theirs = str(params.get(name, "")), str(recorded.get(name, ""))
+            if ours == theirs:
+                continue
+            offset = next((i for i, (a, b) in enumerate(zip(ours, theirs)) if a != b), min(len(ours), len(theirs)))
+            if best is None or offset > best[1]:
+                best = (name, offset, ours[offset:offset + 40])
+            break
+    if best is None:
+        return "same parameters, different key"
+    name, offset, excerpt = best
+    return f"{name} differs at char {offset}: {excerpt!r}"
+
+
+def _error_record(exc):
+    code = getattr(exc, "code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    return {"type": type(exc).__name__, "code": code if isinstance(code, int) else None, "message": str(exc)}
+
+
+def _raise_recorded(entry):
+    error = entry["error"]
+    raise ReplayedAPIError(error.get("code"), f"{error['type']}: {error['message']}")
+
+
+class _Text:
+    """Minimal response object exposing .text, like the genai responses the pipeline reads."""
+
+    def __init__(self, text):
+        self.text = text
+
+
+class _RecordingTavily:
+    def __init__(self, client, cassette):
+        self._client = client
+        self._cassette = cassette
+
+    def search(self, query, **kwargs):
+        params = dict(kwargs, query=query)
+        start = time.perf_counter()
+        try:
+            response = self._client.search(query, **kwargs)
+        except Exception as e:
+            self._cassette.record("tavily", "search", params, time.perf_counter() - start, error=_error_record(e))
+            raise
+        self._cassette.record("tavily", "search", params, time.perf_counter() - start, response=response)
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+class _ReplayTavily:
+    def __init__(self, cassette):
+        self._cassette = cassette
+
+    def search(self, query, **kwargs):
+        entry = self._cassette.match("tavily", "search", dict(kwargs, query=query))
+        self._cassette.sleep(entry["latency"])
+        if entry["error"]:
+            _raise_recorded(entry)
+        return entry["response"]
+
+
+class _RecordingModels:
+    def __init__(self, models, cassette):
+        self._models = models
+        self._cassette = cassette
+
+    def generate_content(self, model, contents, **kwargs):
+        params = {"model": model, "contents": contents}
+        start = time.perf_counter()
+        try:
+            response = self._models.generate_content(model=model, contents=contents, **kwargs)
+        except Exception as e:
+            self._cassette.record("gemini", "generate_content", params, time.perf_counter() - start, error=_error_record(e))
+            raise
+        self._cassette.record("gemini", "generate_content", params, time.perf_counter() - start, response=response.text)
+        return response
+
+    def generate_content_stream(self, model, contents, **kwargs):
+        params = {"model": model, "contents": contents}
+        start = time.perf_counter()
+        chunks = []
+        try:
+            for chunk in self._models.generate_content_stream(model=model, contents=contents, **kwargs):
+                chunks.append([time.perf_counter() - start, chunk.text])
+                yield chunk
+        except Exception as e:
+            self._cassette.record("gemini", "generate_content_stream", params, time.perf_counter() - start,
+                                  chunks=chunks, error=_error_record(e))
+            raise
+        self._cassette.record("gemini", "generate_content_stream", params, time.perf_counter() - start, chunks=chunks)
+
+    def __getattr__(self, name):
+        return getattr(self._models, name)
+
+
+class _ReplayModels:
+    def __init__(self, cassette):
+        self._cassette = cassette
+
+    def generate_content(self, model, contents, **kwargs):
+        entry = self._cassette.match("gemini", "generate_content", {"model": model, "contents": contents})
+        self._cassette.sleep(entry["latency"])
+        if entry["error"]:
+            _raise_recorded(entry)
+        return _Text(entry["response"])
+
+    def generate_content_stream(self, model, contents, **kwargs):
+        entry = self._cassette.match("gemini", "generate_content_stream", {"model": model, "contents": contents})
+        elapsed = 0.0
+        for offset, text in entry["chunks"] or []:
+            self._cassette.sleep(offset - elapsed)
+            elapsed = offset
+            yield _Text(text)
+        if entry["error"]:
+            _raise_recorded(entry)
+
+
+class _GeminiWrapper:
+    def __init__(self, models, client=None):
+        self.models = models
+        self._client = client
+
+    def __getattr__(self, name):
+        if self._client is None:
+            raise AttributeError(name)
+        return getattr(self._client, name)
+
+
+_cassette = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette():
+    """Shared Cassette for SPG_CASSETTE_PATH, SPG_CASSETTE_LATENCY_SCALE (default 1.0) and SPG_CASSETTE_STRICT."""
+    global _cassette
+    with _cassette_lock:
+        path = os.getenv("SPG_CASSETTE_PATH", DEFAULT_CASSETTE_PATH)
+        strict = os.getenv("SPG_CASSETTE_STRICT", "").lower() in ("1", "true", "yes")
+        if _cassette is None or _cassette.path != path or _cassette.strict != strict:
+            _cassette = Cassette(path, float(os.getenv("SPG_CASSETTE_LATENCY_SCALE", 1.0)), strict)
+        return _cassette
+
+
+def recording_client(provider, client):
+    """Wrap a real client so its calls are appended to the cassette."""
+    if provider == "tavily":
+        return _RecordingTavily(client, get_cassette())
+    return _GeminiWrapper(_RecordingModels(client.models, get_cassette()), client)
+
+
+def replay_client(provider):
+    """Client that serves calls from the cassette instead of the network."""
+    if provider == "tavily":
+        return _ReplayTavily(get_cassette())
+    return _GeminiWrapper(_ReplayModels(get_cassette()))
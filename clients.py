@@ -0,0 +1,128 @@
+"""
+Client Registry Module
+Process-wide, thread-safe Tavily and Gemini clients shared by every Streamlit session.
+
+Streamlit re-executes app.py on every interaction, but imported modules stay loaded,
+so clients created here (and their keep-alive HTTP connections) are reused across
+reruns and sessions instead of paying for a fresh TLS handshake per request.
+The SDKs themselves are imported on first use, so they stay off the startup path.
+"""
+
+import logging
+import os
+import threading
+
+from cassettes import cassette_mode, recording_client, replay_client
+
+logger = logging.getLogger(__name__)
+
+# Max keep-alive connections per provider host (overridable via CLIENT_POOL_SIZE)
+DEFAULT_POOL_SIZE = 10
+
+_lock = threading.Lock()
+_clients = {}
+_stats = {}
+_factory = None  # set_client_factory() override for tests, benchmarks and load tests
+
+
+def _pool_size():
+    return int(os.getenv("CLIENT_POOL_SIZE", DEFAULT_POOL_SIZE))
+
+
+def _configure_tavily(client, pool_size):
+    """Give the Tavily client a keep-alive session sized for concurrent sessions."""
+    session = getattr(client, "session", None)
+    if session is None or not hasattr(session, "mount"):
+        return
+    from requests.adapters import HTTPAdapter
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+
+
+def _create(provider, api_key, pool_size):
+    if provider == "tavily":
+        from tavily import TavilyClient
+        client = TavilyClient(api_key=api_key)
+        _configure_tavily(client, pool_size)
+        return client
+    if provider == "gemini":
+        # genai.Client holds a persistent httpx client, so reuse keeps connections warm
+        from google import genai
+        return genai.Client(api_key=api_key)
+    raise ValueError(f"Unknown provider: {provider}")
+
+
+def _get(provider, env_var):
+    api_key = os.getenv(env_var)
+    key = (provider, api_key)
+    with _lock:
+        stats = _stats.setdefault(provider, {"created": 0, "acquired": 0, "reused": 0, "pool_size": _pool_size()})
+        stats["acquired"] += 1
+        client = _clients.get(key)
+        if client is not None:
+            stats["reused"] += 1
+            return client
+        pool_size = _pool_size()
+        mode = cassette_mode()
+        if mode == "replay":
+            client = replay_client(provider)
+        else:
+            client = (_factory or _create)(provider, api_key, pool_size)
+            if mode == "record":
+                client = recording_client(provider, client)
+        # Drop clients for a rotated API key so stale connections get closed
+        for old_key in [k for k in _clients if k[0] == provider]:
+            del _clients[old_key]
+        _clients[key] = client
+        stats["created"] += 1
+        stats["pool_size"] = pool_size
+        logger.info(f"Created shared {provider} client (pool size {pool_size}).")
+        return client
+
+
+def get_tavily_client():
+    """Return the shared TavilyClient for the configured TAVILY_API_KEY."""
+    return _get("tavily", "TAVILY_API_KEY")
+
+
+def get_gemini_client():
+    """Return the shared genai.Client for the configured GEMINI_API_KEY."""
+    return _get("gemini", "GEMINI_API_KEY")
+
+
+def client_stats():
+    """
+    Snapshot of registry metrics.
+
+    Returns:
+        Dictionary keyed by provider with created/acquired/reused counts,
+        pool_size and reuse_rate
+    """
+    with _lock:
+        snapshot = {}
+        for provider, stats in _stats.items():
+            entry = dict(stats)
+            entry["reuse_rate"] = stats["reused"] / stats["acquired"] if stats["acquired"] else 0.0
+            snapshot[provider] = entry
+        return snapshot
+
+
+def set_client_factory(factory):
+    """
+    Build clients with factory(provider, api_key, pool_size) instead of the SDKs.
+
+    Shared clients and metrics are dropped, so the next get_*_client() call uses
+    the new factory. Pass None to go back to the real SDK clients.
+    """
+    global _factory
+    with _lock:
+        _factory = factory
+        _clients.clear()
+        _stats.clear()
+
+
+def reset_clients():
+    """Drop all shared clients and metrics (e.g. after changing API keys)."""
+    with _lock:
+        _clients.clear()
+        _stats.clear()
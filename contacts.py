@@ -0,0 +1,49 @@
+"""
+Contacts Module
+Extracts proposal recipients from discovered emails and Teams chats.
+"""
+
+from tracing import traced
+
+
+@traced()
+def extract_contacts(emails, chats, company_name):
+    """Extract unique contacts from emails and Teams chats."""
+    contacts = []
+
+    # Extract from emails
+    for email in emails:
+        sender = email['sender']
+        # Parse email to get name and address
+        if '@' in sender:
+            name_part = sender.split('@')[0].replace('.', ' ').title()
+            contacts.append({
+                'email': sender,
+                'name': name_part,
+                'source': 'Email'
+            })
+
+    # Extract from Teams chat participants
+    if chats:
+        for chat in chats:
+            for participant in chat.get('participants', []):
+                # Extract name from "Name (Role)" format
+                name = participant.split('(')[0].strip()
+                # Generate email from name
+                email_name = name.lower().replace(' ', '.')
+                company_domain = company_name.lower().replace(' ', '').replace(',', '')
+                contacts.append({
+                    'email': f"{email_name}@{company_domain}.com",
+                    'name': name,
+                    'source': 'Teams Chat'
+                })
+
+    # Remove duplicates based on email
+    seen = set()
+    unique_contacts = []
+    for contact in contacts:
+        if contact['email'] not in seen:
+            seen.add(contact['email'])
+            unique_contacts.append(contact)
+
+    return unique_contacts
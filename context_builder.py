@@ -0,0 +1,235 @@
+"""
+Context Builder Module
+Assembles web, email, Teams and knowledge-base context for the proposal prompt within a token budget.
+
+Web results are stripped to the fields the model uses and de-duplicated at the
+sentence level; emails, chat messages, passages and web snippets are ranked by relevance
+to the three proposal sections and added greedily until the budget is spent.
+"""
+
+import logging
+import math
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+# Context tokens for the proposal prompt (overridable via PROMPT_TOKEN_BUDGET)
+DEFAULT_TOKEN_BUDGET = 3000
+
+# Per-item caps so one long email or page cannot take the whole budget
+MAX_ITEM_TOKENS = 350
+MAX_WEB_CHARS = 800
+
+# Fields of a Tavily result that the prompt actually uses
+WEB_FIELDS = ("title", "url", "content")
+
+# Terms that make a snippet useful for each proposal section. Keywords match whole
+# words (plus a plural "s"/"es"); a trailing "*" marks a stem that matches any ending.
+SECTION_KEYWORDS = {
+    "executive_summary": [
+        "silo", "slow", "performance", "timeout", "pain", "challenge", "problem", "struggl*",
+        "inconsistent", "lost", "waiting", "productivity", "goal", "strateg*", "growth",
+    ],
+    "solution": [
+        "ai", "integrat*", "mobile", "api", "automat*", "predictive", "scoring", "insight",
+        "salesforce", "teams", "outlook", "unified", "single source", "crm", "feature",
+    ],
+    "pricing": [
+        "budget", "$", "cost", "price", "pricing", "roi", "q1", "timeline", "fiscal",
+        "approval", "invest*", "revenue", "spend",
+    ],
+}
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == "_"
+
+
+def _has_keyword(text, needle, whole):
+    """True if `needle` starts a word in `text`; with `whole`, it must also end one (an "s"/"es" plural may follow)."""
+    start = text.find(needle)
+    while start != -1:
+        end = start + len(needle)
+        if start == 0 or not _is_word_char(text[start - 1]):
+            if not whole:
+                return True
+            for plural in ("", "s", "es"):
+                tail = end + len(plural)
+                if text.startswith(plural, end) and (tail == len(text) or not _is_word_char(text[tail])):
+                    return True
+        start = text.find(needle, start + 1)
+    return False
+
+
+# (needle, whole word) per keyword, per section
+_SECTION_NEEDLES = [
+    [(k[:-1], False) if k.endswith("*") else (k, _is_word_char(k[-1])) for k in keywords]
+    for keywords in SECTION_KEYWORDS.values()
+]
+
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+|\n+')
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token for English prose)."""
+    return max(1, math.ceil(len(text) / 4))
+
+
+def relevance(text):
+    """Score how much a snippet says about the proposal sections (capped per section)."""
+    lowered = text.lower()
+    hits = 0
+    for needles in _SECTION_NEEDLES:
+        # The plain substring test rules out most keywords before the boundary check
+        found = sum(1 for needle, whole in needles if needle in lowered and _has_keyword(lowered, needle, whole))
+        hits += min(3, found)
+    return hits
+
+
+def _truncate(text, max_tokens):
+    """Trim text to roughly max_tokens, preferring a sentence boundary."""
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    boundary = max(cut.rfind(". "), cut.rfind("\n"))
+    if boundary > max_chars // 2:
+        cut = cut[:boundary + 1]
+    return cut.rstrip() + "..."
+
+
+def _candidate(source, order, text, base_score=0.0, item=None):
+    tokens = estimate_tokens(text)
+    score = base_score + relevance(text) / math.sqrt(max(tokens, 20))
+    return {"source": source, "order": order, "text": text, "tokens": tokens, "score": score, "item": item}
+
+
+def web_candidates(results):
+    """
+    Slim and de-duplicate Tavily results.
+
+    Drops repeated URLs and sentences already seen in a higher-scored result,
+    keeps only title/url/content, and caps content length.
+    """
+    ranked = sorted(enumerate(results), key=lambda pair: -(pair[1].get("score") or 0))
+    seen_urls = set()
+    seen_sentences = set()
+    candidates = []
+    for order, result in ranked:
+        url = result.get("url")
+        if url and url in seen_urls:
+            continue
+        seen_urls.add(url)
+
+        kept = []
+        for sentence in _SENTENCE_SPLIT.split(result.get("content") or ""):
+            normalized = " ".join(sentence.lower().split())
+            if not normalized or normalized in seen_sentences:
+                continue
+            seen_sentences.add(normalized)
+            kept.append(sentence.strip())
+        if not kept:
+            continue
+
+        content = " ".join(kept)
+        if len(content) > MAX_WEB_CHARS:
+            content = content[:MAX_WEB_CHARS].rstrip() + "..."
+        slim = {field: result.get(field) for field in WEB_FIELDS if result.get(field)}
+        slim["content"] = content
+        text = f"{slim.get('title', '')}: {content}"
+        candidates.append(_candidate("web", order, text, base_score=result.get("score") or 0, item=slim))
+    return candidates
+
+
+def email_candidates(emails):
+    """Format each email as a prompt snippet and score it."""
+    candidates = []
+    for order, e in enumerate(emails or []):
+        body = _truncate(e['body'], MAX_ITEM_TOKENS)
+        text = f"From {e['sender']} ({e['date']}): {e['subject']}\n{body}"
+        candidates.append(_candidate("email", order, text))
+    return candidates
+
+
+def brief_candidates(source, brief):
+    """A thread brief (see thread_summary) as the source's only candidate; it is already sized, so not truncated."""
+    return [_candidate(source, 0, brief, base_score=1.0)]
+
+
+def chat_candidates(chats):
+    """Format each Teams message as a prompt line and score it."""
+    candidates = []
+    order = 0
+    for chat in chats or []:
+        for m in chat['messages']:
+            text = f"{m['sender']} ({m['timestamp']}): {_truncate(m['content'], MAX_ITEM_TOKENS)}"
+            candidates.append(_candidate("chat", order, text))
+            order += 1
+    return candidates
+
+
+def knowledge_candidates(passages_by_section):
+    """Turn knowledge-base passages (from knowledge_base.section_passages) into candidates."""
+    candidates = []
+    order = 0
+    for passages in (passages_by_section or {}).values():
+        for passage in passages:
+            text = f"[{passage['document']}] {_truncate(passage['text'], MAX_ITEM_TOKENS)}"
+            # BM25 scores are unbounded; squash into the same range as Tavily scores
+            base_score = passage["score"] / (passage["score"] + 5)
+            candidates.append(_candidate("knowledge", order, text, base_score=base_score))
+            order += 1
+    return candidates
+
+
+def token_budget():
+    return int(os.getenv("PROMPT_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET))
+
+
+def assemble_context(web, emails, chats, knowledge=None, budget=None):
+    """
+    Fill the token budget greedily with the most relevant candidates.
+
+    The best candidate from each source is taken first so no source is starved;
+    the rest are added in score order while they fit. Selected items are emitted
+    in their original order (emails newest first, chat in conversation order).
+
+    Args:
+        web: Candidates from web_candidates
+        emails: Candidates from email_candidates
+        chats: Candidates from chat_candidates
+        knowledge: Candidates from knowledge_candidates
+        budget: Token budget (defaults to PROMPT_TOKEN_BUDGET)
+
+    Returns:
+        Tuple of (web_context list, email_context, chat_context, knowledge_context);
+        the string contexts are None when the source had no candidates
+    """
+    if budget is None:
+        budget = token_budget()
+
+    selected = []
+    used = 0
+    pools = [sorted(pool, key=lambda c: -c["score"]) for pool in (web, emails, chats, knowledge or [])]
+    for pool in pools:
+        if pool and used + pool[0]["tokens"] <= budget:
+            selected.append(pool[0])
+            used += pool[0]["tokens"]
+    remaining = sorted((c for pool in pools for c in pool[1:]), key=lambda c: -c["score"])
+    for candidate in remaining:
+        if used + candidate["tokens"] <= budget:
+            selected.append(candidate)
+            used += candidate["tokens"]
+
+    def pick(source):
+        return sorted((c for c in selected if c["source"] == source), key=lambda c: c["order"])
+
+    web_context = [c["item"] for c in pick("web")]
+    email_context = "\n\n".join(c["text"] for c in pick("email")) if emails else None
+    chat_context = "\n".join(c["text"] for c in pick("chat")) if chats else None
+    knowledge_context = "\n\n".join(c["text"] for c in pick("knowledge")) if knowledge else None
+
+    total = sum(c["tokens"] for pool in pools for c in pool)
+    logger.info(f"Context: {used}/{budget} tokens used, {len(selected)} of {sum(len(p) for p in pools)} snippets ({total} tokens available)")
+    return web_context, email_context, chat_context, knowledge_context
@@ -0,0 +1,183 @@
+"""
+Draft Parser Module
+Single parser that turns the markdown proposal draft into structured sections for the preview and the PPTX builder.
+"""
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+# Canonical section titles, in draft order, with the proposal JSON keys they come from
+SECTION_TITLES = ["Executive Summary", "Solution", "Investment"]
+PROPOSAL_SECTION_KEYS = {
+    "executive_summary": "Executive Summary",
+    "solution": "Solution",
+    "pricing": "Investment",
+}
+
+# Chat aliases for sections, mapped to proposal JSON keys
+SECTION_ALIASES = {
+    "executive summary": "executive_summary",
+    "summary": "executive_summary",
+    "solution": "solution",
+    "pricing": "pricing",
+    "investment": "pricing",
+}
+
+# A header line is "#", "##" or "**" followed by one of the known section names
+_HEADER_PATTERNS = [
+    (re.compile(r'^(#|##|\*\*)\s*(Executive Summary|Understanding)', re.I), "Executive Summary"),
+    (re.compile(r'^(#|##|\*\*)\s*(Solution|The Nexus)', re.I), "Solution"),
+    (re.compile(r'^(#|##|\*\*)\s*(Investment|Pricing)', re.I), "Investment"),
+]
+_BULLET = re.compile(r'^\s*(?:[-*•]|\d+[.)])\s+(.*)')
+
+
+@dataclass(frozen=True)
+class Section:
+    """One proposal section: its canonical title, original header line, body and bullet items."""
+    title: str
+    header: str
+    body: str
+    bullets: tuple
+
+
+@dataclass(frozen=True)
+class ParsedDraft:
+    """Sections of a draft in document order. Instances are shared between callers; do not mutate."""
+    sections: tuple
+    preamble: str = ""
+
+    def get(self, title):
+        for section in self.sections:
+            if section.title == title:
+                return section
+        return None
+
+    def body(self, title, default=""):
+        section = self.get(title)
+        return section.body if section and section.body else default
+
+
+def match_header(line):
+    """Return the canonical section title if `line` is a section header, else None."""
+    for pattern, title in _HEADER_PATTERNS:
+        if pattern.match(line):
+            return title
+    return None
+
+
+@lru_cache(maxsize=64)
+def parse_draft(draft):
+    """
+    Split a draft into sections in a single pass.
+
+    Text before the first header is the preamble. When the draft has no
+    Executive Summary header, the preamble is the Executive Summary (drafts
+    pasted without headings); otherwise it is kept apart in `preamble`. A
+    repeated header continues the existing section rather than discarding it.
+
+    Args:
+        draft: Markdown draft text (edited_full_draft)
+
+    Returns:
+        ParsedDraft, memoized per draft text
+    """
+    order = []
+    headers = {}
+    lines_by_title = {}
+    preamble = []
+    current = None
+    for line in draft.split('\n'):
+        title = match_header(line)
+        if title:
+            current = title
+            headers.setdefault(title, line)
+            if title not in lines_by_title:
+                lines_by_title[title] = []
+                order.append(title)
+        elif current is None:
+            preamble.append(line)
+        else:
+            lines_by_title[current].append(line)
+
+    if SECTION_TITLES[0] not in headers and preamble:
+        lines_by_title[SECTION_TITLES[0]] = preamble
+        order.insert(0, SECTION_TITLES[0])
+        preamble = []
+
+    sections = []
+    for title in order:
+        lines = lines_by_title[title]
+        bullets = []
+        for line in lines:
+            match = _BULLET.match(line)
+            if match:
+                bullets.append(match.group(1).strip())
+        sections.append(Section(
+            title=title,
+            header=headers.get(title, ""),
+            body="\n".join(lines).strip("\n"),
+            bullets=tuple(bullets),
+        ))
+    return ParsedDraft(sections=tuple(sections), preamble="\n".join(preamble).strip("\n"))
+
+
+def build_full_draft(sections):
+    """Assemble proposal sections (keyed by proposal JSON key) into the markdown draft shown in the editor."""
+    parts = []
+    for key, title in PROPOSAL_SECTION_KEYS.items():
+        parts.append(f"## {title}\n{sections.get(key, '')}")
+    return "\n\n".join(parts)
+
+
+def draft_sections(draft):
+    """Current section bodies of a draft, keyed by proposal JSON key."""
+    parsed = parse_draft(draft)
+    return {key: parsed.body(title) for key, title in PROPOSAL_SECTION_KEYS.items()}
+
+
+def replace_section(draft, title, body):
+    """
+    Splice a new body into one section, leaving every other line of the draft untouched.
+
+    The preamble (text before the first header) is always kept as is. A missing
+    section is added with its own header: the Executive Summary right after the
+    preamble, any other section at the end.
+
+    Args:
+        draft: Markdown draft text
+        title: Canonical section title (see SECTION_TITLES)
+        body: New section body
+
+    Returns:
+        The updated draft
+    """
+    out = []
+    current = None
+    insert_at = None
+    first_header = None
+    for line in draft.split('\n'):
+        header = match_header(line)
+        if header:
+            current = header
+            if first_header is None:
+                first_header = len(out)
+            out.append(line)
+            if header == title and insert_at is None:
+                insert_at = len(out)
+            continue
+        if current == title:
+            continue
+        out.append(line)
+
+    new_lines = body.strip('\n').split('\n')
+    if insert_at is None:
+        if title == SECTION_TITLES[0] and first_header is not None:
+            out[first_header:first_header] = [f"## {title}"] + new_lines + ['']
+            return '\n'.join(out)
+        return '\n'.join(out).rstrip('\n') + f"\n\n## {title}\n" + '\n'.join(new_lines)
+    if insert_at < len(out):
+        new_lines.append('')
+    out[insert_at:insert_at] = new_lines
+    return '\n'.join(out)
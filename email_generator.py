@@ -1,28 +1,58 @@
 """
 Email Generator Module
 Generates realistic company-specific emails for the Sales Proposal Copilot.
+
+generate_emails(company) returns the five discovery emails the app shows.
+With a count it builds a synthetic mailbox instead: iter_emails() streams
+any number of emails from a seeded RNG, newest first, so load tests can
+feed context building, contact extraction and the UI mailbox-sized inputs
+and get the same mailbox on every run.
 """
 
-from datetime import datetime, timedelta
+from datetime import datetime, time, timedelta
+from functools import lru_cache
+import hashlib
+import logging
+import os
 import random
 
-def generate_emails(company_name: str):
-    """
-    Generate 5 contextual emails about a company's CRM needs.
-    
-    Args:
-        company_name: The name of the company to generate emails for
-        
-    Returns:
-        List of email dictionaries with sender, subject, date, and body
-    """
-    
-    # Email templates with placeholders for company name
-    templates = [
-        {
-            "sender": "john.smith@{company}.com",
-            "subject": "Re: CRM System Performance Issues",
-            "body": """Hi Team,
+logger = logging.getLogger(__name__)
+
+DATE_FORMAT = "%B %d, %Y at %I:%M %p"
+
+# Synthetic mailboxes end here unless a `now` is given, so a seed always yields the same emails
+CORPUS_NOW = datetime(2025, 1, 15, 17, 30)
+
+# The default emails and chat are dated back from this hour of the current day, plus a
+# per-company offset of up to ANCHOR_SPREAD_MINUTES (see anchor_time)
+ANCHOR_HOUR = 9
+ANCHOR_SPREAD_MINUTES = 480
+
+# Mean minutes between consecutive synthetic emails
+MEAN_GAP_MINUTES = 180
+
+# Emails in the default (non-synthetic) set: template i sent by persona i
+DEFAULT_EMAILS = 5
+
+# (name, title); the first DEFAULT_EMAILS are the senders of the default emails, in template order
+PERSONAS = (
+    ("John Smith", "Sales Director"),
+    ("Sarah Johnson", "VP of Marketing"),
+    ("Michael Chen", "CFO"),
+    ("Emily Rodriguez", "Head of Sales Operations"),
+    ("David Park", "IT Director"),
+    ("Priya Patel", "Customer Success Manager"),
+    ("Marcus Webb", "Chief Revenue Officer"),
+    ("Lena Novak", "Procurement Lead"),
+    ("Tom Okafor", "Security Architect"),
+    ("Grace Kim", "Regional Sales Manager"),
+    ("Luis Moreno", "Marketing Operations Manager"),
+    ("Hannah Brooks", "Enablement Lead"),
+)
+
+# (subject, body); the first DEFAULT_EMAILS are the default emails. Bodies use {company}, {name} and {title}.
+TEMPLATES = (
+    ("Re: CRM System Performance Issues", """Hi Team,
 
 I wanted to follow up on our discussion about the current CRM system at {company}. We're experiencing significant performance issues that are impacting our sales team's productivity.
 
@@ -36,13 +66,9 @@ Our team is spending more time waiting for the system than actually engaging wit
 Can we schedule a call to discuss potential solutions?
 
 Best regards,
-John Smith
-Sales Director, {company}"""
-        },
-        {
-            "sender": "sarah.johnson@{company}.com",
-            "subject": "Data Silos - Urgent Discussion Needed",
-            "body": """Team,
+{name}
+{title}, {company}"""),
+    ("Data Silos - Urgent Discussion Needed", """Team,
 
 I'm reaching out because we have a critical issue with data silos across {company}. Marketing, Sales, and Customer Success are all working with different versions of customer data.
 
@@ -55,13 +81,9 @@ We need a unified CRM solution that can break down these silos and give everyone
 
 Let's prioritize finding a solution ASAP.
 
-Sarah Johnson
-VP of Marketing, {company}"""
-        },
-        {
-            "sender": "michael.chen@{company}.com",
-            "subject": "Budget Approval for CRM Upgrade",
-            "body": """Hi Leadership Team,
+{name}
+{title}, {company}"""),
+    ("Budget Approval for CRM Upgrade", """Hi Leadership Team,
 
 Following our strategic planning session, I've been reviewing options for upgrading our CRM infrastructure at {company}.
 
@@ -76,13 +98,9 @@ Timeline: We should aim for Q1 implementation to align with our fiscal year plan
 
 Looking forward to your feedback.
 
-Michael Chen
-CFO, {company}"""
-        },
-        {
-            "sender": "emily.rodriguez@{company}.com",
-            "subject": "AI Features - Competitive Necessity",
-            "body": """Hello,
+{name}
+{title}, {company}"""),
+    ("AI Features - Competitive Necessity", """Hello,
 
 I wanted to share some competitive intelligence regarding CRM capabilities at {company}.
 
@@ -96,13 +114,9 @@ We're falling behind in this area. Our current CRM lacks any AI capabilities, wh
 
 I strongly recommend we prioritize AI features in our CRM evaluation criteria.
 
-Emily Rodriguez
-Head of Sales Operations, {company}"""
-        },
-        {
-            "sender": "david.park@{company}.com",
-            "subject": "Integration Requirements for New CRM",
-            "body": """Team,
+{name}
+{title}, {company}"""),
+    ("Integration Requirements for New CRM", """Team,
 
 As we evaluate CRM solutions for {company}, I want to outline our technical integration requirements:
 
@@ -119,31 +133,178 @@ Also, we need strong mobile support - our field sales team is constantly on the
 
 Let me know if you need any technical specifications.
 
-David Park
-IT Director, {company}"""
+{name}
+{title}, {company}"""),
+    ("Vendor Demo Feedback", """Hi all,
+
+Thanks to everyone who joined the CRM vendor demos this week. Here is a summary of the feedback from the {company} evaluation team:
+
+- Ease of use scored highest for the vendors with a modern, mobile-first interface
+- Reporting and dashboards need to work out of the box for managers
+- Several reps asked about built-in AI assistance for follow-ups
+
+Please add anything I missed before Friday so we can shortlist two vendors.
+
+{name}
+{title}, {company}"""),
+    ("Security and Compliance Checklist", """Team,
+
+Before we sign with any CRM vendor, {company} needs the following confirmed:
+
+- SOC 2 Type II report and data residency options
+- SSO with our identity provider and role-based access control
+- Audit logs for record changes and exports
+
+I'll review the security questionnaires as they come in.
+
+{name}
+{title}, {company}"""),
+    ("Rollout and Training Plan", """Hi everyone,
+
+Adoption was the biggest problem with our last CRM rollout at {company}. For the next one I'd like:
+
+- Role-based training for sales, marketing and support
+- A pilot team in the first month before the full rollout
+- Usage dashboards so we can spot teams that are struggling
+
+Happy to own the enablement plan once a vendor is selected.
+
+{name}
+{title}, {company}"""),
+    ("Current CRM Contract Renewal", """Hi,
+
+A reminder that {company}'s current CRM contract auto-renews at the end of next quarter. We need to give 60 days' notice if we're moving to a new platform.
+
+Can we confirm the evaluation timeline so we don't get locked into another year?
+
+Thanks,
+{name}
+{title}, {company}"""),
+)
+
+SUBJECT_PREFIXES = ("", "", "Re: ", "Re: ", "Fwd: ")
+
+
+def company_domain(company_name):
+    """Email domain part for a company (lowercase, no spaces or commas)."""
+    return company_name.lower().replace(" ", "").replace(",", "")
+
+
+def anchor_time(company_name, now=None):
+    """
+    Reference "now" for a company's default emails and chat.
+
+    It only moves once a day, so the dates in the generated messages (and the
+    proposal prompt built from them) stay the same across reruns and sessions
+    that day, and the response cache can hit.
+
+    Args:
+        company_name: Company the messages are about
+        now: Current time (default datetime.now()); only its date is used
+    """
+    digest = hashlib.sha256(company_domain(company_name).encode("utf-8")).digest()
+    offset = int.from_bytes(digest[:4], "big") % ANCHOR_SPREAD_MINUTES
+    day = (now or datetime.now()).date()
+    return datetime.combine(day, time(ANCHOR_HOUR)) + timedelta(minutes=offset)
+
+
+def synthetic_settings():
+    """
+    Synthetic corpus size and seed from SPG_SYNTHETIC_EMAILS / SPG_SYNTHETIC_SEED.
+
+    Returns:
+        Tuple of (count or None for the default emails, seed)
+    """
+    try:
+        count = int(os.getenv("SPG_SYNTHETIC_EMAILS", "0"))
+        seed = int(os.getenv("SPG_SYNTHETIC_SEED", "0"))
+    except ValueError:
+        logger.warning("Ignoring invalid SPG_SYNTHETIC_EMAILS/SPG_SYNTHETIC_SEED")
+        return None, 0
+    return (count if count > 0 else None), seed
+
+
+@lru_cache(maxsize=32)
+def _rendered(company_name):
+    """
+    Senders and bodies for every persona/template pair, formatted once per company.
+
+    Returns:
+        Tuple of (senders, bodies), indexed [persona] and [template][persona]
+    """
+    domain = company_domain(company_name)
+    senders = tuple(f"{name.lower().replace(' ', '.')}@{domain}.com" for name, _ in PERSONAS)
+    bodies = tuple(
+        tuple(body.format(company=company_name, name=name, title=title) for name, title in PERSONAS)
+        for _, body in TEMPLATES
+    )
+    return senders, bodies
+
+
+def iter_emails(company_name: str, count: int, seed: int = 0, now: datetime = None):
+    """
+    Stream a synthetic mailbox about a company's CRM needs, most recent first.
+
+    Emails are produced lazily; the same seed and `now` give the same emails.
+
+    Args:
+        company_name: The name of the company to generate emails for
+        count: Number of emails to yield
+        seed: Seed for the RNG that picks senders, topics and dates
+        now: Date of the newest email (default CORPUS_NOW)
+
+    Yields:
+        Email dictionaries with sender, subject, date, and body
+    """
+    rng = random.Random(seed)
+    senders, bodies = _rendered(company_name)
+    when = now or CORPUS_NOW
+    for _ in range(count):
+        template = rng.randrange(len(TEMPLATES))
+        persona = rng.randrange(len(PERSONAS))
+        yield {
+            "sender": senders[persona],
+            "subject": rng.choice(SUBJECT_PREFIXES) + TEMPLATES[template][0],
+            "date": when.strftime(DATE_FORMAT),
+            "body": bodies[template][persona],
+        }
+        when -= timedelta(minutes=1 + rng.expovariate(1 / MEAN_GAP_MINUTES))
+
+
+def generate_emails(company_name: str, count: int = None, seed: int = None, now: datetime = None):
+    """
+    Generate contextual emails about a company's CRM needs.
+
+    Args:
+        company_name: The name of the company to generate emails for
+        count: Build a synthetic mailbox of this many emails (see iter_emails)
+            instead of the five discovery emails (default SPG_SYNTHETIC_EMAILS, if set)
+        seed: Seed for reproducible dates (and senders/topics with a count)
+        now: Current time for the default emails' dates (see anchor_time)
+
+    Returns:
+        List of email dictionaries with sender, subject, date, and body, most recent first
+    """
+    if count is None and seed is None:
+        count, seed = synthetic_settings()
+    if count is not None:
+        return list(iter_emails(company_name, count, seed=seed or 0))
+
+    rng = random.Random(seed)
+    senders, bodies = _rendered(company_name)
+
+    # One email per template from its own sender, dated within the last 3 weeks
+    base_date = anchor_time(company_name, now)
+    dated = sorted(
+        ((base_date - timedelta(days=rng.randint(1, 21)), i) for i in range(DEFAULT_EMAILS)),
+        reverse=True,
+    )
+    return [
+        {
+            "sender": senders[i],
+            "subject": TEMPLATES[i][0],
+            "date": email_date.strftime(DATE_FORMAT),
+            "body": bodies[i][i],
         }
+        for email_date, i in dated
     ]
-    
-    # Generate dates for the last 2-3 weeks
-    base_date = datetime.now()
-    emails = []
-    
-    for i, template in enumerate(templates):
-        # Create dates going backwards from today
-        days_ago = random.randint(1, 21)
-        email_date = base_date - timedelta(days=days_ago)
-        
-        # Format company name for email address (lowercase, no spaces)
-        company_email = company_name.lower().replace(" ", "").replace(",", "")
-        
-        emails.append({
-            "sender": template["sender"].format(company=company_email),
-            "subject": template["subject"],
-            "date": email_date.strftime("%B %d, %Y at %I:%M %p"),
-            "body": template["body"].format(company=company_name)
-        })
-    
-    # Sort by date (most recent first)
-    emails.sort(key=lambda x: datetime.strptime(x["date"], "%B %d, %Y at %I:%M %p"), reverse=True)
-    
-    return emails
@@ -0,0 +1,320 @@
+"""
+Fake Clients Module
+Offline stand-ins for the Tavily and Gemini clients with realistic payloads, configurable latency and error rates.
+
+The fakes are seeded, so a run with the same settings returns the same payloads
+and the same sequence of latencies and injected errors. install() routes the
+shared client registry to them, after which every code path that normally needs
+API keys (research, section regeneration, theme updates) runs offline.
+FakeSMTPServer is a local SMTP stand-in for exercising proposal delivery.
+"""
+
+import json
+import random
+import re
+import socketserver
+import threading
+import time
+
+import clients
+
+# Sentences used to build search snippets; {name} is the company
+_WEB_SENTENCES = [
+    "{name} reported double-digit revenue growth and plans to expand its sales organisation next fiscal year.",
+    "Executives at {name} named customer retention and sales productivity as strategic priorities.",
+    "{name} is consolidating regional CRM instances after complaints about data silos between teams.",
+    "Analysts expect {name} to increase technology spend, with a focus on AI-assisted selling.",
+    "A recent press release from {name} announced a partnership to modernise its customer platform.",
+    "{name} operating margin improved as the company automated parts of its order-to-cash process.",
+    "The {name} leadership team highlighted slow quoting and inconsistent pipeline data on the last earnings call.",
+    "{name} opened two new offices and is hiring account executives across North America and Europe.",
+]
+
+# Proposal sections the fake Gemini returns; {name} is the company
+SAMPLE_PROPOSAL = {
+    "executive_summary": (
+        "{name}'s sales teams are losing time to a slow, fragmented CRM.\n\n"
+        "- Customer records take 5-10 seconds to load, with timeouts at peak hours\n"
+        "- Sales, marketing and support keep separate data, so pipeline reports disagree\n"
+        "- Reps spend more time waiting on tools than talking to customers\n\n"
+        "NexusCRM gives {name} a single, fast source of customer truth so the team can focus on selling."
+    ),
+    "solution": (
+        "**The NexusCRM Platform for {name}**\n\n"
+        "- **Unified customer data**: one record shared by sales, marketing and support\n"
+        "- **AI lead scoring**: predictive insights that prioritise the deals most likely to close\n"
+        "- **Native integrations**: Outlook, Teams and a REST API for existing systems\n"
+        "- **Mobile-first**: full CRM access for field teams on iOS and Android\n"
+        "- **Sub-second performance** at {name}'s data volume, with 99.9% uptime"
+    ),
+    "pricing": (
+        "**Investment Summary**\n\n"
+        "- Platform licence (150 users): $42,000/year\n"
+        "- Implementation and data migration: $6,000 one-time\n"
+        "- Training and onboarding: included\n\n"
+        "**Timeline**: kickoff in January, pilot by mid-February, full rollout by end of Q1.\n"
+        "Total first-year investment of $48,000 fits within the ~$50k budget."
+    ),
+}
+
+_THEME = {"bg_color": [15, 32, 64], "title_color": [255, 196, 0], "body_color": [240, 240, 240], "accent_color": [255, 196, 0]}
+
+
+# Answer to thread_summary's map and reduce prompts
+_SUMMARY = """- Pain points: slow CRM (5-10 s record loads, peak-hour timeouts) and data silos across teams
+- Needs AI features, Salesforce/Teams/Outlook integration and mobile support
+- Budget around $50k/year, Q1 implementation, CFO approval in place
+- ({chars} characters summarized)"""
+
+
+class FakeAPIError(Exception):
+    """Injected provider failure; `code` is the HTTP status the real SDK would report."""
+
+    def __init__(self, code, message):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+class _Behaviour:
+    """Seeded latency and error injection shared by the fakes."""
+
+    def __init__(self, latency, jitter, error_rate, seed):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.calls = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self):
+        """Return (delay seconds, error status or None) for the next call."""
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            if self._random.random() < self.error_rate:
+                self.errors += 1
+                return delay, self._random.choice([429, 500, 503])
+            return delay, None
+
+
+def _company(text):
+    match = (re.search(r"proposal from 'NexusCRM'.*? to (.+?)\.\s", text)
+             or re.search(r"^(.+?) (?:strategic goals|financial results|recent news)", text))
+    return match.group(1).strip() if match else "the prospect"
+
+
+class FakeTavilyClient:
+    """Stand-in for TavilyClient.search returning five scored results per query."""
+
+    def __init__(self, latency=0.3, jitter=0.1, error_rate=0.0, seed=0):
+        self.behaviour = _Behaviour(latency, jitter, error_rate, seed)
+
+    def search(self, query, search_depth="basic", **kwargs):
+        delay, error = self.behaviour.draw()
+        time.sleep(delay)
+        if error:
+            raise FakeAPIError(error, "Tavily request failed")
+        name = _company(query)
+        rng = random.Random(query)
+        results = []
+        for i in range(5):
+            sentences = rng.sample(_WEB_SENTENCES, 3)
+            slug = re.sub(r"\W+", "-", name.lower()).strip("-")
+            results.append({
+                "title": f"{name}: {query} ({i + 1})",
+                "url": f"https://news.example.com/{slug}/{rng.randrange(10**6)}",
+                "content": " ".join(s.format(name=name) for s in sentences),
+                "score": round(0.95 - i * 0.1 - rng.random() * 0.05, 4),
+                "raw_content": None,
+            })
+        return {
+            "query": query,
+            "follow_up_questions": None,
+            "answer": None,
+            "images": [],
+            "results": results,
+            "response_time": round(delay, 2),
+        }
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class _FakeModels:
+    def __init__(self, behaviour, chunk_chars, chunk_latency):
+        self.behaviour = behaviour
+        self.chunk_chars = chunk_chars
+        self.chunk_latency = chunk_latency
+
+    def _answer(self, prompt):
+        if "bg_color" in prompt:
+            return json.dumps(_THEME)
+        if prompt.startswith(("Summarize these", "Merge these partial summaries")):
+            return _SUMMARY.format(chars=len(prompt))
+        name = _company(prompt)
+        single = re.search(r'single key: "(\w+)"', prompt)
+        keys = [single.group(1)] if single else list(SAMPLE_PROPOSAL)
+        body = {key: SAMPLE_PROPOSAL.get(key, "").format(name=name) for key in keys}
+        # Gemini usually fences JSON answers
+        return "```json\n" + json.dumps(body, indent=2) + "\n```"
+
+    def generate_content(self, model, contents, **kwargs):
+        delay, error = self.behaviour.draw()
+        time.sleep(delay)
+        if error:
+            raise FakeAPIError(error, "RESOURCE_EXHAUSTED" if error == 429 else "INTERNAL")
+        return _Response(self._answer(contents))
+
+    def generate_content_stream(self, model, contents, **kwargs):
+        delay, error = self.behaviour.draw()
+        time.sleep(delay)
+        if error:
+            raise FakeAPIError(error, "RESOURCE_EXHAUSTED" if error == 429 else "INTERNAL")
+        text = self._answer(contents)
+        for i in range(0, len(text), self.chunk_chars):
+            time.sleep(self.chunk_latency)
+            yield _Response(text[i:i + self.chunk_chars])
+
+
+class FakeGeminiClient:
+    """Stand-in for genai.Client exposing models.generate_content and generate_content_stream."""
+
+    def __init__(self, latency=1.0, jitter=0.3, error_rate=0.0, seed=0, chunk_chars=64, chunk_latency=0.02):
+        self.behaviour = _Behaviour(latency, jitter, error_rate, seed)
+        self.models = _FakeModels(self.behaviour, chunk_chars, chunk_latency)
+
+
+def install(tavily=None, gemini=None):
+    """
+    Make the shared client registry hand out fakes instead of real clients.
+
+    clients.set_client_factory(None) switches back to the real SDK clients.
+
+    Args:
+        tavily: FakeTavilyClient (a default one when omitted)
+        gemini: FakeGeminiClient (a default one when omitted)
+
+    Returns:
+        Tuple of (tavily, gemini) fakes in use
+    """
+    tavily = tavily or FakeTavilyClient()
+    gemini = gemini or FakeGeminiClient()
+    clients.set_client_factory(lambda provider, api_key, pool_size: gemini if provider == "gemini" else tavily)
+    return tavily, gemini
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough ESMTP for smtplib: EHLO, AUTH, MAIL, RCPT, DATA, RSET, NOOP, QUIT."""
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode("ascii"))
+
+    def handle(self):
+        server = self.server.fake
+        with server._lock:
+            server.connections += 1
+        self.reply("220 fake-smtp ready")
+        sender, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("utf-8", "replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self.wfile.write(b"250-fake-smtp\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n")
+            elif verb == "HELO":
+                self.reply("250 fake-smtp")
+            elif verb == "AUTH":
+                self.reply("235 Authentication successful")
+            elif verb == "MAIL":
+                sender, recipients = command.split(":", 1)[1].strip().strip("<>"), []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipient = command.split(":", 1)[1].strip().strip("<>")
+                error = server.draw_error(recipient)
+                if error:
+                    self.reply(f"{error} Recipient rejected")
+                else:
+                    recipients.append(recipient)
+                    self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while True:
+                    data = self.rfile.readline()
+                    if not data or data == b".\r\n":
+                        break
+                    lines.append(data[1:] if data.startswith(b"..") else data)
+                time.sleep(server.latency)
+                server.store(sender, recipients, b"".join(lines))
+                self.reply("250 OK queued")
+            elif verb in ("RSET", "NOOP"):
+                if verb == "RSET":
+                    sender, recipients = None, []
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class _ThreadingTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class FakeSMTPServer:
+    """
+    Local SMTP stand-in on 127.0.0.1 that records delivered messages.
+
+    Recipients listed in `reject` get a permanent 550; otherwise `error_rate` of
+    RCPT commands get a transient 451. `connections` counts accepted TCP connections,
+    so tests can check that deliveries reuse them.
+    """
+
+    def __init__(self, port=0, latency=0.0, error_rate=0.0, reject=(), seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.reject = set(reject)
+        self.messages = []  # (sender, recipients, raw message bytes)
+        self.connections = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = _ThreadingTCPServer(("127.0.0.1", port), _SMTPHandler)
+        self._server.fake = self
+        self.port = self._server.server_address[1]
+        self._thread = None
+
+    def draw_error(self, recipient):
+        if recipient in self.reject:
+            return 550
+        with self._lock:
+            return 451 if self._random.random() < self.error_rate else None
+
+    def store(self, sender, recipients, data):
+        with self._lock:
+            self.messages.append((sender, list(recipients), data))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-smtp", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def env(self, sender="proposals@nexuscrm.example"):
+        """Environment variables that point the mailer at this server."""
+        return {
+            "SMTP_HOST": "127.0.0.1",
+            "SMTP_PORT": str(self.port),
+            "SMTP_SECURITY": "none",
+            "EMAIL_SENDER": sender,
+            "EMAIL_PASSWORD": "fake",
+        }
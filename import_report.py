@@ -0,0 +1,136 @@
+"""
+Import Report Module
+Measures what app.py imports before the first page renders, using python -X importtime.
+
+Usage:
+    python import_report.py              # per-import cost of app.py's startup path
+    python import_report.py --top 25     # also list the 25 slowest modules overall
+    python import_report.py --check      # exit 1 if a feature-only dependency loads at startup
+
+The imports are read from app.py's top-level import statements and run in a fresh
+interpreter (--repeat times; the median is reported), so the numbers match a cold
+worker. Feature dependencies (SDKs, python-pptx, PDF parsing, SMTP) are expected
+to load on first use, not at startup; --check fails when one of them shows up.
+"""
+
+import argparse
+import ast
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(ROOT, "app.py")
+
+# Modules that should only load when their feature is used -> the feature
+FEATURE_MODULES = {
+    "tavily": "web research",
+    "google.genai": "Gemini calls",
+    "pptx": "deck rendering",
+    "pypdf": "PDF indexing",
+    "smtplib": "sending proposals",
+}
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def app_imports(path=APP_PATH):
+    """Top-level modules imported by a script, in order."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names = [node.module]
+        else:
+            continue
+        modules.extend(name for name in names if name not in modules)
+    return modules
+
+
+def measure(modules, python=sys.executable):
+    """
+    Import `modules` in a fresh interpreter with -X importtime.
+
+    Returns:
+        Tuple of (wall-clock ms for all imports, {module: (self_us, cumulative_us, depth)})
+    """
+    code = (
+        "import time; start = time.perf_counter()\n"
+        + "".join(f"import {name}\n" for name in modules)
+        + "print((time.perf_counter() - start) * 1000)"
+    )
+    proc = subprocess.run(
+        [python, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    timings = {}
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            timings[name] = (int(self_us), int(cumulative_us), len(indent) // 2)
+    return float(proc.stdout.strip().splitlines()[-1]), timings
+
+
+def build_report(modules, repeat=3, top=0):
+    """
+    Median import cost of each module over `repeat` cold interpreters.
+
+    Returns:
+        Report dict with total_ms, per-import cumulative ms, the slowest modules
+        and any feature modules loaded at startup
+    """
+    runs = [measure(modules) for _ in range(repeat)]
+    timings = runs[-1][1]
+
+    def median_ms(name, field):
+        return statistics.median(run[1].get(name, (0, 0, 0))[field] for run in runs) / 1000
+
+    slowest = sorted(timings, key=lambda name: timings[name][1], reverse=True)
+    return {
+        "total_ms": statistics.median(run[0] for run in runs),
+        "imports": {name: median_ms(name, 1) for name in modules},
+        "slowest": [(name, median_ms(name, 1), median_ms(name, 0)) for name in slowest[:top]],
+        "feature_modules_loaded": {
+            name: feature for name, feature in FEATURE_MODULES.items() if name in timings
+        },
+        "modules_loaded": len(timings),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report the import cost of app.py's startup path.")
+    parser.add_argument("--repeat", type=int, default=3, help="Cold interpreters to measure (median reported)")
+    parser.add_argument("--top", type=int, default=0, help="Also list the N slowest modules overall")
+    parser.add_argument("--check", action="store_true", help="Exit 1 if a feature-only dependency loads at startup")
+    parser.add_argument("--output", help="Write the report to this JSON file")
+    args = parser.parse_args(argv)
+
+    report = build_report(app_imports(), args.repeat, args.top)
+
+    print(f"app.py startup imports: {report['total_ms']:.0f} ms, {report['modules_loaded']} modules")
+    print(f"\n{'import':<28}{'cumulative ms':>15}")
+    for name, ms in sorted(report["imports"].items(), key=lambda item: item[1], reverse=True):
+        print(f"{name:<28}{ms:>15.1f}")
+    if report["slowest"]:
+        print(f"\n{'module':<56}{'cumulative ms':>15}{'self ms':>10}")
+        for name, cumulative_ms, self_ms in report["slowest"]:
+            print(f"{name:<56}{cumulative_ms:>15.1f}{self_ms:>10.1f}")
+
+    for name, feature in report["feature_modules_loaded"].items():
+        print(f"\nWarning: {name} ({feature}) is imported at startup")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 1 if args.check and report["feature_modules_loaded"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+"""
+Background Jobs Module
+Process-wide worker pool for slow work (research, deck rendering) so Streamlit reruns never block on it.
+
+Jobs live in this module rather than in st.session_state, so a job keeps running
+and its result stays available after a browser refresh; the page only needs the
+job ID (kept in the URL query string) to pick it up again.
+"""
+
+import contextvars
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Finished jobs are kept this long so a reloaded page can still collect them
+DEFAULT_RESULT_TTL = 3600
+# How often a caller waiting on a SingleFlight checks whether its job was cancelled
+CANCEL_POLL_INTERVAL = 0.1
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class JobCancelled(Exception):
+    """Raised inside a job function when cancellation has been requested."""
+
+
+# The cancellation check of the job (or shared flight) running in this context
+_checkpoint = contextvars.ContextVar("spg_job_checkpoint", default=None)
+
+
+def checkpoint():
+    """
+    Raise JobCancelled if the job running this code has been cancelled.
+
+    Called before each search, Gemini call and rate-limiter wait, so a cancel
+    takes effect without waiting for the next progress update. Outside a job
+    (or inside a job that is still wanted) this does nothing.
+    """
+    check = _checkpoint.get()
+    if check is not None:
+        check()
+
+
+class Job:
+    """A unit of background work and its observable state."""
+
+    def __init__(self, kind):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.progress = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._cancel_event = threading.Event()
+        self._future = None
+
+    @property
+    def done(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    @property
+    def cancel_requested(self):
+        return self._cancel_event.is_set()
+
+    def raise_if_cancelled(self):
+        """Checkpoint for job functions: abort if cancel() was called."""
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+    def set_progress(self, progress):
+        """Publish partial output for pollers; also acts as a cancellation checkpoint."""
+        self.raise_if_cancelled()
+        self.progress = progress
+
+
+class JobManager:
+    """Thread pool plus a registry of jobs shared by all sessions."""
+
+    def __init__(self, max_workers, result_ttl=DEFAULT_RESULT_TTL):
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="spg-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, func, *args, **kwargs):
+        """
+        Queue func(job, *args, **kwargs) on the worker pool.
+
+        Returns:
+            The Job; its ID can be stored in session state or the URL
+        """
+        job = Job(kind)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        job._future = self._executor.submit(self._run, job, func, args, kwargs)
+        logger.info(f"Submitted {kind} job {job.id}")
+        return job
+
+    def _run(self, job, func, args, kwargs):
+        if job.cancel_requested:
+            job.status = CANCELLED
+            job.finished = time.time()
+            return
+        job.status = RUNNING
+        job.started = time.time()
+        # Pool threads are reused, so the checkpoint is reset when the job ends
+        token = _checkpoint.set(job.raise_if_cancelled)
+        try:
+            with span(f"job.{job.kind}", job_id=job.id):
+                job.result = func(job, *args, **kwargs)
+            job.status = DONE
+        except JobCancelled:
+            job.status = CANCELLED
+        except Exception as e:
+            logger.error(f"{job.kind} job {job.id} failed: {e}", exc_info=True)
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            _checkpoint.reset(token)
+            job.finished = time.time()
+        logger.info(f"{job.kind} job {job.id} {job.status} in {job.finished - job.started:.2f}s")
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Cancel a queued job immediately, or ask a running job to stop at its next checkpoint (see checkpoint())."""
+        job = self.get(job_id)
+        if job is None or job.done:
+            return False
+        job._cancel_event.set()
+        if job._future is not None and job._future.cancel():
+            job.status = CANCELLED
+            job.finished = time.time()
+        return True
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return counts
+
+    def _prune(self):
+        cutoff = time.time() - self.result_ttl
+        for job_id in [j.id for j in self._jobs.values() if j.done and j.finished and j.finished < cutoff]:
+            del self._jobs[job_id]
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution.
+
+    The first caller for a key starts func(publish) on the flight's pool; callers
+    arriving while it runs attach to it. Every caller receives each published
+    update on its own thread (plus the latest update when it joins late) and
+    then the shared result or exception. A caller whose on_update raises (e.g.
+    JobCancelled), or whose job is cancelled while it waits, detaches; the work
+    itself is only cancelled once every caller has detached, at its next
+    publish() or checkpoint().
+    """
+
+    def __init__(self, name, max_workers):
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-flight")
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key, func, on_update=None):
+        """
+        Run func(publish) once for all concurrent callers with the same key.
+
+        Args:
+            key: Hashable identity of the request
+            func: Callable taking a publish(update) function; publish raises
+                JobCancelled once every caller has gone away
+            on_update: Optional callable for updates, called on the caller's thread
+
+        Returns:
+            func's return value (the same object for every caller of the flight)
+        """
+        waiter = queue.Queue()
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = {"waiters": [waiter], "latest": None, "abandoned": False}
+                self._flights[key] = flight
+                self.executions += 1
+                # The work runs in the first caller's tracing context
+                self._executor.submit(contextvars.copy_context().run, self._run, key, flight, func)
+            else:
+                self.coalesced += 1
+                logger.info(f"Joined in-flight {self.name} for {key}")
+                flight["waiters"].append(waiter)
+                if flight["latest"] is not None:
+                    waiter.put(("update", flight["latest"]))
+
+        try:
+            while True:
+                try:
+                    kind, value = waiter.get(timeout=CANCEL_POLL_INTERVAL)
+                except queue.Empty:
+                    checkpoint()
+                    continue
+                if kind == "update":
+                    if on_update:
+                        on_update(value)
+                elif kind == "error":
+                    raise value
+                else:
+                    return value
+        except BaseException:
+            with self._lock:
+                if waiter in flight["waiters"]:
+                    flight["waiters"].remove(waiter)
+                    if not flight["waiters"]:
+                        flight["abandoned"] = True
+            raise
+
+    def _run(self, key, flight, func):
+        def check():
+            if flight["abandoned"]:
+                raise JobCancelled()
+
+        def publish(update):
+            with self._lock:
+                check()
+                flight["latest"] = update
+                for waiter in flight["waiters"]:
+                    waiter.put(("update", update))
+
+        # The work stops when every caller is gone, not when the first caller's job is cancelled
+        _checkpoint.set(check)
+        try:
+            outcome = ("result", func(publish))
+        except BaseException as e:
+            outcome = ("error", e)
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            waiters = list(flight["waiters"])
+        for waiter in waiters:
+            waiter.put(outcome)
+
+    def stats(self):
+        with self._lock:
+            return {"in_flight": len(self._flights), "executions": self.executions, "coalesced": self.coalesced}
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager():
+    """Shared JobManager sized by JOB_WORKERS (default 8)."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager(
+                max_workers=int(os.getenv("JOB_WORKERS", 8)),
+                result_ttl=float(os.getenv("JOB_RESULT_TTL", DEFAULT_RESULT_TTL)),
+            )
+        return _manager
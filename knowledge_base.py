@@ -0,0 +1,293 @@
+"""
+Knowledge Base Module
+Extracts text from uploaded proposals/brochures (PDF, PPTX) and serves BM25 passage retrieval from a persistent SQLite index.
+
+The index is shared by every session in the process and by other processes using
+the same file. Documents are added incrementally and de-duplicated by content hash;
+postings are clustered by term so a query only reads the rows for its own terms.
+"""
+
+import hashlib
+import heapq
+import io
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, defaultdict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = os.path.join(".cache", "knowledge.sqlite")
+
+# Target passage size in words, and overlap between consecutive PDF passages
+CHUNK_WORDS = 180
+CHUNK_OVERLAP = 30
+
+# BM25 parameters
+K1 = 1.5
+B = 0.75
+
+# Posting lists kept in memory between queries
+MAX_CACHED_TERMS = 20000
+
+_TOKEN = re.compile(r"[a-z0-9$]+")
+_STOPWORDS = frozenset("""
+a an and are as at be but by for from has have in is it its of on or our that the their this to was we were will with you your
+""".split())
+
+
+def tokenize(text):
+    return [t for t in _TOKEN.findall(text.lower()) if len(t) > 1 and t not in _STOPWORDS]
+
+
+def extract_pptx_text(data):
+    """Return one text block per slide of a .pptx file."""
+    from pptx import Presentation
+
+    slides = []
+    for slide in Presentation(io.BytesIO(data)).slides:
+        parts = []
+        for shape in slide.shapes:
+            if shape.has_text_frame and shape.text_frame.text.strip():
+                parts.append(shape.text_frame.text.strip())
+        if parts:
+            slides.append("\n".join(parts))
+    return slides
+
+
+def extract_pdf_text(data):
+    """Return one text block per page of a PDF (requires the optional pypdf package)."""
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        logger.warning("pypdf is not installed; PDF uploads cannot be indexed.")
+        return []
+    pages = []
+    for page in PdfReader(io.BytesIO(data)).pages:
+        text = (page.extract_text() or "").strip()
+        if text:
+            pages.append(text)
+    return pages
+
+
+def chunk_blocks(blocks, chunk_words=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    """
+    Split page/slide blocks into passages of about `chunk_words` words.
+
+    Small consecutive blocks (e.g. short slides) are merged; long blocks are
+    windowed with `overlap` words shared between neighbours.
+    """
+    chunks = []
+    pending = []
+    for block in blocks:
+        words = block.split()
+        if len(pending) + len(words) <= chunk_words:
+            pending.extend(words)
+            continue
+        if pending:
+            chunks.append(" ".join(pending))
+            pending = []
+        step = chunk_words - overlap
+        start = 0
+        while len(words) - start > chunk_words:
+            chunks.append(" ".join(words[start:start + chunk_words]))
+            start += step
+        pending = words[start:]
+    if pending:
+        chunks.append(" ".join(pending))
+    return chunks
+
+
+class KnowledgeBase:
+    """Persistent BM25 index over passages of uploaded documents."""
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY, name TEXT NOT NULL, sha256 TEXT UNIQUE NOT NULL,
+                added REAL NOT NULL, chunks INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS chunks (
+                id INTEGER PRIMARY KEY, doc_id INTEGER NOT NULL, position INTEGER NOT NULL,
+                text TEXT NOT NULL, length INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL, chunk_id INTEGER NOT NULL, tf INTEGER NOT NULL,
+                PRIMARY KEY (term, chunk_id)) WITHOUT ROWID;
+        """)
+        # Length normalization per chunk and recently used posting lists are kept in
+        # memory; both are rebuilt when the index grows (including from another process)
+        self._norms = {}
+        self._postings = {}
+        self._max_chunk_id = None
+
+    def _refresh(self):
+        max_id = self._conn.execute("SELECT MAX(id) FROM chunks").fetchone()[0]
+        if max_id == self._max_chunk_id:
+            return
+        lengths = dict(self._conn.execute("SELECT id, length FROM chunks"))
+        avg_length = (sum(lengths.values()) / len(lengths)) if lengths else 1
+        self._norms = {chunk_id: K1 * (1 - B + B * length / max(avg_length, 1)) for chunk_id, length in lengths.items()}
+        self._postings = {}
+        self._max_chunk_id = max_id
+
+    def _posting_list(self, term):
+        rows = self._postings.get(term)
+        if rows is None:
+            if len(self._postings) >= MAX_CACHED_TERMS:
+                self._postings.clear()
+            rows = self._conn.execute("SELECT chunk_id, tf FROM postings WHERE term = ?", (term,)).fetchall()
+            self._postings[term] = rows
+        return rows
+
+    def add_document(self, name, data):
+        """
+        Extract, chunk and index an uploaded file; already-indexed content is skipped.
+
+        Args:
+            name: Original file name (the extension selects the extractor)
+            data: File bytes
+
+        Returns:
+            Number of passages added (0 if the file was already indexed or had no text)
+        """
+        sha = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM documents WHERE sha256 = ?", (sha,)).fetchone():
+                return 0
+
+        extension = os.path.splitext(name)[1].lower()
+        if extension == ".pptx":
+            blocks = extract_pptx_text(data)
+        elif extension == ".pdf":
+            blocks = extract_pdf_text(data)
+        else:
+            raise ValueError(f"Unsupported file type: {name}")
+        chunks = chunk_blocks(blocks)
+
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                cursor = self._conn.execute(
+                    "INSERT INTO documents (name, sha256, added, chunks) VALUES (?, ?, ?, ?)",
+                    (name, sha, time.time(), len(chunks)),
+                )
+                doc_id = cursor.lastrowid
+                for position, text in enumerate(chunks):
+                    terms = tokenize(text)
+                    cursor = self._conn.execute(
+                        "INSERT INTO chunks (doc_id, position, text, length) VALUES (?, ?, ?, ?)",
+                        (doc_id, position, text, len(terms)),
+                    )
+                    chunk_id = cursor.lastrowid
+                    self._conn.executemany(
+                        "INSERT INTO postings (term, chunk_id, tf) VALUES (?, ?, ?)",
+                        [(term, chunk_id, tf) for term, tf in Counter(terms).items()],
+                    )
+                self._conn.execute("COMMIT")
+            except sqlite3.IntegrityError:
+                # Same file indexed concurrently by another session
+                self._conn.execute("ROLLBACK")
+                return 0
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        logger.info(f"Indexed {name}: {len(chunks)} passages")
+        return len(chunks)
+
+    def search(self, query, k=3):
+        """
+        Return the top-k passages for `query` by BM25.
+
+        Returns:
+            List of dicts with document, text and score, best first
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        with self._lock:
+            self._refresh()
+            norms = self._norms
+            n_chunks = len(norms)
+            if not n_chunks:
+                return []
+            scores = defaultdict(float)
+            for term in terms:
+                rows = self._posting_list(term)
+                if not rows:
+                    continue
+                idf = math.log(1 + (n_chunks - len(rows) + 0.5) / (len(rows) + 0.5))
+                weight = idf * (K1 + 1)
+                for chunk_id, tf in rows:
+                    scores[chunk_id] += weight * tf / (tf + norms.get(chunk_id, K1))
+
+            top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            results = []
+            for chunk_id, score in top:
+                row = self._conn.execute(
+                    "SELECT d.name, c.text FROM chunks c JOIN documents d ON d.id = c.doc_id WHERE c.id = ?",
+                    (chunk_id,),
+                ).fetchone()
+                if row:
+                    results.append({"document": row[0], "text": row[1], "score": score})
+            return results
+
+    def documents(self):
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT name FROM documents ORDER BY id")]
+
+    def stats(self):
+        with self._lock:
+            self._refresh()
+            documents = self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+            return {"documents": documents, "passages": len(self._norms)}
+
+
+_knowledge_base = None
+_knowledge_base_lock = threading.Lock()
+
+
+def get_knowledge_base():
+    """Shared KnowledgeBase stored at KB_INDEX_PATH."""
+    global _knowledge_base
+    with _knowledge_base_lock:
+        if _knowledge_base is None:
+            _knowledge_base = KnowledgeBase(os.getenv("KB_INDEX_PATH", DEFAULT_INDEX_PATH))
+        return _knowledge_base
+
+
+def section_passages(company_name, section_queries, k=None):
+    """
+    Retrieve the top-k passages for each proposal section.
+
+    Args:
+        company_name: Prospect name, added to every query
+        section_queries: Dict of section key -> query text
+        k: Passages per section (defaults to KB_PASSAGES_PER_SECTION, 2)
+
+    Returns:
+        Dict of section key -> list of passages (a passage is returned once, for
+        the first section that retrieves it)
+    """
+    if k is None:
+        k = int(os.getenv("KB_PASSAGES_PER_SECTION", 2))
+    kb = get_knowledge_base()
+    seen = set()
+    passages = {}
+    for section, query in section_queries.items():
+        passages[section] = []
+        for passage in kb.search(f"{company_name} {query}", k=k):
+            key = (passage["document"], passage["text"])
+            if key not in seen:
+                seen.add(key)
+                passages[section].append(passage)
+    return passages
@@ -0,0 +1,127 @@
+"""
+Gemini Call Module
+Single entry point for Gemini text generation, backed by the content-addressed response cache.
+"""
+
+import logging
+import time
+
+from cache import get_response_cache, response_cache_disabled, response_cache_key
+from clients import get_gemini_client
+from jobs import JobCancelled, checkpoint
+from rate_limit import get_limiter
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+GEMINI_MODEL = "gemini-2.0-flash"
+
+
+def _parse(text, parse):
+    if not parse:
+        return text
+    with span("gemini.parse", chars=len(text)):
+        return parse(text)
+
+
+def generate_text(prompt, model=GEMINI_MODEL, parse=None, bypass_cache=False):
+    """
+    Generate text with Gemini, serving identical (model, prompt) requests from cache.
+
+    Args:
+        prompt: Final prompt string
+        model: Gemini model name
+        parse: Optional callable applied to the response text; the response is
+            only cached if it parses, so a malformed answer is never replayed
+        bypass_cache: Skip the cache lookup (the fresh response is still stored).
+            RESPONSE_CACHE_DISABLED=1 disables the cache entirely.
+
+    Returns:
+        The response text, or parse(text) when `parse` is given
+    """
+    disabled = response_cache_disabled()
+    cache = None if disabled else get_response_cache()
+    key = response_cache_key(model, prompt)
+
+    if cache is not None and not bypass_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            logger.info(f"Response cache hit ({model}, {key[:12]})")
+            return _parse(cached, parse)
+
+    checkpoint()
+    client = get_gemini_client()
+    with span("gemini.generate", model=model, stream=False, prompt_chars=len(prompt)) as s:
+        response = get_limiter("gemini").call(client.models.generate_content, model=model, contents=prompt)
+        text = response.text
+        s.set(response_chars=len(text or ""))
+    result = _parse(text, parse)
+
+    if cache is not None:
+        cache.set(key, text)
+    return result
+
+
+def stream_text(prompt, on_chunk, model=GEMINI_MODEL, parse=None, bypass_cache=False):
+    """
+    Stream a Gemini generation, reporting each new chunk of text as it arrives.
+
+    Args:
+        prompt: Final prompt string
+        on_chunk: Callable receiving each new piece of text (the caller accumulates it;
+            a cache hit arrives as a single piece)
+        model: Gemini model name
+        parse: Optional callable applied to the final text (see generate_text)
+        bypass_cache: Skip the cache lookup
+
+    Returns:
+        The complete response text, or parse(text) when `parse` is given
+    """
+    disabled = response_cache_disabled()
+    cache = None if disabled else get_response_cache()
+    key = response_cache_key(model, prompt)
+
+    if cache is not None and not bypass_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            logger.info(f"Response cache hit ({model}, {key[:12]})")
+            on_chunk(cached)
+            return _parse(cached, parse)
+
+    checkpoint()
+    client = get_gemini_client()
+    limiter = get_limiter("gemini")
+    started = time.perf_counter()
+    with span("gemini.generate", model=model, stream=True, prompt_chars=len(prompt)) as s:
+        attempt = 0
+        while True:
+            parts = []
+            try:
+                # The slot is held for the whole stream; a failure is only retried before
+                # the first chunk, since the caller has already seen partial text after that
+                with limiter.slot():
+                    for chunk in client.models.generate_content_stream(model=model, contents=prompt):
+                        # Stop reading (and release the slot) once the job is cancelled
+                        checkpoint()
+                        if chunk.text:
+                            if not parts:
+                                s.set(first_chunk_ms=round((time.perf_counter() - started) * 1000, 1))
+                            parts.append(chunk.text)
+                            on_chunk(chunk.text)
+                limiter.record_success()
+                break
+            except JobCancelled:
+                raise
+            except Exception as e:
+                if parts or not limiter.should_retry(e, attempt):
+                    limiter.record_failure()
+                    raise
+                limiter.backoff(e, attempt)
+                attempt += 1
+        text = "".join(parts)
+        s.set(response_chars=len(text))
+    result = _parse(text, parse)
+
+    if cache is not None:
+        cache.set(key, text)
+    return result
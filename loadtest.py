@@ -0,0 +1,274 @@
+"""
+Load Test Module
+Drives many simulated Streamlit sessions through the full proposal flow against fake backends.
+
+Usage:
+    python loadtest.py --concurrency 1,4,8,16 --tavily-latency 0.3 --gemini-latency 1.0
+
+Each simulated rep is a separate Streamlit session (streamlit.testing AppTest)
+running app.py in this process, so sessions share module-level state (clients,
+caches, job pool, rate limiters) exactly as they do on a real server. A session
+goes through: @SPG create proposal, edit the draft, Generate PPT, Regenerate
+Theme and Send Proposal (delivered to a local SMTP stand-in). Every step is
+timed until the page settles, including the reruns that poll background jobs.
+
+For each concurrency level the report gives step latency percentiles, script
+rerun latency percentiles (from the streamlit.rerun spans), session-state size
+and process memory growth per session, and throughput. --emails and
+--chat-messages give every company a synthetic mailbox and chat of that size
+(see email_generator.iter_emails) to see how the flow scales with large inputs.
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+STEPS = ["load", "prompt", "edit_draft", "generate_ppt", "regenerate_theme", "send_proposal"]
+
+
+def _percentiles(values):
+    if not values:
+        return {}
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "mean_ms": statistics.fmean(values),
+        "p50_ms": values[len(values) // 2],
+        "p95_ms": values[min(len(values) - 1, int(len(values) * 0.95))],
+        "p99_ms": values[min(len(values) - 1, int(len(values) * 0.99))],
+        "max_ms": values[-1],
+    }
+
+
+def _rss_bytes():
+    """Current resident set size (Linux /proc; falls back to peak RSS elsewhere)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def _allow_concurrent_app_tests():
+    """
+    Let AppTest sessions run in parallel threads.
+
+    AppTest assumes one test at a time: every run installs a mock Runtime and
+    clears it when done, patches a global config option around the run, and
+    compiles the script with its own cache. Keep the most recent runtime
+    available, set the option once, and share one script cache, as the real
+    server does.
+    """
+    import contextlib
+
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    original = Runtime.__dict__["instance"].__func__
+    last = {}
+
+    def instance(cls):
+        if cls._instance is not None:
+            last["runtime"] = cls._instance
+            return cls._instance
+        return last["runtime"] if "runtime" in last else original(cls)
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: cls._instance is not None or "runtime" in last)
+    config.set_option("global.appTest", True)
+    app_test.patch_config_options = lambda options: contextlib.nullcontext()
+    script_cache = app_test.ScriptCache()
+    app_test.ScriptCache = lambda: script_cache
+    local_script_runner.ScriptCache = lambda: script_cache
+
+
+class SimulatedSession:
+    """One rep clicking through the proposal flow in their own Streamlit session."""
+
+    def __init__(self, company, timeout=120):
+        from streamlit.testing.v1 import AppTest
+        self.company = company
+        self.app = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.timings = {}
+        self.error = None
+
+    def _step(self, name, action):
+        start = time.perf_counter()
+        action()
+        self.timings[name] = (time.perf_counter() - start) * 1000
+        if self.app.exception:
+            raise RuntimeError(f"{name}: {self.app.exception[0].value}")
+
+    def _key(self, prefix):
+        for widget in list(self.app.text_area) + list(self.app.text_input) + list(self.app.button):
+            if widget.key and widget.key.startswith(prefix):
+                return widget.key
+        raise RuntimeError(f"No widget with key {prefix}* on the page")
+
+    def run(self):
+        """Run the whole flow; the page settles (background jobs finish) inside each step."""
+        app = self.app
+        try:
+            self._step("load", app.run)
+            self._step("prompt", lambda: app.chat_input[0].set_value(f"@SPG create proposal for {self.company}").run())
+
+            draft_key = self._key("full_draft_")
+            message_id = draft_key[len("full_draft_"):]
+            edited = app.text_area(key=draft_key).value + "\n- Dedicated onboarding manager for the first 90 days"
+            self._step("edit_draft", lambda: app.text_area(key=draft_key).set_value(edited).run())
+            self._step("generate_ppt", lambda: app.button(key=f"confirm_{message_id}").click().run())
+
+            # The deck preview belongs to the new "Generating your PowerPoint" message
+            theme_key = self._key("theme_input_")
+            preview_id = theme_key[len("theme_input_"):]
+
+            def regenerate_theme():
+                app.text_input(key=theme_key).set_value("Dark mode with gold accents")
+                app.button(key=f"regen_{preview_id}").click().run()
+            self._step("regenerate_theme", regenerate_theme)
+
+            def send_proposal():
+                app.button(key=f"send_proposal_preview_{preview_id}").click().run()
+                app.button(key=f"confirm_send_{preview_id}").click().run()
+                if not any("Proposal sent to" in element.value for element in app.success):
+                    raise RuntimeError("send_proposal: not every recipient was delivered")
+            self._step("send_proposal", send_proposal)
+        except Exception as e:
+            logger.warning(f"Session for {self.company} failed: {e}")
+            self.error = str(e)
+
+
+def run_level(concurrency, same_company=False, timeout=120):
+    """
+    Run `concurrency` sessions at once and summarize them.
+
+    Args:
+        concurrency: Number of simultaneous sessions
+        same_company: All sessions research the same account (exercises coalescing and caches)
+        timeout: Seconds a single step may take
+
+    Returns:
+        Report dict for the level
+    """
+    import tracing
+    from session_memory import session_size
+
+    tracing.reset()
+    rss_before = _rss_bytes()
+    sessions = [
+        SimulatedSession("Acme Corp" if same_company else f"Company {concurrency}-{i}", timeout)
+        for i in range(concurrency)
+    ]
+    start_gate = threading.Barrier(concurrency)
+
+    def drive(session):
+        start_gate.wait()
+        session.run()
+
+    threads = [threading.Thread(target=drive, args=(s,), name=f"session-{i}") for i, s in enumerate(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_time = time.perf_counter() - start
+    rss_after = _rss_bytes()
+
+    completed = [s for s in sessions if not s.error]
+    reruns = tracing.histograms().get("streamlit.rerun", {})
+    rerun_count = reruns.get("count", 0)
+    return {
+        "concurrency": concurrency,
+        "completed": len(completed),
+        "failed": len(sessions) - len(completed),
+        "errors": sorted({s.error for s in sessions if s.error}),
+        "wall_time_s": wall_time,
+        "flows_per_min": len(completed) / wall_time * 60 if wall_time else 0.0,
+        "reruns_per_s": rerun_count / wall_time if wall_time else 0.0,
+        "steps": {step: _percentiles([s.timings[step] for s in sessions if step in s.timings]) for step in STEPS},
+        "rerun": {k: v for k, v in reruns.items() if k != "buckets"},
+        "session_state_bytes": statistics.fmean(session_size(s.app.session_state.to_dict())["total_bytes"] for s in sessions),
+        "rss_per_session_bytes": (rss_after - rss_before) / concurrency,
+        "rss_bytes": rss_after,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test app.py with simulated concurrent sessions.")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="Comma-separated concurrency levels")
+    parser.add_argument("--tavily-latency", type=float, default=0.3, help="Mean fake Tavily latency in seconds")
+    parser.add_argument("--gemini-latency", type=float, default=1.0, help="Mean fake Gemini latency in seconds")
+    parser.add_argument("--smtp-latency", type=float, default=0.05, help="Seconds the local SMTP stand-in takes per message")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake API calls that fail with 429/5xx")
+    parser.add_argument("--same-company", action="store_true", help="Every session researches the same company")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds allowed per step")
+    parser.add_argument("--emails", type=int, default=0, help="Synthetic emails per company (default: the 5 discovery emails)")
+    parser.add_argument("--chat-messages", type=int, default=0, help="Synthetic Teams messages per company (default: the 12-message chat)")
+    parser.add_argument("--output", help="Write the full report to this JSON file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger.setLevel(logging.INFO)
+    # AppTest sessions log script-context and widget-label warnings on every run
+    from streamlit import config
+    from streamlit.logger import set_log_level
+    config.set_option("logger.level", "error")
+    set_log_level("error")
+
+    import fakes
+
+    _allow_concurrent_app_tests()
+    smtp = fakes.FakeSMTPServer(latency=args.smtp_latency).start()
+    os.environ.update(smtp.env())
+    workdir = tempfile.mkdtemp(prefix="spg-load-")
+    os.environ.update({
+        "SPG_CACHE_PATH": os.path.join(workdir, "cache.sqlite"),
+        "KB_INDEX_PATH": os.path.join(workdir, "knowledge.sqlite"),
+        "TAVILY_API_KEY": "fake",
+        "GEMINI_API_KEY": "fake",
+        "SPG_SYNTHETIC_EMAILS": str(args.emails),
+        "SPG_SYNTHETIC_CHAT_MESSAGES": str(args.chat_messages),
+    })
+    os.environ.pop("SPG_CASSETTE_MODE", None)
+    fakes.install(
+        fakes.FakeTavilyClient(latency=args.tavily_latency, jitter=args.tavily_latency / 4, error_rate=args.error_rate),
+        fakes.FakeGeminiClient(latency=args.gemini_latency, jitter=args.gemini_latency / 4, error_rate=args.error_rate,
+                               chunk_latency=args.gemini_latency / 40),
+    )
+
+    levels = []
+    for concurrency in [int(c) for c in args.concurrency.split(",") if c.strip()]:
+        logger.info(f"Running {concurrency} concurrent sessions")
+        level = run_level(concurrency, args.same_company, args.timeout)
+        levels.append(level)
+        steps = level["steps"]
+        print(
+            f"{concurrency:>4} sessions: {level['completed']} ok, {level['failed']} failed, "
+            f"{level['flows_per_min']:.1f} flows/min, rerun p50/p95 "
+            f"{level['rerun'].get('p50_ms', 0):.0f}/{level['rerun'].get('p95_ms', 0):.0f} ms, "
+            f"prompt p95 {steps['prompt'].get('p95_ms', 0):.0f} ms, "
+            f"state {level['session_state_bytes'] / 1024:.0f} KiB/session, "
+            f"RSS +{level['rss_per_session_bytes'] / 2**20:.1f} MiB/session"
+        )
+
+    smtp.stop()
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "levels": levels}, f, indent=2)
+    return 0 if all(level["failed"] == 0 for level in levels) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,382 @@
+"""
+Mailer Module
+Background SMTP delivery of proposals over a shared pool of authenticated connections.
+
+send() builds the MIME message (deck attached) once and returns a DeliveryBatch
+straight away; worker threads deliver one envelope per recipient, reusing idle
+connections across recipients, batches and Streamlit sessions. Transient failures
+(4xx replies, dropped connections, timeouts) are retried with jittered backoff,
+permanent ones (5xx) fail that recipient only. Sending goes through the shared
+"smtp" rate limiter, whose concurrency is also the number of workers.
+
+Settings (read when the mailer is created):
+- EMAIL_SENDER / EMAIL_PASSWORD: sender address and password (or app password)
+- SMTP_HOST (default smtp.gmail.com) / SMTP_PORT (default 587)
+- SMTP_SECURITY: "starttls" (default), "ssl" or "none" (e.g. a local SMTP stand-in)
+- SMTP_TIMEOUT (default 30): socket timeout in seconds
+- SMTP_IDLE_TIMEOUT (default 60): pooled connections idle longer than this are closed
+- SMTP_MAX_RETRIES (default 3): retries per recipient
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+
+from rate_limit import get_limiter
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SMTP_HOST = "smtp.gmail.com"
+DEFAULT_SMTP_PORT = 587
+DEFAULT_TIMEOUT = 30
+DEFAULT_IDLE_TIMEOUT = 60
+DEFAULT_MAX_RETRIES = 3
+
+# Finished batches are kept this long so reruns can still show their status
+DEFAULT_BATCH_TTL = 3600
+
+# A pooled connection idle longer than this is checked with NOOP before reuse
+_NOOP_AFTER = 10
+
+QUEUED = "queued"
+SENDING = "sending"
+RETRYING = "retrying"
+SENT = "sent"
+FAILED = "failed"
+
+
+class DeliveryError(Exception):
+    """
+    A recipient could not be delivered.
+
+    `permanent` failures are not retried; `connection_ok` means the server replied
+    normally, so the connection can go back to the pool.
+    """
+
+    def __init__(self, message, permanent=False, connection_ok=False):
+        super().__init__(message)
+        self.permanent = permanent
+        self.connection_ok = connection_ok
+
+
+def smtp_settings():
+    return {
+        "host": os.getenv("SMTP_HOST", DEFAULT_SMTP_HOST),
+        "port": int(os.getenv("SMTP_PORT", DEFAULT_SMTP_PORT)),
+        "security": os.getenv("SMTP_SECURITY", "starttls").strip().lower(),
+        "sender": os.getenv("EMAIL_SENDER", ""),
+        "password": os.getenv("EMAIL_PASSWORD", ""),
+        "timeout": float(os.getenv("SMTP_TIMEOUT", DEFAULT_TIMEOUT)),
+        "idle_timeout": float(os.getenv("SMTP_IDLE_TIMEOUT", DEFAULT_IDLE_TIMEOUT)),
+        "max_retries": int(os.getenv("SMTP_MAX_RETRIES", DEFAULT_MAX_RETRIES)),
+    }
+
+
+def build_message(sender, subject, body, attachment=None, filename="proposal.pptx"):
+    """
+    Serialize the proposal email once; per-recipient headers are prepended at send time.
+
+    Returns:
+        The message bytes (headers without To/Message-ID, blank line, MIME body)
+    """
+    from email import encoders
+    from email.mime.base import MIMEBase
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+    from email.utils import formatdate
+
+    message = MIMEMultipart()
+    message["From"] = sender
+    message["Subject"] = subject
+    message["Date"] = formatdate(localtime=True)
+    message.attach(MIMEText(body, "plain", "utf-8"))
+    if attachment:
+        part = MIMEBase("application", "vnd.openxmlformats-officedocument.presentationml.presentation")
+        part.set_payload(attachment)
+        encoders.encode_base64(part)
+        part.add_header("Content-Disposition", "attachment", filename=filename)
+        message.attach(part)
+    return message.as_bytes(policy=message.policy.clone(linesep="\r\n"))
+
+
+def _classify(exc):
+    """Map an smtplib/socket failure to a DeliveryError."""
+    import smtplib
+
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        code, reply = next(iter(exc.recipients.values()))
+        reply = reply.decode(errors="replace") if isinstance(reply, bytes) else reply
+        return DeliveryError(f"{code} {reply}", permanent=code >= 500, connection_ok=code != 421)
+    if isinstance(exc, smtplib.SMTPAuthenticationError):
+        return DeliveryError(f"Authentication failed ({exc.smtp_code})", permanent=True)
+    if isinstance(exc, smtplib.SMTPResponseException):
+        reply = exc.smtp_error.decode(errors="replace") if isinstance(exc.smtp_error, bytes) else exc.smtp_error
+        return DeliveryError(f"{exc.smtp_code} {reply}", permanent=exc.smtp_code >= 500, connection_ok=exc.smtp_code != 421)
+    if isinstance(exc, smtplib.SMTPNotSupportedError):
+        return DeliveryError(str(exc), permanent=True)
+    # Disconnects, timeouts and refused connections
+    return DeliveryError(str(exc) or type(exc).__name__)
+
+
+class SMTPConnectionPool:
+    """Authenticated SMTP connections kept open between deliveries."""
+
+    def __init__(self, settings, max_idle):
+        self.settings = settings
+        self.max_idle = max_idle
+        self.created = 0
+        self.reused = 0
+        self._idle = []  # (connection, last used)
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        import smtplib
+
+        s = self.settings
+        if s["security"] == "ssl":
+            conn = smtplib.SMTP_SSL(s["host"], s["port"], timeout=s["timeout"])
+        else:
+            conn = smtplib.SMTP(s["host"], s["port"], timeout=s["timeout"])
+            if s["security"] == "starttls":
+                conn.starttls()
+        if s["password"]:
+            conn.login(s["sender"], s["password"])
+        with self._lock:
+            self.created += 1
+        logger.info(f"Opened SMTP connection to {s['host']}:{s['port']}")
+        return conn
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                conn, last_used = self._idle.pop()
+            idle = time.monotonic() - last_used
+            if idle > self.settings["idle_timeout"]:
+                self._close(conn)
+                continue
+            if idle > _NOOP_AFTER:
+                try:
+                    if conn.noop()[0] != 250:
+                        raise OSError("NOOP failed")
+                except Exception:
+                    self._close(conn)
+                    continue
+            with self._lock:
+                self.reused += 1
+            return conn
+        return self._connect()
+
+    def release(self, conn, healthy=True):
+        """Return a connection for reuse, or close it after an error."""
+        if healthy:
+            with self._lock:
+                if len(self._idle) < self.max_idle:
+                    self._idle.append((conn, time.monotonic()))
+                    return
+        self._close(conn)
+
+    def _close(self, conn):
+        try:
+            conn.quit()
+        except Exception:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
+
+    def stats(self):
+        with self._lock:
+            return {"created": self.created, "reused": self.reused, "idle": len(self._idle)}
+
+
+class DeliveryBatch:
+    """One proposal sent to a list of recipients, with per-recipient status."""
+
+    def __init__(self, sender, recipients, on_result=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.sender = sender
+        self.payload = None
+        self.on_result = on_result
+        self.created = time.time()
+        self.recipients = {
+            email: {"status": QUEUED, "attempts": 0, "error": None} for email in recipients
+        }
+        self._lock = threading.Lock()
+
+    def update(self, email, **fields):
+        with self._lock:
+            self.recipients[email].update(fields)
+            state = dict(self.recipients[email])
+        if self.on_result and state["status"] in (SENT, FAILED):
+            try:
+                self.on_result(self.id, email, state)
+            except Exception as e:
+                logger.error(f"on_result callback for {self.id} failed: {e}", exc_info=True)
+
+    def status(self):
+        """Snapshot of recipient -> {status, attempts, error}."""
+        with self._lock:
+            return {email: dict(state) for email, state in self.recipients.items()}
+
+    @property
+    def done(self):
+        with self._lock:
+            return all(state["status"] in (SENT, FAILED) for state in self.recipients.values())
+
+    def counts(self):
+        counts = {}
+        for state in self.status().values():
+            counts[state["status"]] = counts.get(state["status"], 0) + 1
+        return counts
+
+
+class Mailer:
+    """Delivery queue drained by a fixed set of worker threads sharing one connection pool."""
+
+    def __init__(self, settings, workers, batch_ttl=DEFAULT_BATCH_TTL):
+        self.settings = settings
+        self.pool = SMTPConnectionPool(settings, max_idle=workers)
+        self.batch_ttl = batch_ttl
+        self._queue = queue.Queue()
+        self._batches = {}
+        self._lock = threading.Lock()
+        self._workers = [
+            threading.Thread(target=self._work, name=f"spg-smtp-{i}", daemon=True) for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def send(self, recipients, subject, body, attachment=None, filename="proposal.pptx", on_result=None):
+        """
+        Queue a proposal for delivery to each recipient.
+
+        Args:
+            recipients: Email addresses
+            subject: Subject line
+            body: Plain-text body
+            attachment: Deck bytes, attached as `filename`
+            on_result: Called with (batch ID, recipient, state) once each recipient is sent or failed
+
+        Returns:
+            DeliveryBatch; poll it (or get(batch.id)) for per-recipient status
+        """
+        sender = self.settings["sender"]
+        batch = DeliveryBatch(sender, list(dict.fromkeys(recipients)), on_result)
+        with self._lock:
+            self._prune()
+            self._batches[batch.id] = batch
+        if not sender:
+            for email in batch.recipients:
+                batch.update(email, status=FAILED, error="Email is not configured (set EMAIL_SENDER and EMAIL_PASSWORD)")
+            return batch
+        batch.payload = build_message(sender, subject, body, attachment, filename)
+        for email in batch.recipients:
+            self._queue.put((batch, email))
+        logger.info(f"Queued proposal {batch.id} for {len(batch.recipients)} recipients")
+        return batch
+
+    def get(self, batch_id):
+        with self._lock:
+            return self._batches.get(batch_id)
+
+    def _prune(self):
+        cutoff = time.time() - self.batch_ttl
+        for batch_id in [b for b, batch in self._batches.items() if batch.created < cutoff and batch.done]:
+            del self._batches[batch_id]
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch, email = item
+            try:
+                self._deliver(batch, email)
+            except Exception as e:
+                logger.error(f"Unexpected error delivering {batch.id} to {email}: {e}", exc_info=True)
+                batch.update(email, status=FAILED, error=str(e))
+            finally:
+                self._queue.task_done()
+
+    def _deliver(self, batch, email):
+        from email.utils import make_msgid
+
+        limiter = get_limiter("smtp")
+        max_retries = self.settings["max_retries"]
+        attempt = 0
+        while True:
+            batch.update(email, status=SENDING, attempts=attempt + 1)
+            conn = None
+            try:
+                with span("smtp.send", batch_id=batch.id, attempt=attempt + 1):
+                    with limiter.slot():
+                        conn = self.pool.acquire()
+                        headers = f"To: {email}\r\nMessage-ID: {make_msgid(domain=batch.sender.split('@')[-1])}\r\n"
+                        conn.sendmail(batch.sender, [email], headers.encode("utf-8") + batch.payload)
+                self.pool.release(conn)
+                limiter.record_success()
+                batch.update(email, status=SENT, error=None)
+                return
+            except Exception as e:
+                error = _classify(e)
+                if conn is not None:
+                    self.pool.release(conn, healthy=error.connection_ok)
+                if error.permanent or attempt >= max_retries:
+                    limiter.record_failure()
+                    logger.warning(f"Delivery of {batch.id} to {email} failed: {error}")
+                    batch.update(email, status=FAILED, error=str(error))
+                    return
+                batch.update(email, status=RETRYING, error=str(error))
+                limiter.backoff(error, attempt)
+                attempt += 1
+
+    def stats(self):
+        with self._lock:
+            batches = list(self._batches.values())
+        return {
+            "queued": self._queue.qsize(),
+            "batches": len(batches),
+            "pool": self.pool.stats(),
+        }
+
+    def close(self):
+        """Stop the workers once the queue drains and close pooled connections."""
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout=self.settings["timeout"])
+        self.pool.close_all()
+
+
+_mailer = None
+_mailer_lock = threading.Lock()
+
+
+def get_mailer():
+    """Process-wide Mailer; its worker count is the smtp limiter's concurrency (SMTP_MAX_CONCURRENCY)."""
+    global _mailer
+    with _mailer_lock:
+        if _mailer is None:
+            _mailer = Mailer(smtp_settings(), workers=get_limiter("smtp").max_concurrency)
+        return _mailer
+
+
+def reset_mailer():
+    """Close pooled connections and drop the mailer so the next send picks up new settings."""
+    global _mailer
+    with _mailer_lock:
+        if _mailer is not None:
+            _mailer.close()
+        _mailer = None
@@ -0,0 +1,177 @@
+"""
+PPTX Builder Module
+Renders proposal decks in memory and caches them by a hash of draft, company name and theme.
+"""
+
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from draft_parser import parse_draft
+from tracing import span
+
+# Theme used for new proposals (RGB lists)
+DEFAULT_THEME = {
+    "bg_color": [243, 242, 241],
+    "title_color": [0, 120, 212],
+    "body_color": [50, 49, 48],
+    "accent_color": [0, 120, 212]
+}
+
+# Memory budget for cached decks (overridable via DECK_CACHE_MAX_MB)
+DEFAULT_DECK_CACHE_MB = 64
+
+
+def render_pptx(data):
+    """Generate the PowerPoint presentation for a draft and theme and return the .pptx bytes."""
+    # python-pptx takes ~70 ms to import; load it with the first deck, not at startup
+    from pptx import Presentation
+    from pptx.dml.color import RGBColor
+
+    prs = Presentation()
+    theme = data.get('ppt_theme', {})
+
+    def rgb_to_color(rgb_list):
+        return RGBColor(rgb_list[0], rgb_list[1], rgb_list[2])
+
+    bg_color = rgb_to_color(theme.get('bg_color', [255, 255, 255]))
+    title_color = rgb_to_color(theme.get('title_color', [0, 120, 212]))
+    body_color = rgb_to_color(theme.get('body_color', [0, 0, 0]))
+
+    def add_slide(title_text, content_text):
+        slide_layout = prs.slide_layouts[1]
+        slide = prs.slides.add_slide(slide_layout)
+
+        # Set background
+        background = slide.background
+        fill = background.fill
+        fill.solid()
+        fill.fore_color.rgb = bg_color
+
+        title = slide.shapes.title
+        title.text = title_text
+        title.text_frame.paragraphs[0].font.color.rgb = title_color
+        title.text_frame.paragraphs[0].font.bold = True
+
+        content = slide.placeholders[1]
+        content.text = content_text
+        # Optional: Set body color if needed (more complex to iterate all runs)
+
+    draft = parse_draft(data.get('edited_full_draft', ''))
+
+    # Slide 1: Title
+    slide_layout = prs.slide_layouts[0]
+    slide = prs.slides.add_slide(slide_layout)
+    fill = slide.background.fill
+    fill.solid()
+    fill.fore_color.rgb = bg_color
+
+    title = slide.shapes.title
+    title.text = f"NexusCRM → {data['name']}"
+    title.text_frame.paragraphs[0].font.color.rgb = title_color
+
+    subtitle = slide.placeholders[1]
+    subtitle.text = "Strategic Proposal for Digital Transformation"
+
+    # slides 2-4
+    add_slide("Understanding Your Needs", draft.body("Executive Summary", "Details in full draft."))
+    add_slide("The NexusCRM Solution", draft.body("Solution", "Details in full draft."))
+    add_slide("Investment/Pricing", draft.body("Investment", "Details in full draft."))
+
+    buffer = io.BytesIO()
+    prs.save(buffer)
+    return buffer.getvalue()
+
+
+def deck_signature(data):
+    """Hash of everything that affects the rendered deck."""
+    payload = json.dumps([data.get("name"), data.get("edited_full_draft"), data.get("ppt_theme")], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DeckCache:
+    """In-memory LRU of rendered decks, bounded by total size in bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._decks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            deck = self._decks.get(key)
+            if deck is None:
+                self.misses += 1
+                return None
+            self._decks.move_to_end(key)
+            self.hits += 1
+            return deck
+
+    def put(self, key, deck):
+        with self._lock:
+            old = self._decks.pop(key, None)
+            if old is not None:
+                self.total_bytes -= len(old)
+            if len(deck) > self.max_bytes:
+                return
+            self._decks[key] = deck
+            self.total_bytes += len(deck)
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self._decks.popitem(last=False)
+                self.total_bytes -= len(evicted)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._decks),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_deck_cache = None
+_deck_cache_lock = threading.Lock()
+
+
+def get_deck_cache():
+    """Shared DeckCache for this process."""
+    global _deck_cache
+    with _deck_cache_lock:
+        if _deck_cache is None:
+            max_mb = float(os.getenv("DECK_CACHE_MAX_MB", DEFAULT_DECK_CACHE_MB))
+            _deck_cache = DeckCache(int(max_mb * 1024 * 1024))
+        return _deck_cache
+
+
+def build_deck(data):
+    """
+    Return the .pptx bytes for `data`, rendering only when the deck is not cached.
+
+    Args:
+        data: company_data dict with name, edited_full_draft and ppt_theme
+
+    Returns:
+        The deck as bytes
+    """
+    cache = get_deck_cache()
+    key = deck_signature(data)
+    deck = cache.get(key)
+    if deck is None:
+        with span("pptx.render", company=data.get("name")) as s:
+            deck = render_pptx(data)
+            s.set(bytes=len(deck))
+        cache.put(key, deck)
+    return deck
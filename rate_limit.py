@@ -0,0 +1,208 @@
+"""
+Rate Limit Module
+Shared per-provider rate limiting for Gemini, Tavily and SMTP, with retries and jittered backoff on 429/5xx responses.
+
+The bucket rate starts at the configured requests-per-minute. Each throttled
+response halves it, and it recovers a little with every success. Peak traffic
+is therefore queued at the rate the provider accepts instead of failing.
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from jobs import CANCEL_POLL_INTERVAL, JobCancelled, checkpoint
+
+logger = logging.getLogger(__name__)
+
+# provider -> (requests per minute, max concurrent calls); overridable via
+# <PROVIDER>_RPM and <PROVIDER>_MAX_CONCURRENCY
+DEFAULT_LIMITS = {
+    "gemini": (60, 8),
+    "tavily": (100, 8),
+    # Mail providers cap messages per minute; concurrency is also the number of SMTP connections
+    "smtp": (30, 2),
+}
+DEFAULT_MAX_RETRIES = 4
+BASE_BACKOFF = 1.0
+MAX_BACKOFF = 30.0
+
+# Exceptions raised by the SDKs for throttling/transient failures without a status code
+_RETRYABLE_NAMES = {"UsageLimitExceededError", "TimeoutError", "ConnectionError", "ConnectTimeout", "ReadTimeout"}
+
+
+def status_code(exc):
+    """Best-effort HTTP status of an SDK exception (genai APIError.code, requests/httpx response)."""
+    for attr in ("code", "status_code"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    value = getattr(getattr(exc, "response", None), "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def is_retryable(exc):
+    """True for 429/5xx responses, timeouts and connection errors."""
+    code = status_code(exc)
+    if code is not None:
+        return code == 429 or code >= 500
+    if type(exc).__name__ in _RETRYABLE_NAMES:
+        return True
+    text = str(exc)
+    return "RESOURCE_EXHAUSTED" in text or "rate limit" in text.lower()
+
+
+def _is_throttle(exc):
+    code = status_code(exc)
+    return code == 429 or type(exc).__name__ == "UsageLimitExceededError" or "RESOURCE_EXHAUSTED" in str(exc)
+
+
+class RateLimiter:
+    """Token bucket plus concurrency gate for one provider."""
+
+    def __init__(self, name, requests_per_minute, max_concurrency, max_retries=DEFAULT_MAX_RETRIES):
+        self.name = name
+        self.max_rate = requests_per_minute / 60.0
+        self.rate = self.max_rate
+        self.capacity = max(1.0, min(requests_per_minute / 6.0, float(max_concurrency)))
+        self.tokens = self.capacity
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+        self.in_flight = 0
+        self._waits = deque(maxlen=1000)
+
+    def _take_token(self):
+        """Reserve a token, returning how long to sleep before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    @contextmanager
+    def slot(self):
+        """
+        Wait for a token and a concurrency slot; the wait is recorded as queue time.
+
+        The wait is a job checkpoint: a cancelled job stops queueing (JobCancelled)
+        instead of waiting its turn for a call it no longer needs.
+        """
+        checkpoint()
+        start = time.monotonic()
+        delay = self._take_token()
+        while delay > 0:
+            time.sleep(min(delay, CANCEL_POLL_INTERVAL))
+            delay -= CANCEL_POLL_INTERVAL
+            checkpoint()
+        while not self._semaphore.acquire(timeout=CANCEL_POLL_INTERVAL):
+            checkpoint()
+        wait = time.monotonic() - start
+        with self._lock:
+            self._waits.append(wait)
+            self.calls += 1
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._semaphore.release()
+
+    def record_success(self):
+        with self._lock:
+            # Additive recovery towards the configured rate
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+
+    def should_retry(self, exc, attempt):
+        return attempt < self.max_retries and is_retryable(exc)
+
+    def backoff(self, exc, attempt):
+        """Sleep before retry `attempt` (exponential with full jitter); throttling also halves the rate."""
+        with self._lock:
+            self.retries += 1
+            if _is_throttle(exc):
+                self.throttled += 1
+                self.rate = max(self.max_rate * 0.1, self.rate / 2)
+        delay = random.uniform(0, min(MAX_BACKOFF, BASE_BACKOFF * (2 ** attempt)))
+        logger.warning(f"{self.name} call failed ({exc}); retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+        time.sleep(delay)
+
+    def call(self, func, *args, **kwargs):
+        """Call func under the limiter, retrying retryable failures."""
+        attempt = 0
+        while True:
+            try:
+                with self.slot():
+                    result = func(*args, **kwargs)
+                self.record_success()
+                return result
+            except JobCancelled:
+                raise
+            except Exception as e:
+                if not self.should_retry(e, attempt):
+                    self.record_failure()
+                    raise
+                self.backoff(e, attempt)
+                attempt += 1
+
+    def stats(self):
+        with self._lock:
+            waits = sorted(self._waits)
+            return {
+                "rate_per_min": self.rate * 60,
+                "max_rate_per_min": self.max_rate * 60,
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self.in_flight,
+                "calls": self.calls,
+                "retries": self.retries,
+                "throttled": self.throttled,
+                "failures": self.failures,
+                "queue_wait_mean": sum(waits) / len(waits) if waits else 0.0,
+                "queue_wait_p95": waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0,
+                "queue_wait_max": waits[-1] if waits else 0.0,
+            }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider):
+    """Shared RateLimiter for `provider` ("gemini", "tavily" or "smtp")."""
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            rpm, concurrency = DEFAULT_LIMITS[provider]
+            prefix = provider.upper()
+            limiter = RateLimiter(
+                provider,
+                float(os.getenv(f"{prefix}_RPM", rpm)),
+                int(os.getenv(f"{prefix}_MAX_CONCURRENCY", concurrency)),
+                int(os.getenv("RATE_LIMIT_MAX_RETRIES", DEFAULT_MAX_RETRIES)),
+            )
+            _limiters[provider] = limiter
+        return limiter
+
+
+def limiter_stats():
+    with _limiters_lock:
+        return {name: limiter.stats() for name, limiter in _limiters.items()}
@@ -0,0 +1,487 @@
+"""
+Research Pipeline Module
+Gathers web, email and Teams context concurrently and drafts the proposal with Gemini.
+"""
+
+import asyncio
+import contextvars
+import copy
+import functools
+import hashlib
+import json
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import get_search_cache, normalize_company, search_cache_key
+from clients import get_tavily_client
+from context_builder import assemble_context, brief_candidates, chat_candidates, email_candidates, knowledge_candidates, web_candidates
+from jobs import JobCancelled, SingleFlight, checkpoint
+from knowledge_base import section_passages
+from llm import GEMINI_MODEL, generate_text, stream_text
+from rate_limit import get_limiter
+from thread_summary import chat_brief, email_brief
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Mock Data (used when no emails/chats were discovered for the company)
+MOCK_EMAIL = "Subject: CRM Issues. From: John @ [Prospect]. Hi, we are struggling with data silos. Our current tool is too slow."
+MOCK_TRANSCRIPT = "Teams Meeting: We need AI features. Budget is around $50k/year. Need implementation in Q1."
+
+# Independent Tavily queries, fanned out in parallel
+SEARCH_QUERIES = {
+    "strategic_goals": "{name} strategic goals 2025",
+    "financials": "{name} financial results challenges",
+    "news": "{name} recent news",
+}
+
+# Start Gemini once this many searches have returned (or the timeout expires).
+# Overridable via RESEARCH_MIN_SEARCHES / RESEARCH_SEARCH_TIMEOUT.
+MIN_SEARCHES = 2
+SEARCH_TIMEOUT = 15.0
+
+PROPOSAL_KEYS = ["executive_summary", "solution", "pricing"]
+
+# Section labels and briefs used in the generation prompts
+SECTION_BRIEFS = {
+    "executive_summary": ("Executive Summary", "Brief overview addressing their pain points (data silos, speed issues)."),
+    "solution": ("The NexusCRM Solution", "How our AI-powered CRM can help with their specific needs."),
+    "pricing": ("Investment", "Pricing proposal aligned with their ~$50k/year budget, including implementation timeline for Q1."),
+}
+
+# Shared worker threads for blocking SDK calls. Not the loop's default executor,
+# because asyncio.run() joins that on exit and would wait for abandoned searches.
+_EXECUTOR = ThreadPoolExecutor(max_workers=16, thread_name_prefix="research")
+
+# Coalesces identical research requests arriving from several sessions at once
+_RESEARCH_FLIGHTS = SingleFlight("research", max_workers=16)
+
+
+def _in_thread(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    # Carry the current tracing span into the worker thread
+    context = contextvars.copy_context()
+    return loop.run_in_executor(_EXECUTOR, functools.partial(context.run, func, *args, **kwargs))
+
+
+def _knowledge_block(knowledge_context):
+    if not knowledge_context:
+        return ""
+    return f"""
+        - Knowledge Base (excerpts from our past proposals and brochures; reuse facts, offerings and pricing where relevant):
+{knowledge_context}
+"""
+
+
+def build_prompt(name, web_context, email_context, chat_context, knowledge_context=None):
+    """Build the proposal prompt from the gathered context."""
+    return f"""
+        You are writing a sales proposal from 'NexusCRM' (a CRM software company) to {name}.
+
+        Context gathered:
+        - Web Research: {json.dumps(web_context)}
+        - Recent Email Communications:
+{email_context}
+
+        - Teams Discussion:
+{chat_context}
+{_knowledge_block(knowledge_context)}
+        Based on this information, draft a sales proposal with 3 distinct sections.
+        The values for each key MUST be a plain string (markdown formatted), NOT a nested JSON object.
+
+        1. **Executive Summary**: Brief overview addressing their pain points (data silos, speed issues).
+        2. **The NexusCRM Solution**: How our AI-powered CRM can help with their specific needs.
+        3. **Investment**: Pricing proposal aligned with their ~$50k/year budget, including implementation timeline for Q1.
+
+        Return the output strictly as a JSON object with keys: "executive_summary", "solution", "pricing".
+        """
+
+
+def parse_proposal(content):
+    """Parse the Gemini JSON response into a dict of plain-string sections."""
+    if content.startswith("```json"):
+        content = content.replace("```json", "").replace("```", "")
+    if content.startswith("```"):
+        content = content.replace("```", "")
+
+    data = json.loads(content)
+
+    # Ensure all values are strings (prevent nested JSON appearing in UI)
+    for key in PROPOSAL_KEYS:
+        if isinstance(data.get(key), (dict, list)):
+            data[key] = json.dumps(data[key], indent=2)
+    return data
+
+
+def cached_search(tavily, name, query_template, search_depth="advanced", refresh=False):
+    """
+    Run a Tavily search through the persistent search cache.
+
+    Args:
+        tavily: TavilyClient
+        name: Company name (normalized for the cache key)
+        query_template: Query with a {name} placeholder
+        search_depth: Tavily search depth
+        refresh: Skip the cached entry and overwrite it with a fresh search
+
+    Returns:
+        List of Tavily result dicts
+    """
+    cache = get_search_cache()
+    key = search_cache_key(name, query_template, search_depth)
+    if not refresh:
+        cached = cache.get(key)
+        if cached is not None:
+            logger.info(f"Search cache hit: {key}")
+            return cached
+
+    checkpoint()
+    query = query_template.format(name=name)
+    logger.info(f"Searching Tavily: {query}")
+    with span("tavily.search", query=query_template, depth=search_depth) as s:
+        result = get_limiter("tavily").call(tavily.search, query=query, search_depth=search_depth)
+        results = result.get("results", [])
+        s.set(results=len(results))
+    cache.set(key, results)
+    return results
+
+
+_JSON_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+def _partial_json_string(text, start):
+    """Decode a JSON string body from `start` up to its closing quote or the end of `text`."""
+    out = []
+    i = start
+    while i < len(text):
+        ch = text[i]
+        if ch == '"':
+            break
+        if ch != '\\':
+            out.append(ch)
+            i += 1
+            continue
+        if i + 1 >= len(text):
+            break  # escape split across chunks
+        esc = text[i + 1]
+        if esc == 'u':
+            hex_digits = text[i + 2:i + 6]
+            if len(hex_digits) < 4:
+                break
+            try:
+                out.append(chr(int(hex_digits, 16)))
+            except ValueError:
+                pass
+            i += 6
+        else:
+            out.append(_JSON_ESCAPES.get(esc, esc))
+            i += 2
+    return "".join(out)
+
+
+def extract_partial_sections(text):
+    """
+    Pull the proposal sections out of a possibly incomplete JSON response.
+
+    Args:
+        text: Response text received so far
+
+    Returns:
+        Dictionary with the sections whose string value has started, decoded
+        up to the last complete character
+    """
+    sections = {}
+    for key in PROPOSAL_KEYS:
+        match = re.search(r'"%s"\s*:\s*"' % key, text)
+        if match:
+            sections[key] = _partial_json_string(text, match.end())
+    return sections
+
+
+def _knowledge_candidates(name):
+    queries = {key: f"{label} {brief}" for key, (label, brief) in SECTION_BRIEFS.items()}
+    try:
+        with span("knowledge.search"):
+            return knowledge_candidates(section_passages(name, queries))
+    except Exception as e:
+        logger.warning(f"Knowledge base lookup failed: {e}")
+        return []
+
+
+def _thread_candidates(source, summarize, rank, items):
+    """Candidates for a thread: its brief when it is long enough to summarize, else the ranked messages."""
+    try:
+        brief = summarize(items)
+    except Exception as e:
+        logger.warning(f"Summarizing {source} failed, ranking messages instead: {e}")
+        brief = None
+    return brief_candidates(source, brief) if brief else rank(items)
+
+
+def _cached_searches(name, search_depth="advanced"):
+    """Results already in the search cache, keyed by SEARCH_QUERIES label."""
+    cache = get_search_cache()
+    found = {}
+    for label, query_template in SEARCH_QUERIES.items():
+        results = cache.get(search_cache_key(name, query_template, search_depth))
+        if results is not None:
+            found[label] = results
+    return found
+
+
+async def _search(tavily, label, name):
+    # _cached_searches already looked this query up, so go straight to Tavily
+    results = await _in_thread(cached_search, tavily, name, SEARCH_QUERIES[label], refresh=True)
+    return label, results
+
+
+async def gather_context(name, emails, chats, tavily, min_searches=None, timeout=None, refresh=False):
+    """
+    Fan out the Tavily queries and rank email/Teams context concurrently, then
+    assemble everything within the prompt token budget.
+
+    Cached searches are always used. Searches that go to Tavily are awaited
+    until `min_searches` results are in hand, cached ones included (or `timeout`
+    seconds have passed); slower ones are abandoned so the Gemini call is not
+    held up, and they still fill the cache for the next run. `refresh` skips
+    the cache and searches everything again.
+
+    Knowledge-base passages for each proposal section are retrieved alongside.
+    Long email threads and chats are replaced by their map-reduce brief (see
+    thread_summary), so the prompt stays the same size as they grow.
+
+    Returns:
+        Tuple of (web_context, email_context, chat_context, knowledge_context)
+    """
+    if min_searches is None:
+        min_searches = int(os.getenv("RESEARCH_MIN_SEARCHES", MIN_SEARCHES))
+    if timeout is None:
+        timeout = float(os.getenv("RESEARCH_SEARCH_TIMEOUT", SEARCH_TIMEOUT))
+
+    loop = asyncio.get_running_loop()
+    email_task = _in_thread(_thread_candidates, "email", email_brief, email_candidates, emails)
+    chat_task = _in_thread(_thread_candidates, "chat", chat_brief, chat_candidates, chats)
+    knowledge_task = _in_thread(_knowledge_candidates, name)
+
+    web_results = {} if refresh else await _in_thread(_cached_searches, name)
+    searches = [
+        asyncio.create_task(_search(tavily, label, name))
+        for label in SEARCH_QUERIES
+        if label not in web_results
+    ]
+    if web_results:
+        logger.info(f"Search cache hit for {len(web_results)}/{len(SEARCH_QUERIES)} queries")
+
+    pending = set(searches)
+    needed = min(min_searches, len(SEARCH_QUERIES))
+    deadline = loop.time() + timeout
+    while pending and len(web_results) < needed:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            try:
+                label, results = task.result()
+                web_results[label] = results
+            except JobCancelled:
+                raise
+            except Exception as e:
+                logger.warning(f"Tavily search failed: {e}")
+
+    for task in pending:
+        task.cancel()
+    if pending:
+        logger.info(f"Proceeding with {len(web_results)}/{len(SEARCH_QUERIES)} searches; {len(pending)} still in flight abandoned.")
+
+    # Keep query order stable; once every query is cached, repeated research
+    # builds the same prompt and hits the response cache
+    web_raw = []
+    for label in SEARCH_QUERIES:
+        web_raw.extend(web_results.get(label, []))
+
+    email_ranked, chat_ranked, knowledge_ranked = await asyncio.gather(email_task, chat_task, knowledge_task)
+    with span("context.build", searches=len(web_results)):
+        web_context, email_context, chat_context, knowledge_context = await _in_thread(
+            assemble_context, web_candidates(web_raw), email_ranked, chat_ranked, knowledge_ranked
+        )
+    # The mock text stands in only when there were no emails/chats at all; when there
+    # were but none fit the budget, the context is left empty rather than made up
+    return (
+        web_context,
+        MOCK_EMAIL if email_context is None else email_context,
+        MOCK_TRANSCRIPT if chat_context is None else chat_context,
+        knowledge_context,
+    )
+
+
+async def _stream_proposal(prompt, on_update, refresh):
+    """Run the streaming Gemini call in a worker thread and relay partial sections on the loop thread."""
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+
+    def on_chunk(delta):
+        loop.call_soon_threadsafe(queue.put_nowait, delta)
+
+    future = _in_thread(stream_text, prompt, on_chunk, parse=parse_proposal, bypass_cache=refresh)
+    future.add_done_callback(lambda _: queue.put_nowait(None))
+
+    text = ""
+    last_sections = {}
+    done = False
+    while not done:
+        # Take every chunk that is already queued, so a burst is parsed once
+        deltas = [await queue.get()]
+        while not queue.empty():
+            deltas.append(queue.get_nowait())
+        if None in deltas:
+            done = True
+            deltas = deltas[:deltas.index(None)]
+        if not deltas:
+            continue
+        text += "".join(deltas)
+        sections = extract_partial_sections(text)
+        if sections and sections != last_sections:
+            last_sections = sections
+            on_update(sections)
+    return await future
+
+
+async def research_company_async(name, emails=None, chats=None, refresh=False, on_update=None):
+    """
+    Research a company and draft the proposal sections.
+
+    Args:
+        name: Company name
+        emails: Emails from generate_emails (optional)
+        chats: Teams chats from generate_team_chat (optional)
+        refresh: Bypass cached web research and cached Gemini responses
+        on_update: Optional callable receiving partial sections while the
+            proposal streams in (called on the caller's thread)
+
+    Returns:
+        Dictionary with executive_summary, solution and pricing markdown strings,
+        plus research_context (the gathered context, for regenerate_section)
+    """
+    tavily = get_tavily_client()
+
+    web_context, email_context, chat_context, knowledge_context = await gather_context(
+        name, emails, chats, tavily, refresh=refresh
+    )
+
+    logger.info(f"Generating proposal for {name} using Gemini ({GEMINI_MODEL})...")
+    prompt = build_prompt(name, web_context, email_context, chat_context, knowledge_context)
+    if on_update:
+        data = await _stream_proposal(prompt, on_update, refresh)
+    else:
+        data = await _in_thread(generate_text, prompt, parse=parse_proposal, bypass_cache=refresh)
+    logger.info("Successfully parsed and cleaned response.")
+    data["research_context"] = {
+        "web": web_context, "emails": email_context, "chat": chat_context, "knowledge": knowledge_context
+    }
+    return data
+
+
+def research_flight_key(name, emails=None, chats=None, refresh=False):
+    """
+    Identity of a research request: normalized company name plus a hash of its inputs.
+
+    Email dates and chat timestamps are left out: they are generated relative to
+    the request time, and two reps asking a minute apart should share one run.
+    """
+    emails = [[e.get("sender"), e.get("subject"), e.get("body")] for e in emails or []]
+    chats = [[[m.get("sender"), m.get("content")] for m in chat.get("messages", [])] for chat in chats or []]
+    inputs = json.dumps([emails, chats, refresh], sort_keys=True, default=str)
+    return f"{normalize_company(name)}:{hashlib.sha256(inputs.encode('utf-8')).hexdigest()[:16]}"
+
+
+def run_research(name, emails=None, chats=None, refresh=False, on_update=None):
+    """
+    Synchronous entry point for research_company_async (Streamlit scripts have no running loop).
+
+    Concurrent requests for the same company and inputs share one run: later
+    callers wait for the in-flight research and receive its streamed sections.
+    """
+    def research(publish):
+        with span("research", company=name, refresh=refresh):
+            return asyncio.run(research_company_async(name, emails, chats, refresh=refresh, on_update=publish))
+
+    result = _RESEARCH_FLIGHTS.do(research_flight_key(name, emails, chats, refresh), research, on_update)
+    # Every caller of a flight gets the same object; hand out copies so sessions cannot share state
+    return copy.deepcopy(result)
+
+
+def run_gather_context(name, emails=None, chats=None):
+    """Gather research context synchronously (served from the search cache when possible)."""
+    async def gather():
+        return await gather_context(name, emails, chats, get_tavily_client())
+    web_context, email_context, chat_context, knowledge_context = asyncio.run(gather())
+    return {"web": web_context, "emails": email_context, "chat": chat_context, "knowledge": knowledge_context}
+
+
+def build_section_prompt(name, section_key, sections, research_context, instructions=""):
+    """Build a prompt that rewrites one section, holding the other sections fixed."""
+    label, brief = SECTION_BRIEFS[section_key]
+    fixed_sections = "\n\n".join(
+        f"### {SECTION_BRIEFS[key][0]}\n{sections.get(key, '')}"
+        for key in PROPOSAL_KEYS if key != section_key
+    )
+    extra = f"Additional instructions from the sales rep: {instructions}" if instructions else ""
+    return f"""
+        You are revising one section of a sales proposal from 'NexusCRM' (a CRM software company) to {name}.
+
+        Context gathered:
+        - Web Research: {json.dumps(research_context.get("web", []))}
+        - Recent Email Communications:
+{research_context.get("emails", MOCK_EMAIL)}
+
+        - Teams Discussion:
+{research_context.get("chat", MOCK_TRANSCRIPT)}
+{_knowledge_block(research_context.get("knowledge"))}
+        The other sections of the proposal are final. Keep your rewrite consistent with them:
+{fixed_sections}
+
+        Rewrite only the **{label}** section: {brief}
+        {extra}
+        The value MUST be a plain string (markdown formatted), NOT a nested JSON object.
+
+        Return the output strictly as a JSON object with the single key: "{section_key}".
+        """
+
+
+def regenerate_section(name, section_key, sections, research_context, instructions="", on_update=None):
+    """
+    Regenerate a single proposal section, reusing previously gathered research.
+
+    Args:
+        name: Company name
+        section_key: One of executive_summary, solution, pricing
+        sections: Current section texts keyed by proposal key (kept as fixed input)
+        research_context: research_context from a previous research run
+        instructions: Optional free-text guidance from the rep
+        on_update: Optional callable receiving the partial section text while streaming
+
+    Returns:
+        The new markdown text for the section
+    """
+    if section_key not in SECTION_BRIEFS:
+        raise ValueError(f"Unknown section: {section_key}")
+    prompt = build_section_prompt(name, section_key, sections, research_context, instructions)
+
+    def parse(content):
+        return parse_proposal(content)[section_key]
+
+    logger.info(f"Regenerating {section_key} for {name} using Gemini ({GEMINI_MODEL})...")
+    if on_update:
+        received = ""
+
+        def on_chunk(delta):
+            nonlocal received
+            received += delta
+            partial = extract_partial_sections(received)
+            if section_key in partial:
+                on_update(partial[section_key])
+        return stream_text(prompt, on_chunk, parse=parse)
+    return generate_text(prompt, parse=parse)
@@ -0,0 +1,164 @@
+"""
+Session Memory Module
+Keeps each Streamlit session's state bounded: history caps, collapsed proposal messages and archived drafts.
+
+Every message with a live draft editor or deck preview is re-rendered on each
+rerun, and every live preview keeps a deck render alive. compact_session() keeps
+only the newest editors and previews live and collapses older ones into short
+summaries. A collapsed proposal keeps its draft zlib-compressed, for the newest
+few only, and the oldest messages are dropped once the history grows past its cap.
+
+Limits (read on each call, so they can be tuned without a restart):
+- SPG_MAX_MESSAGES: messages kept in the chat history (default 60)
+- SPG_LIVE_EDITORS: draft editors kept live (default 1)
+- SPG_LIVE_PREVIEWS: deck previews kept live (default 1)
+- SPG_ARCHIVED_DRAFTS: collapsed proposals that keep a compressed draft (default 5)
+"""
+
+import logging
+import os
+import pickle
+import zlib
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_MESSAGES = 60
+DEFAULT_LIVE_EDITORS = 1
+DEFAULT_LIVE_PREVIEWS = 1
+DEFAULT_ARCHIVED_DRAFTS = 5
+
+
+def _limit(name, default, minimum):
+    try:
+        return max(minimum, int(os.getenv(name, default)))
+    except ValueError:
+        logger.warning(f"Ignoring invalid {name}={os.getenv(name)!r}; using {default}")
+        return default
+
+
+def compress_text(text):
+    return zlib.compress(text.encode("utf-8"), 6)
+
+
+def decompress_text(blob):
+    return zlib.decompress(blob).decode("utf-8")
+
+
+def archive_drafts(messages, company_data):
+    """
+    Snapshot the current draft into its live editor messages before the draft is replaced.
+
+    Editors all show the session's single working draft, so a new proposal would
+    otherwise overwrite what the older editor messages displayed.
+    """
+    draft = company_data.get("edited_full_draft")
+    if not draft:
+        return
+    for message in messages:
+        if message.get("show_editor") and "archived_draft" not in message:
+            message["archived_draft"] = compress_text(draft)
+            message["archived_company"] = message.get("company") or company_data.get("name", "")
+
+
+def _collapse_editor(message):
+    message["show_editor"] = False
+    company = message.get("archived_company") or "an earlier account"
+    message["summary"] = f"📝 Earlier proposal draft for **{company}** (collapsed)."
+
+
+def _collapse_preview(message, deck_jobs, send_batches):
+    message["show_download"] = False
+    message["summary"] = "📊 Earlier deck preview (collapsed). Generate a new one from the latest draft."
+    deck_jobs.pop(message.get("id"), None)
+    send_batches.pop(message.get("id"), None)
+
+
+def compact_session(state):
+    """
+    Apply the session limits to st.session_state (or any mapping with the same keys).
+
+    Args:
+        state: Session state holding "messages", "deck_jobs" and "send_batches"
+
+    Returns:
+        Dict with the number of messages collapsed, drafts evicted and messages dropped
+    """
+    messages = state["messages"]
+    deck_jobs = state.get("deck_jobs", {})
+    send_batches = state.get("send_batches", {})
+    collapsed = evicted = dropped = 0
+
+    editors = [m for m in messages if m.get("show_editor")]
+    for message in editors[:-_limit("SPG_LIVE_EDITORS", DEFAULT_LIVE_EDITORS, 1)]:
+        _collapse_editor(message)
+        collapsed += 1
+
+    previews = [m for m in messages if m.get("show_download")]
+    for message in previews[:-_limit("SPG_LIVE_PREVIEWS", DEFAULT_LIVE_PREVIEWS, 1)]:
+        _collapse_preview(message, deck_jobs, send_batches)
+        collapsed += 1
+
+    archived = [m for m in messages if m.get("archived_draft") and not m.get("show_editor")]
+    keep = _limit("SPG_ARCHIVED_DRAFTS", DEFAULT_ARCHIVED_DRAFTS, 0)
+    for message in archived[:max(0, len(archived) - keep)]:
+        del message["archived_draft"]
+        evicted += 1
+
+    max_messages = _limit("SPG_MAX_MESSAGES", DEFAULT_MAX_MESSAGES, 2)
+    if len(messages) > max_messages:
+        live = {id(m) for m in messages if m.get("show_editor") or m.get("show_download")}
+        excess = len(messages) - max_messages
+        kept = []
+        for message in messages:
+            if excess and id(message) not in live:
+                excess -= 1
+                dropped += 1
+                deck_jobs.pop(message.get("id"), None)
+                continue
+            kept.append(message)
+        messages[:] = kept
+        state["dropped_messages"] = state.get("dropped_messages", 0) + dropped
+
+    if collapsed or evicted or dropped:
+        logger.info(f"Session compacted: {collapsed} collapsed, {evicted} drafts evicted, {dropped} messages dropped")
+    return {"collapsed": collapsed, "evicted": evicted, "dropped": dropped}
+
+
+def session_size(state):
+    """
+    Approximate memory held by a session, as pickled bytes per state key.
+
+    Values that cannot be pickled (widget handles, uploaded files) are counted as 0.
+
+    Returns:
+        Dict with "total_bytes", "messages" (count) and "keys" (key -> bytes, largest first)
+    """
+    sizes = {}
+    for key in list(state.keys()):
+        try:
+            sizes[str(key)] = len(pickle.dumps(state[key], protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            sizes[str(key)] = 0
+    return {
+        "total_bytes": sum(sizes.values()),
+        "messages": len(state.get("messages", [])),
+        "keys": dict(sorted(sizes.items(), key=lambda item: item[1], reverse=True)),
+    }
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple((key, _freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def state_fingerprint(value):
+    """
+    Cheap change marker for JSON-like session state (dicts, lists, strings, bytes, numbers).
+
+    Python caches the hash of each str/bytes object, so a rerun that left the
+    messages alone re-hashes only their containers, not their text.
+    """
+    return hash(_freeze(value))
@@ -0,0 +1,565 @@
+"""
+Proposal Store Module
+SQLite persistence for companies, research snapshots, versioned drafts, rendered decks, send events and conversations.
+
+The database runs in WAL mode, so readers never wait for the writer. Writes are
+queued and committed by a single writer thread in batches of up to
+SPG_STORE_BATCH_SIZE operations, at most SPG_STORE_FLUSH_MS after the first one,
+so keystroke-level draft saves and per-recipient send events cost one transaction
+per batch rather than one per row. Reads flush pending writes first.
+
+Large values (research payloads, draft text, deck bytes, conversation state)
+live in BLOB columns that list/latest queries never select; they are only read
+when .load() is called on the returned record.
+
+Old rows are pruned by the writer thread. Each company keeps its newest
+SPG_STORE_KEEP_DECKS decks and SPG_STORE_KEEP_DRAFTS draft versions (plus the
+latest draft of every conversation), and at most once per PRUNE_INTERVAL rows
+older than SPG_STORE_RETENTION_DAYS are deleted from every table but companies.
+SQLite reuses the freed pages, so the file stops growing rather than shrinking.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from dataclasses import dataclass, field
+
+from cache import normalize_company
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_PATH = os.path.join(".cache", "proposals.sqlite")
+DEFAULT_FLUSH_MS = 100
+DEFAULT_BATCH_SIZE = 256
+# Retention, overridable via SPG_STORE_KEEP_DECKS / SPG_STORE_KEEP_DRAFTS /
+# SPG_STORE_RETENTION_DAYS; 0 turns a limit off
+DEFAULT_KEEP_DECKS = 5
+DEFAULT_KEEP_DRAFTS = 50
+DEFAULT_RETENTION_DAYS = 90
+PRUNE_INTERVAL = 3600.0
+# A plain "create proposal" only reopens research this recent (SPG_REOPEN_MAX_AGE_HOURS)
+DEFAULT_REOPEN_MAX_AGE_HOURS = 24
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS companies (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS research (
+    id TEXT PRIMARY KEY,
+    company_id INTEGER NOT NULL REFERENCES companies(id),
+    conversation_id TEXT,
+    created REAL NOT NULL,
+    emails INTEGER NOT NULL,
+    chats INTEGER NOT NULL,
+    payload BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS research_company ON research (company_id, created);
+CREATE TABLE IF NOT EXISTS drafts (
+    id INTEGER PRIMARY KEY,
+    company_id INTEGER NOT NULL REFERENCES companies(id),
+    conversation_id TEXT,
+    version INTEGER NOT NULL,
+    created REAL NOT NULL,
+    source TEXT NOT NULL,
+    sha TEXT NOT NULL,
+    text BLOB NOT NULL,
+    UNIQUE (company_id, version)
+);
+CREATE TABLE IF NOT EXISTS decks (
+    signature TEXT PRIMARY KEY,
+    company_id INTEGER NOT NULL REFERENCES companies(id),
+    created REAL NOT NULL,
+    size INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS decks_company ON decks (company_id, created);
+CREATE TABLE IF NOT EXISTS send_events (
+    id INTEGER PRIMARY KEY,
+    company_id INTEGER NOT NULL REFERENCES companies(id),
+    batch_id TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    error TEXT,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS send_events_company ON send_events (company_id, created);
+CREATE INDEX IF NOT EXISTS send_events_batch ON send_events (batch_id);
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    company_id INTEGER REFERENCES companies(id),
+    updated REAL NOT NULL,
+    state BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS drafts_created ON drafts (created);
+CREATE INDEX IF NOT EXISTS conversations_updated ON conversations (updated);
+"""
+
+# Table -> timestamp column that age-based retention looks at
+_AGED_TABLES = {
+    "research": "created",
+    "drafts": "created",
+    "decks": "created",
+    "send_events": "created",
+    "conversations": "updated",
+}
+
+# Columns added after the first release; older files get them on open
+_ADDED_COLUMNS = [("research", "conversation_id", "TEXT"), ("drafts", "conversation_id", "TEXT")]
+
+
+def _migrate(conn):
+    for table, column, column_type in _ADDED_COLUMNS:
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if column not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+
+def _pack(value):
+    """zlib-compressed JSON; bytes values survive as {"__b64__": ...}."""
+    def default(obj):
+        if isinstance(obj, (bytes, bytearray)):
+            return {"__b64__": base64.b64encode(bytes(obj)).decode("ascii")}
+        raise TypeError(f"Cannot store {type(obj).__name__}")
+    return zlib.compress(json.dumps(value, default=default).encode("utf-8"), 6)
+
+
+def _unpack(blob):
+    def hook(obj):
+        if len(obj) == 1 and "__b64__" in obj:
+            return base64.b64decode(obj["__b64__"])
+        return obj
+    return json.loads(zlib.decompress(blob).decode("utf-8"), object_hook=hook)
+
+
+def text_sha(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class StoredBlob:
+    """Metadata row whose large column is read from disk on load()."""
+    store: "ProposalStore" = field(repr=False)
+    table: str
+    key_column: str
+    key: object
+    blob_column: str
+
+    def _read(self):
+        return self.store._read_blob(self.table, self.key_column, self.key, self.blob_column)
+
+
+@dataclass
+class ResearchSnapshot(StoredBlob):
+    created: float = 0.0
+    emails: int = 0
+    chats: int = 0
+
+    def load(self):
+        """Dict with emails, chats, research_context and results."""
+        return _unpack(self._read())
+
+
+@dataclass
+class DraftVersion(StoredBlob):
+    version: int = 0
+    created: float = 0.0
+    source: str = ""
+    sha: str = ""
+
+    def load(self):
+        return zlib.decompress(self._read()).decode("utf-8")
+
+
+class ProposalStore:
+    """One SQLite file shared by all sessions: a batched writer thread and a locked reader connection."""
+
+    def __init__(self, path, flush_ms=DEFAULT_FLUSH_MS, batch_size=DEFAULT_BATCH_SIZE, keep_decks=DEFAULT_KEEP_DECKS,
+                 keep_drafts=DEFAULT_KEEP_DRAFTS, retention_days=DEFAULT_RETENTION_DAYS):
+        self.path = path
+        self.flush_interval = flush_ms / 1000.0
+        self.batch_size = batch_size
+        self.keep_decks = keep_decks
+        self.keep_drafts = keep_drafts
+        self.retention_days = retention_days
+        self.writes = 0
+        self.transactions = 0
+        self.pruned = 0
+        self._next_prune = 0.0
+        self._queue = queue.Queue()
+        self._draft_shas = {}  # (company key, conversation) -> sha of the last queued draft
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        writer = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        writer.execute("PRAGMA journal_mode=WAL")
+        writer.execute("PRAGMA synchronous=NORMAL")
+        writer.executescript(_SCHEMA)
+        _migrate(writer)
+        self._reader = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._reader_lock = threading.Lock()
+        self._writer = threading.Thread(target=self._write_loop, args=(writer,), name="spg-store-writer", daemon=True)
+        self._writer.start()
+
+    # ----- writer -----
+
+    def _enqueue(self, operation, *args):
+        self._queue.put((operation, args))
+
+    def _write_loop(self, conn):
+        # Items are (operation, args) writes, flush() Events, or None from close()
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and isinstance(batch[-1], tuple):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            operations = [item for item in batch if isinstance(item, tuple)]
+            if operations:
+                self._commit(conn, operations)
+            if time.monotonic() >= self._next_prune:
+                self._next_prune = time.monotonic() + PRUNE_INTERVAL
+                self._prune_expired(conn)
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+            if batch[-1] is None:
+                conn.close()
+                return
+
+    def _commit(self, conn, operations):
+        try:
+            conn.execute("BEGIN")
+            for operation, args in operations:
+                operation(conn, *args)
+            conn.execute("COMMIT")
+        except Exception as e:
+            conn.execute("ROLLBACK")
+            logger.error(f"Store batch of {len(operations)} writes failed, retrying one by one: {e}", exc_info=True)
+            for operation, args in operations:
+                try:
+                    conn.execute("BEGIN")
+                    operation(conn, *args)
+                    conn.execute("COMMIT")
+                except Exception as single_error:
+                    conn.execute("ROLLBACK")
+                    logger.error(f"Dropped store write {operation.__name__}: {single_error}")
+        with self._lock:
+            self.writes += len(operations)
+            self.transactions += 1
+
+    def _prune_expired(self, conn):
+        """Delete rows older than retention_days, in one transaction on the writer connection."""
+        if self.retention_days <= 0:
+            return
+        cutoff = time.time() - self.retention_days * 86400
+        try:
+            conn.execute("BEGIN")
+            deleted = sum(
+                conn.execute(f"DELETE FROM {table} WHERE {column} < ?", (cutoff,)).rowcount
+                for table, column in _AGED_TABLES.items()
+            )
+            conn.execute("COMMIT")
+        except Exception as e:
+            conn.execute("ROLLBACK")
+            logger.error(f"Store retention pass failed: {e}", exc_info=True)
+            return
+        if deleted:
+            logger.info(f"Store retention removed {deleted} rows older than {self.retention_days} days")
+        with self._lock:
+            self.pruned += deleted
+
+    def flush(self, timeout=10.0):
+        """Block until every write queued so far is committed."""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=10.0):
+        """Commit queued writes, stop the writer thread and close both connections."""
+        self._queue.put(None)
+        self._writer.join(timeout)
+        with self._reader_lock:
+            self._reader.close()
+
+    @staticmethod
+    def _company_id(conn, name, now):
+        key = normalize_company(name)
+        row = conn.execute("SELECT id FROM companies WHERE key = ?", (key,)).fetchone()
+        if row:
+            conn.execute("UPDATE companies SET name = ?, updated = ? WHERE id = ?", (name, now, row[0]))
+            return row[0]
+        return conn.execute(
+            "INSERT INTO companies (key, name, created, updated) VALUES (?, ?, ?, ?)", (key, name, now, now)
+        ).lastrowid
+
+    @staticmethod
+    def _insert_research(conn, research_id, name, conversation_id, payload, emails, chats, now):
+        company_id = ProposalStore._company_id(conn, name, now)
+        conn.execute(
+            "INSERT INTO research (id, company_id, conversation_id, created, emails, chats, payload) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (research_id, company_id, conversation_id, now, emails, chats, payload),
+        )
+
+    @staticmethod
+    def _insert_draft(conn, name, conversation_id, text, sha, source, now):
+        company_id = ProposalStore._company_id(conn, name, now)
+        latest = conn.execute(
+            "SELECT sha FROM drafts WHERE company_id = ? AND conversation_id IS ? ORDER BY version DESC LIMIT 1",
+            (company_id, conversation_id),
+        ).fetchone()
+        if latest and latest[0] == sha:
+            return
+        # Versions count up per company, across conversations
+        version = conn.execute("SELECT MAX(version) FROM drafts WHERE company_id = ?", (company_id,)).fetchone()[0]
+        conn.execute(
+            "INSERT INTO drafts (company_id, conversation_id, version, created, source, sha, text) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (company_id, conversation_id, (version or 0) + 1, now, source, sha, zlib.compress(text.encode("utf-8"), 6)),
+        )
+
+    @staticmethod
+    def _insert_deck(conn, name, signature, data, now):
+        company_id = ProposalStore._company_id(conn, name, now)
+        conn.execute(
+            "INSERT OR IGNORE INTO decks (signature, company_id, created, size, data) VALUES (?, ?, ?, ?, ?)",
+            (signature, company_id, now, len(data), data),
+        )
+
+    def _trim_decks(self, conn, name):
+        """Keep the company's newest keep_decks decks."""
+        if self.keep_decks <= 0:
+            return
+        company_id = ProposalStore._company_id(conn, name, time.time())
+        deleted = conn.execute(
+            "DELETE FROM decks WHERE company_id = ? AND signature NOT IN "
+            "(SELECT signature FROM decks WHERE company_id = ? ORDER BY created DESC LIMIT ?)",
+            (company_id, company_id, self.keep_decks),
+        ).rowcount
+        with self._lock:
+            self.pruned += deleted
+
+    def _trim_drafts(self, conn, name):
+        """Keep the company's newest keep_drafts versions and each conversation's latest one."""
+        if self.keep_drafts <= 0:
+            return
+        company_id = ProposalStore._company_id(conn, name, time.time())
+        deleted = conn.execute(
+            "DELETE FROM drafts WHERE company_id = ? "
+            "AND version <= (SELECT MAX(version) FROM drafts WHERE company_id = ?) - ? "
+            "AND id NOT IN (SELECT MAX(id) FROM drafts WHERE company_id = ? GROUP BY conversation_id)",
+            (company_id, company_id, self.keep_drafts, company_id),
+        ).rowcount
+        with self._lock:
+            self.pruned += deleted
+
+    @staticmethod
+    def _insert_send_event(conn, name, batch_id, recipient, status, attempts, error, now):
+        company_id = ProposalStore._company_id(conn, name, now)
+        conn.execute(
+            "INSERT INTO send_events (company_id, batch_id, recipient, status, attempts, error, created) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (company_id, batch_id, recipient, status, attempts, error, now),
+        )
+
+    @staticmethod
+    def _upsert_conversation(conn, conversation_id, name, state, now):
+        company_id = ProposalStore._company_id(conn, name, now) if name else None
+        conn.execute(
+            "INSERT OR REPLACE INTO conversations (id, company_id, updated, state) VALUES (?, ?, ?, ?)",
+            (conversation_id, company_id, now, state),
+        )
+
+    def save_research(self, name, emails, chats, research_context, results, conversation_id=None):
+        """
+        Queue a research snapshot for a company, made in `conversation_id`.
+
+        Returns:
+            The snapshot ID (usable before the write is committed)
+        """
+        research_id = uuid.uuid4().hex[:16]
+        payload = _pack({"emails": emails, "chats": chats, "research_context": research_context, "results": results})
+        self._enqueue(
+            self._insert_research, research_id, name, conversation_id, payload,
+            len(emails or []), len(chats or []), time.time(),
+        )
+        return research_id
+
+    def save_draft(self, name, text, source="edit", conversation_id=None):
+        """Queue a new draft version unless the text matches the latest version saved from the same conversation."""
+        if not name or not text:
+            return False
+        sha = text_sha(text)
+        key = (normalize_company(name), conversation_id)
+        with self._lock:
+            if self._draft_shas.get(key) == sha:
+                return False
+            self._draft_shas[key] = sha
+        self._enqueue(self._insert_draft, name, conversation_id, text, sha, source, time.time())
+        self._enqueue(self._trim_drafts, name)
+        return True
+
+    def save_deck(self, name, signature, data):
+        self._enqueue(self._insert_deck, name, signature, data, time.time())
+        self._enqueue(self._trim_decks, name)
+
+    def record_send(self, name, batch_id, recipient, status, attempts=1, error=None):
+        self._enqueue(self._insert_send_event, name, batch_id, recipient, status, attempts, error, time.time())
+
+    def save_conversation(self, conversation_id, name, state, previous=None):
+        """
+        Queue the serializable part of a session (messages, draft, theme) for restore on reload.
+
+        Returns:
+            Digest of the saved state; nothing is queued when it equals `previous`
+        """
+        packed = _pack(state)
+        digest = hashlib.sha256(packed).hexdigest()
+        if digest != previous:
+            self._enqueue(self._upsert_conversation, conversation_id, name, packed, time.time())
+        return digest
+
+    # ----- reader -----
+
+    def _query(self, sql, params=(), flush=True):
+        if flush:
+            self.flush()
+        with self._reader_lock:
+            return self._reader.execute(sql, params).fetchall()
+
+    def _read_blob(self, table, key_column, key, blob_column):
+        rows = self._query(f"SELECT {blob_column} FROM {table} WHERE {key_column} = ?", (key,), flush=False)
+        return rows[0][0] if rows else None
+
+    def _company_row(self, name):
+        rows = self._query("SELECT id, name FROM companies WHERE key = ?", (normalize_company(name),))
+        return rows[0] if rows else None
+
+    def latest_research(self, name, conversation_id=None, max_age_hours=None):
+        """
+        Most recent ResearchSnapshot for a company (payload not loaded), or None.
+
+        Args:
+            name: Company name
+            conversation_id: Only consider research made in this conversation
+            max_age_hours: Only consider research at most this old
+        """
+        company = self._company_row(name)
+        if company is None:
+            return None
+        sql = "SELECT id, created, emails, chats FROM research WHERE company_id = ?"
+        params = [company[0]]
+        if conversation_id is not None:
+            sql += " AND conversation_id = ?"
+            params.append(conversation_id)
+        if max_age_hours is not None:
+            sql += " AND created >= ?"
+            params.append(time.time() - max_age_hours * 3600)
+        rows = self._query(sql + " ORDER BY created DESC LIMIT 1", params, flush=False)
+        if not rows:
+            return None
+        research_id, created, emails, chats = rows[0]
+        return ResearchSnapshot(self, "research", "id", research_id, "payload", created, emails, chats)
+
+    def research(self, research_id):
+        rows = self._query("SELECT id, created, emails, chats FROM research WHERE id = ?", (research_id,))
+        if not rows:
+            return None
+        research_id, created, emails, chats = rows[0]
+        return ResearchSnapshot(self, "research", "id", research_id, "payload", created, emails, chats)
+
+    def draft_versions(self, name, conversation_id=None):
+        """DraftVersion metadata for a company, newest first (text not loaded); optionally from one conversation only."""
+        company = self._company_row(name)
+        if company is None:
+            return []
+        sql = "SELECT id, version, created, source, sha FROM drafts WHERE company_id = ?"
+        params = [company[0]]
+        if conversation_id is not None:
+            sql += " AND conversation_id = ?"
+            params.append(conversation_id)
+        rows = self._query(sql + " ORDER BY version DESC", params, flush=False)
+        return [DraftVersion(self, "drafts", "id", row[0], "text", *row[1:]) for row in rows]
+
+    def latest_draft(self, name, conversation_id=None):
+        versions = self.draft_versions(name, conversation_id)
+        return versions[0] if versions else None
+
+    def deck(self, signature):
+        """Stored deck bytes for a deck signature, or None."""
+        rows = self._query("SELECT data FROM decks WHERE signature = ?", (signature,), flush=False)
+        return rows[0][0] if rows else None
+
+    def send_events(self, name):
+        """Send events for a company, newest first."""
+        company = self._company_row(name)
+        if company is None:
+            return []
+        rows = self._query(
+            "SELECT batch_id, recipient, status, attempts, error, created FROM send_events "
+            "WHERE company_id = ? ORDER BY created DESC",
+            (company[0],), flush=False,
+        )
+        keys = ("batch_id", "recipient", "status", "attempts", "error", "created")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def load_conversation(self, conversation_id):
+        rows = self._query("SELECT state FROM conversations WHERE id = ?", (conversation_id,))
+        return _unpack(rows[0][0]) if rows else None
+
+    def stats(self):
+        counts = {}
+        for table in ("companies", "research", "drafts", "decks", "send_events", "conversations"):
+            counts[table] = self._query(f"SELECT COUNT(*) FROM {table}", flush=False)[0][0]
+        with self._lock:
+            counts.update({
+                "pending_writes": self._queue.qsize(),
+                "writes": self.writes,
+                "pruned": self.pruned,
+                "transactions": self.transactions,
+                "writes_per_transaction": self.writes / self.transactions if self.transactions else 0.0,
+            })
+        return counts
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Shared ProposalStore at SPG_STORE_PATH (default .cache/proposals.sqlite); a changed path closes the old one."""
+    global _store
+    with _store_lock:
+        path = os.getenv("SPG_STORE_PATH", DEFAULT_STORE_PATH)
+        if _store is None or _store.path != path:
+            if _store is not None:
+                _store.close()
+            _store = ProposalStore(
+                path,
+                flush_ms=float(os.getenv("SPG_STORE_FLUSH_MS", DEFAULT_FLUSH_MS)),
+                batch_size=int(os.getenv("SPG_STORE_BATCH_SIZE", DEFAULT_BATCH_SIZE)),
+                keep_decks=int(os.getenv("SPG_STORE_KEEP_DECKS", DEFAULT_KEEP_DECKS)),
+                keep_drafts=int(os.getenv("SPG_STORE_KEEP_DRAFTS", DEFAULT_KEEP_DRAFTS)),
+                retention_days=float(os.getenv("SPG_STORE_RETENTION_DAYS", DEFAULT_RETENTION_DAYS)),
+            )
+        return _store
@@ -1,90 +1,163 @@
 """
 Teams Chat Generator Module
 Generates realistic Teams group chat conversations for the Sales Proposal Copilot.
+
+generate_team_chat(company) returns the 12-message opportunity chat the app
+shows. With a count it builds a synthetic chat instead: iter_chat_messages()
+streams any number of messages from a seeded RNG, oldest first, so load tests
+can use chat histories of realistic size and get the same chat on every run.
 """
 
 from datetime import datetime, timedelta
+from functools import lru_cache
+import logging
+import os
 import random
 
-def generate_team_chat(company_name: str):
+from email_generator import anchor_time
+
+logger = logging.getLogger(__name__)
+
+TIMESTAMP_FORMAT = "%b %d, %I:%M %p"
+
+# Synthetic chats end around here unless a `now` is given, so a seed always yields the same messages
+CORPUS_NOW = datetime(2025, 1, 15, 17, 30)
+
+# Mean minutes between consecutive synthetic messages
+MEAN_GAP_MINUTES = 20
+
+PARTICIPANTS = (
+    "Alex Rivera (Sales Rep)",
+    "Jordan Lee (Account Manager)",
+    "Sam Chen (Solution Architect)",
+)
+
+# Extra participants in synthetic chats
+EXTRA_PARTICIPANTS = (
+    "Morgan Blake (Sales Engineer)",
+    "Riley Shah (Deal Desk)",
+    "Casey Nguyen (Customer Success)",
+    "Taylor Brooks (Sales Manager)",
+)
+
+# (participant index, time before now, content); content uses {company}
+SCRIPT = (
+    (0, timedelta(days=6, hours=2), "Hey team, I just got off a call with the decision makers at {company}. They're really interested in upgrading their CRM."),
+    (1, timedelta(days=6, hours=1, minutes=45), "That's great news! What are their main pain points?"),
+    (0, timedelta(days=6, hours=1, minutes=30), "They mentioned three big issues:\n1. Data silos between departments\n2. Current system is way too slow\n3. No AI capabilities - they're falling behind competitors"),
+    (2, timedelta(days=6, hours=1, minutes=15), "Those are exactly the problems NexusCRM solves. Did they mention budget?"),
+    (0, timedelta(days=6, hours=1), "Yes! They have around $50k/year allocated. Their CFO already got approval from leadership."),
+    (1, timedelta(days=6, hours=0, minutes=45), "Perfect, that fits our Enterprise tier. What's their timeline?"),
+    (0, timedelta(days=6, hours=0, minutes=30), "They want to implement in Q1. It's tied to their fiscal year planning."),
+    (2, timedelta(days=6, hours=0, minutes=20), "Q1 is doable. I'll need to understand their current tech stack. Do they have any integration requirements?"),
+    (0, timedelta(days=6, hours=0, minutes=10), "Their IT Director mentioned they need to integrate with Salesforce, Teams, Outlook, and their custom billing system. Mobile support is also critical for their field sales team."),
+    (1, timedelta(days=6, hours=0, minutes=5), "All standard integrations for us. I'll start drafting the proposal. Can you send over any notes from the call?"),
+    (0, timedelta(days=6), "Will do. I also have email threads with their Sales Director and VP of Marketing that provide more context on their pain points."),
+    (2, timedelta(days=5, hours=23, minutes=55), "Great work Alex! {company} sounds like an ideal fit for NexusCRM. Let's make sure we highlight our AI features and data unification capabilities in the proposal."),
+)
+
+# Additional lines mixed into synthetic chats
+EXTRA_LINES = (
+    "Quick update: {company} asked for a follow-up demo focused on reporting.",
+    "Their security team sent over a questionnaire. Can someone from engineering take a look?",
+    "Procurement at {company} wants pricing for a 3-year term as well.",
+    "I shared the ROI calculator with their CFO. They liked the productivity numbers.",
+    "Can we get a reference customer in the same industry as {company}?",
+    "Their current contract auto-renews next quarter, so timing matters.",
+    "Pilot group of 20 reps confirmed for the first month.",
+    "They want Teams and Outlook integration live on day one.",
+    "Heads up: a competitor is also in the evaluation at {company}.",
+    "Legal review of the MSA should be done by end of week.",
+)
+
+
+def synthetic_settings():
+    """
+    Synthetic corpus size and seed from SPG_SYNTHETIC_CHAT_MESSAGES / SPG_SYNTHETIC_SEED.
+
+    Returns:
+        Tuple of (count or None for the default messages, seed)
+    """
+    try:
+        count = int(os.getenv("SPG_SYNTHETIC_CHAT_MESSAGES", "0"))
+        seed = int(os.getenv("SPG_SYNTHETIC_SEED", "0"))
+    except ValueError:
+        logger.warning("Ignoring invalid SPG_SYNTHETIC_CHAT_MESSAGES/SPG_SYNTHETIC_SEED")
+        return None, 0
+    return (count if count > 0 else None), seed
+
+
+@lru_cache(maxsize=32)
+def _lines(company_name):
+    """Every chat line formatted for a company, once: the script lines, then the extras."""
+    return tuple(content.format(company=company_name) for _, _, content in SCRIPT) + tuple(
+        line.format(company=company_name) for line in EXTRA_LINES
+    )
+
+
+def iter_chat_messages(company_name: str, count: int, seed: int = 0, now: datetime = None):
+    """
+    Stream synthetic Teams messages about a company's CRM deal, oldest first.
+
+    Messages are produced lazily; the same seed and `now` give the same messages.
+
+    Args:
+        company_name: The name of the company to generate chat for
+        count: Number of messages to yield
+        seed: Seed for the RNG that picks senders, lines and timestamps
+        now: Roughly when the last message is sent (default CORPUS_NOW)
+
+    Yields:
+        Message dictionaries with sender, timestamp and content
+    """
+    rng = random.Random(seed)
+    lines = _lines(company_name)
+    participants = PARTICIPANTS + EXTRA_PARTICIPANTS
+    when = (now or CORPUS_NOW) - timedelta(minutes=(1 + MEAN_GAP_MINUTES) * count)
+    for _ in range(count):
+        yield {
+            "sender": rng.choice(participants),
+            "timestamp": when.strftime(TIMESTAMP_FORMAT),
+            "content": rng.choice(lines),
+        }
+        when += timedelta(minutes=1 + rng.expovariate(1 / MEAN_GAP_MINUTES))
+
+
+def generate_team_chat(company_name: str, count: int = None, seed: int = None, now: datetime = None):
     """
     Generate a realistic Teams group chat about a company's CRM needs.
-    
+
     Args:
         company_name: The name of the company to generate chat for
-        
+        count: Build a synthetic chat of this many messages (see iter_chat_messages)
+            instead of the 12-message opportunity chat (default SPG_SYNTHETIC_CHAT_MESSAGES, if set)
+        seed: Seed for reproducible senders, lines and timestamps (with a count)
+        now: Current time for the default chat's timestamps (see email_generator.anchor_time)
+
     Returns:
         Dictionary with chat title and list of messages
     """
-    
-    # Generate timestamps for the last week
-    base_time = datetime.now()
-    
-    messages = [
-        {
-            "sender": "Alex Rivera (Sales Rep)",
-            "timestamp": (base_time - timedelta(days=6, hours=2)).strftime("%b %d, %I:%M %p"),
-            "content": f"Hey team, I just got off a call with the decision makers at {company_name}. They're really interested in upgrading their CRM."
-        },
-        {
-            "sender": "Jordan Lee (Account Manager)",
-            "timestamp": (base_time - timedelta(days=6, hours=1, minutes=45)).strftime("%b %d, %I:%M %p"),
-            "content": "That's great news! What are their main pain points?"
-        },
-        {
-            "sender": "Alex Rivera (Sales Rep)",
-            "timestamp": (base_time - timedelta(days=6, hours=1, minutes=30)).strftime("%b %d, %I:%M %p"),
-            "content": f"They mentioned three big issues:\n1. Data silos between departments\n2. Current system is way too slow\n3. No AI capabilities - they're falling behind competitors"
-        },
-        {
-            "sender": "Sam Chen (Solution Architect)",
-            "timestamp": (base_time - timedelta(days=6, hours=1, minutes=15)).strftime("%b %d, %I:%M %p"),
-            "content": "Those are exactly the problems NexusCRM solves. Did they mention budget?"
-        },
-        {
-            "sender": "Alex Rivera (Sales Rep)",
-            "timestamp": (base_time - timedelta(days=6, hours=1)).strftime("%b %d, %I:%M %p"),
-            "content": f"Yes! They have around $50k/year allocated. Their CFO already got approval from leadership."
-        },
-        {
-            "sender": "Jordan Lee (Account Manager)",
-            "timestamp": (base_time - timedelta(days=6, hours=0, minutes=45)).strftime("%b %d, %I:%M %p"),
-            "content": "Perfect, that fits our Enterprise tier. What's their timeline?"
-        },
-        {
-            "sender": "Alex Rivera (Sales Rep)",
-            "timestamp": (base_time - timedelta(days=6, hours=0, minutes=30)).strftime("%b %d, %I:%M %p"),
-            "content": "They want to implement in Q1. It's tied to their fiscal year planning."
-        },
-        {
-            "sender": "Sam Chen (Solution Architect)",
-            "timestamp": (base_time - timedelta(days=6, hours=0, minutes=20)).strftime("%b %d, %I:%M %p"),
-            "content": f"Q1 is doable. I'll need to understand their current tech stack. Do they have any integration requirements?"
-        },
-        {
-            "sender": "Alex Rivera (Sales Rep)",
-            "timestamp": (base_time - timedelta(days=6, hours=0, minutes=10)).strftime("%b %d, %I:%M %p"),
-            "content": f"Their IT Director mentioned they need to integrate with Salesforce, Teams, Outlook, and their custom billing system. Mobile support is also critical for their field sales team."
-        },
-        {
-            "sender": "Jordan Lee (Account Manager)",
-            "timestamp": (base_time - timedelta(days=6, hours=0, minutes=5)).strftime("%b %d, %I:%M %p"),
-            "content": "All standard integrations for us. I'll start drafting the proposal. Can you send over any notes from the call?"
-        },
-        {
-            "sender": "Alex Rivera (Sales Rep)",
-            "timestamp": (base_time - timedelta(days=6)).strftime("%b %d, %I:%M %p"),
-            "content": "Will do. I also have email threads with their Sales Director and VP of Marketing that provide more context on their pain points."
-        },
-        {
-            "sender": "Sam Chen (Solution Architect)",
-            "timestamp": (base_time - timedelta(days=5, hours=23, minutes=55)).strftime("%b %d, %I:%M %p"),
-            "content": f"Great work Alex! {company_name} sounds like an ideal fit for NexusCRM. Let's make sure we highlight our AI features and data unification capabilities in the proposal."
-        }
-    ]
-    
+    if count is None and seed is None:
+        count, seed = synthetic_settings()
+    if count is not None:
+        participants = PARTICIPANTS + EXTRA_PARTICIPANTS
+        messages = list(iter_chat_messages(company_name, count, seed=seed or 0))
+    else:
+        # Timestamps over the last week
+        participants = PARTICIPANTS
+        base_time = anchor_time(company_name, now)
+        lines = _lines(company_name)
+        messages = [
+            {
+                "sender": PARTICIPANTS[sender],
+                "timestamp": (base_time - ago).strftime(TIMESTAMP_FORMAT),
+                "content": lines[i],
+            }
+            for i, (sender, ago, _) in enumerate(SCRIPT)
+        ]
+
     return {
         "title": f"💼 {company_name} - CRM Opportunity",
-        "participants": ["Alex Rivera (Sales Rep)", "Jordan Lee (Account Manager)", "Sam Chen (Solution Architect)"],
+        "participants": list(participants),
         "messages": messages
     }
@@ -0,0 +1,51 @@
+import os
+
+from benchmark import NOISE_FLOOR_MS, TOLERANCES, compare, run_benchmarks
+
+
+def timing(p50, minimum):
+    return {"p50_ms": p50, "min_ms": minimum}
+
+
+def regressed(current, previous, name="context_build", threshold=0.25):
+    [(_, _, _, _, flagged)] = compare({name: current}, {name: previous}, threshold)
+    return flagged
+
+
+def test_regression_needs_median_and_minimum_to_grow():
+    assert regressed(timing(200, 180), timing(100, 90))
+    # A few slow iterations move the median but not the fastest run
+    assert not regressed(timing(200, 92), timing(100, 90))
+
+
+def test_noise_floor_and_threshold():
+    assert not regressed(timing(1.5, 1.4), timing(0.5, 0.4))
+    assert not regressed(timing(120, 110), timing(100, 90))
+    assert regressed(timing(100 + NOISE_FLOOR_MS * 20, 100), timing(50, 50))
+
+
+def test_per_scenario_tolerance():
+    name = "generate_pptx_cold"
+    growth = (TOLERANCES[name] + 0.25) / 2
+    current, previous = timing(100 * (1 + growth), 100 * (1 + growth)), timing(100, 100)
+    assert regressed(current, previous)
+    assert not regressed(current, previous, name=name)
+
+
+def test_baseline_without_minimum_compares_medians():
+    assert regressed(timing(200, 180), {"p50_ms": 100})
+
+
+def test_scenarios_missing_from_the_baseline_are_skipped():
+    assert compare({"context_build": timing(1, 1)}, {}) == []
+
+
+def test_run_benchmarks_restores_the_environment(monkeypatch):
+    monkeypatch.setenv("TAVILY_API_KEY", "tvly-real")
+    monkeypatch.delenv("GEMINI_RPM", raising=False)
+    before = dict(os.environ)
+
+    report = run_benchmarks(["parse_draft"], iterations=1)
+
+    assert "parse_draft" in report["results"]
+    assert dict(os.environ) == before
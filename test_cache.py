@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+
+import pytest
+
+import cache as cache_module
+import research_pipeline
+from cache import DiskCache, search_cache_key
+from research_pipeline import cached_search
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A controllable time source for entry ages and LRU order."""
+    now = [1_000_000.0]
+    monkeypatch.setattr(cache_module, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def make_cache(tmp_path, ttl_seconds=3600, max_entries=100):
+    return DiskCache(str(tmp_path / "cache.sqlite"), "test_entries", ttl_seconds=ttl_seconds, max_entries=max_entries)
+
+
+def test_hits_and_misses_are_counted(tmp_path):
+    cache = make_cache(tmp_path)
+    assert cache.get("a") is None
+    cache.set("a", {"value": [1, 2]})
+    assert cache.get("a") == {"value": [1, 2]}
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_expired_entries_are_misses_and_removed(tmp_path, clock):
+    cache = make_cache(tmp_path, ttl_seconds=60)
+    cache.set("a", "fresh")
+
+    clock[0] += 59
+    assert cache.get("a") == "fresh"
+
+    clock[0] += 2
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["misses"] == 1
+
+
+def test_least_recently_read_entry_is_evicted(tmp_path, clock):
+    cache = make_cache(tmp_path, max_entries=2)
+    cache.set("a", 1)
+    clock[0] += 1
+    cache.set("b", 2)
+    clock[0] += 1
+    # Reading "a" makes "b" the least recently used entry
+    assert cache.get("a") == 1
+    clock[0] += 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["entries"] == 2
+
+
+class CountingTavily:
+    def __init__(self):
+        self.queries = []
+
+    def search(self, query, search_depth):
+        self.queries.append(query)
+        return {"results": [{"url": "https://acme.example", "content": f"result {len(self.queries)}"}]}
+
+
+def test_refresh_bypasses_and_overwrites_the_search_cache(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path)
+    monkeypatch.setattr(research_pipeline, "get_search_cache", lambda: cache)
+    tavily = CountingTavily()
+
+    first = cached_search(tavily, "Acme Corp", "{name} CRM news")
+    assert cached_search(tavily, "Acme Corp", "{name} CRM news") == first
+    assert tavily.queries == ["Acme Corp CRM news"]
+
+    refreshed = cached_search(tavily, "Acme Corp", "{name} CRM news", refresh=True)
+    assert len(tavily.queries) == 2
+    assert refreshed != first
+    assert cache.get(search_cache_key("Acme Corp", "{name} CRM news", "advanced")) == refreshed
@@ -0,0 +1,45 @@
+import pytest
+
+from clients import client_stats, get_gemini_client, get_tavily_client, set_client_factory
+
+
+@pytest.fixture
+def created(monkeypatch):
+    """Fresh registry whose factory records every client it builds."""
+    built = []
+
+    def factory(provider, api_key, pool_size):
+        client = object()
+        built.append((provider, api_key, client))
+        return client
+
+    monkeypatch.setenv("TAVILY_API_KEY", "tvly-test")
+    monkeypatch.setenv("GEMINI_API_KEY", "gemini-test")
+    monkeypatch.delenv("SPG_CASSETTE_MODE", raising=False)
+    set_client_factory(factory)
+    yield built
+    set_client_factory(None)
+
+
+def test_second_call_reuses_the_client(created):
+    tavily = get_tavily_client()
+    gemini = get_gemini_client()
+    assert get_tavily_client() is tavily
+    assert get_gemini_client() is gemini
+    assert [provider for provider, _, _ in created] == ["tavily", "gemini"]
+
+    stats = client_stats()
+    for provider in ("tavily", "gemini"):
+        assert (stats[provider]["created"], stats[provider]["acquired"], stats[provider]["reused"]) == (1, 2, 1)
+        assert stats[provider]["reuse_rate"] == 0.5
+
+
+def test_rotated_key_creates_a_new_client(created, monkeypatch):
+    first = get_tavily_client()
+    monkeypatch.setenv("TAVILY_API_KEY", "tvly-rotated")
+    second = get_tavily_client()
+
+    assert second is not first
+    assert created[-1][1] == "tvly-rotated"
+    assert client_stats()["tavily"]["created"] == 2
+    assert get_tavily_client() is second
@@ -0,0 +1,69 @@
+from context_builder import assemble_context, chat_candidates, email_candidates, relevance
+
+
+def email(subject, body, date="2025-01-10"):
+    return {"sender": "John Smith", "date": date, "subject": subject, "body": body}
+
+
+def chat(*contents):
+    return [{"messages": [
+        {"sender": "Sarah", "timestamp": f"10:0{i}", "content": content} for i, content in enumerate(contents)
+    ]}]
+
+
+def test_relevance_matches_whole_words():
+    assert relevance("He said she would email us to maintain it") == 0
+    assert relevance("We need AI features") == 2
+    assert relevance("Our budget needs approvals") == 2
+    assert relevance("Integrating the strategic investment") == 3
+
+
+def test_relevance_is_capped_per_section():
+    pricing_only = "budget cost price pricing roi revenue spend"
+    assert relevance(pricing_only) == 3
+
+
+def test_assemble_context_stays_within_budget():
+    emails = email_candidates([email(f"Update {i}", "Budget approval for the CRM. " * 20) for i in range(10)])
+    chats = chat_candidates(chat(*["We need AI scoring and Outlook integration."] * 10))
+    budget = 400
+
+    _, email_context, chat_context, _ = assemble_context([], emails, chats, budget=budget)
+
+    selected = [c for c in emails if c["text"] in email_context] + [c for c in chats if c["text"] in chat_context]
+    assert {c["source"] for c in selected} == {"email", "chat"}
+    assert sum(c["tokens"] for c in selected) <= budget
+    assert len(selected) < len(emails) + len(chats)
+
+
+def test_assemble_context_takes_the_best_of_each_source_first():
+    emails = email_candidates([
+        email("Lunch", "See you at noon."),
+        email("Budget", "Our budget is $50k and the ROI must show by Q1."),
+    ])
+    chats = chat_candidates(chat("Nice weather today", "We struggle with data silos and slow performance"))
+    budget = emails[1]["tokens"] + chats[1]["tokens"]
+
+    _, email_context, chat_context, _ = assemble_context([], emails, chats, budget=budget)
+
+    assert email_context == emails[1]["text"]
+    assert chat_context == chats[1]["text"]
+
+
+def test_assemble_context_keeps_original_order():
+    emails = email_candidates([
+        email("Newest", "Budget approved.", date="2025-02-01"),
+        email("Older", "We are struggling with silos and slow performance.", date="2025-01-01"),
+    ])
+    _, email_context, _, _ = assemble_context([], emails, [], budget=10_000)
+    assert email_context.index("Newest") < email_context.index("Older")
+
+
+def test_empty_and_missing_sources():
+    emails = email_candidates([email("Budget", "Budget is $50k. " * 50)])
+    _, email_context, chat_context, knowledge_context = assemble_context([], emails, [], budget=10)
+
+    # Candidates that do not fit leave an empty context; a source without candidates is None
+    assert email_context == ""
+    assert chat_context is None
+    assert knowledge_context is None
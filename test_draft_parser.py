@@ -0,0 +1,67 @@
+from draft_parser import build_full_draft, draft_sections, parse_draft, replace_section
+
+SECTIONS = {
+    "executive_summary": "- Data silos\n- Slow CRM",
+    "solution": "NexusCRM AI",
+    "pricing": "$48k/year",
+}
+
+PREAMBLE = "# Proposal for Acme Corp\nPrepared by the NexusCRM team\n"
+
+
+def test_replace_section_keeps_other_sections():
+    draft = build_full_draft(SECTIONS)
+    updated = replace_section(draft, "Investment", "$30k/year, phased")
+    parsed = parse_draft(updated)
+    assert parsed.body("Investment") == "$30k/year, phased"
+    assert parsed.body("Executive Summary") == SECTIONS["executive_summary"]
+    assert parsed.body("Solution") == SECTIONS["solution"]
+
+
+def test_replace_section_preserves_preamble():
+    draft = PREAMBLE + "\n" + build_full_draft(SECTIONS)
+    for title in ("Executive Summary", "Solution", "Investment"):
+        updated = replace_section(draft, title, "New body")
+        assert updated.startswith(PREAMBLE + "\n## Executive Summary\n")
+        parsed = parse_draft(updated)
+        assert parsed.preamble == PREAMBLE.strip("\n")
+        assert parsed.body(title) == "New body"
+
+
+def test_preamble_without_summary_header_is_the_summary():
+    draft = "Intro paragraph\n\n## Solution\nNexusCRM AI"
+    assert parse_draft(draft).body("Executive Summary") == "Intro paragraph"
+
+    updated = replace_section(draft, "Executive Summary", "New summary")
+    assert updated.startswith("Intro paragraph\n\n## Executive Summary\nNew summary\n")
+    parsed = parse_draft(updated)
+    assert parsed.preamble == "Intro paragraph"
+    assert parsed.body("Executive Summary") == "New summary"
+    assert parsed.body("Solution") == "NexusCRM AI"
+
+
+def test_parse_draft_header_styles_and_bullets():
+    draft = (
+        "# Understanding Your Needs\n- Data silos\n* Slow CRM\n\n"
+        "**The NexusCRM Solution**\n1. AI scoring\n2) Outlook sync\n\n"
+        "## Pricing\nAbout $48k/year"
+    )
+    parsed = parse_draft(draft)
+    assert [section.title for section in parsed.sections] == ["Executive Summary", "Solution", "Investment"]
+    assert parsed.get("Executive Summary").header == "# Understanding Your Needs"
+    assert parsed.get("Executive Summary").bullets == ("Data silos", "Slow CRM")
+    assert parsed.get("Solution").bullets == ("AI scoring", "Outlook sync")
+    assert parsed.body("Investment") == "About $48k/year"
+    assert parsed.body("Missing", default="n/a") == "n/a"
+
+
+def test_repeated_header_continues_the_section():
+    parsed = parse_draft("## Solution\nFirst part\n## Investment\n$48k\n## Solution\nSecond part")
+    assert [section.title for section in parsed.sections] == ["Solution", "Investment"]
+    assert parsed.body("Solution") == "First part\nSecond part"
+
+
+def test_parse_draft_is_memoized():
+    draft = build_full_draft(SECTIONS)
+    assert parse_draft(draft) is parse_draft(draft)
+    assert draft_sections(draft) == SECTIONS
@@ -0,0 +1,174 @@
+import threading
+import time
+
+import pytest
+
+from jobs import CANCELLED, JobCancelled, JobManager, SingleFlight, checkpoint
+from rate_limit import RateLimiter
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def call_in_threads(flight, key, func, count):
+    """Start `count` callers of flight.do(key); returns (threads, results by caller, updates by caller)."""
+    results, updates = [None] * count, [[] for _ in range(count)]
+
+    def caller(i):
+        try:
+            results[i] = flight.do(key, func, updates[i].append)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results, updates
+
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight("test", max_workers=4)
+    release = threading.Event()
+    calls = []
+
+    def work(publish):
+        calls.append(1)
+        publish("half")
+        release.wait(5)
+        publish("done")
+        return {"sections": 3}
+
+    threads, results, updates = call_in_threads(flight, "acme", work, 3)
+    wait_for(lambda: flight.stats()["coalesced"] == 2)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results[0] == {"sections": 3}
+    assert all(result is results[0] for result in results)
+    # A caller that joined late still gets the latest update before the next one
+    assert all(caller_updates == ["half", "done"] for caller_updates in updates)
+    assert flight.stats() == {"in_flight": 0, "executions": 1, "coalesced": 2}
+
+
+def test_errors_reach_every_caller():
+    flight = SingleFlight("test", max_workers=2)
+    release = threading.Event()
+
+    def work(publish):
+        release.wait(5)
+        raise RuntimeError("Tavily down")
+
+    threads, results, _ = call_in_threads(flight, "acme", work, 2)
+    wait_for(lambda: flight.stats()["coalesced"] == 1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_work_is_cancelled_once_every_caller_detaches():
+    flight = SingleFlight("test", max_workers=2)
+    cancelled = threading.Event()
+
+    def work(publish):
+        while True:
+            try:
+                publish("tick")
+            except JobCancelled:
+                cancelled.set()
+                raise
+            time.sleep(0.01)
+
+    def leave(update):
+        raise JobCancelled()
+
+    with pytest.raises(JobCancelled):
+        flight.do("acme", work, leave)
+    assert cancelled.wait(5)
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight("test", max_workers=2)
+    assert flight.do("acme", lambda publish: "acme") == "acme"
+    assert flight.do("globex", lambda publish: "globex") == "globex"
+    assert flight.stats()["executions"] == 2
+
+
+def test_checkpoint_is_a_no_op_outside_jobs():
+    checkpoint()
+
+
+def test_cancel_takes_effect_at_the_next_checkpoint():
+    manager = JobManager(max_workers=1)
+    started, release = threading.Event(), threading.Event()
+    reached = []
+
+    def work(job):
+        started.set()
+        release.wait(5)
+        checkpoint()
+        reached.append("search")
+
+    job = manager.submit("research", work)
+    assert started.wait(5)
+    assert manager.cancel(job.id)
+    release.set()
+    wait_for(lambda: job.done)
+
+    assert job.status == CANCELLED
+    assert reached == []
+
+
+def test_cancel_stops_a_job_queued_behind_the_limiter():
+    manager = JobManager(max_workers=2)
+    limiter = RateLimiter("test", 6000, max_concurrency=1)
+    holding, release = threading.Event(), threading.Event()
+    calls = []
+
+    def hold():
+        holding.set()
+        release.wait(5)
+
+    manager.submit("holder", lambda job: limiter.call(hold))
+    assert holding.wait(5)
+    waiting = manager.submit("research", lambda job: limiter.call(calls.append, "gemini"))
+    time.sleep(0.05)
+    manager.cancel(waiting.id)
+    wait_for(lambda: waiting.done)
+    release.set()
+
+    assert waiting.status == CANCELLED
+    assert calls == []
+    assert limiter.stats()["failures"] == 0
+
+
+def test_cancelled_job_leaves_its_flight_without_an_update():
+    manager = JobManager(max_workers=1)
+    flight = SingleFlight("test", max_workers=1)
+    started, release, stopped = threading.Event(), threading.Event(), threading.Event()
+
+    def work(publish):
+        started.set()
+        release.wait(5)
+        try:
+            checkpoint()
+        except JobCancelled:
+            stopped.set()
+            raise
+        return "draft"
+
+    job = manager.submit("research", lambda job: flight.do("acme", work, job.set_progress))
+    assert started.wait(5)
+    manager.cancel(job.id)
+    # The job stops waiting although the work has not published anything
+    wait_for(lambda: job.done)
+    assert job.status == CANCELLED
+
+    release.set()
+    assert stopped.wait(5)
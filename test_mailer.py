@@ -0,0 +1,100 @@
+import pytest
+
+import rate_limit
+from fakes import FakeSMTPServer
+from mailer import FAILED, SENT, Mailer, smtp_settings
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    server = FakeSMTPServer(seed=0).start()
+    for key, value in server.env().items():
+        monkeypatch.setenv(key, value)
+    monkeypatch.setenv("SMTP_MAX_RETRIES", "2")
+    # A fresh limiter well above the 30/min default, and millisecond backoff between retries
+    monkeypatch.setitem(rate_limit._limiters, "smtp", rate_limit.RateLimiter("smtp", 6000, 2))
+    monkeypatch.setattr(rate_limit, "BASE_BACKOFF", 0.001)
+    yield server
+    server.stop()
+
+
+def deliver(recipients, workers=1):
+    """Send one proposal and wait for every recipient; returns the batch, on_result calls and mailer."""
+    mailer = Mailer(smtp_settings(), workers=workers)
+    results = []
+    batch = mailer.send(
+        recipients, "Proposal", "Please find our proposal attached.", attachment=b"deck",
+        on_result=lambda batch_id, email, state: results.append((batch_id, email, state)),
+    )
+    mailer.close()
+    return batch, results, mailer
+
+
+def test_recipients_share_one_connection(smtp):
+    recipients = [f"rep{i}@acme.example" for i in range(5)]
+    batch, _, mailer = deliver(recipients)
+
+    assert {email: state["status"] for email, state in batch.status().items()} == dict.fromkeys(recipients, SENT)
+    assert [message[1] for message in smtp.messages] == [[email] for email in recipients]
+    assert b"To: rep0@acme.example" in smtp.messages[0][2]
+    assert smtp.connections == 1
+    assert mailer.pool.stats()["created"] == 1
+    assert mailer.pool.stats()["reused"] == 4
+
+
+def test_transient_rejection_is_retried(smtp):
+    smtp.error_rate = 1.0
+    batch, _, _ = deliver(["cto@acme.example"])
+
+    state = batch.status()["cto@acme.example"]
+    assert state["status"] == FAILED
+    assert state["attempts"] == 3  # first try plus SMTP_MAX_RETRIES
+    assert state["error"].startswith("451")
+    # A 4xx reply leaves the connection usable
+    assert smtp.connections == 1
+
+
+def test_transient_rejections_eventually_deliver(smtp, monkeypatch):
+    monkeypatch.setenv("SMTP_MAX_RETRIES", "10")
+    smtp.error_rate = 0.5
+    recipients = [f"rep{i}@acme.example" for i in range(6)]
+    batch, _, _ = deliver(recipients)
+
+    status = batch.status()
+    assert all(state["status"] == SENT for state in status.values())
+    assert sum(state["attempts"] for state in status.values()) > len(recipients)
+    assert len(smtp.messages) == len(recipients)
+
+
+def test_permanent_rejection_is_not_retried(smtp):
+    smtp.reject.add("gone@acme.example")
+    batch, _, _ = deliver(["gone@acme.example", "cto@acme.example"])
+
+    status = batch.status()
+    assert status["gone@acme.example"]["status"] == FAILED
+    assert status["gone@acme.example"]["attempts"] == 1
+    assert status["gone@acme.example"]["error"].startswith("550")
+    assert status["cto@acme.example"]["status"] == SENT
+    assert [message[1] for message in smtp.messages] == [["cto@acme.example"]]
+
+
+def test_on_result_reports_each_recipient_once(smtp):
+    smtp.reject.add("gone@acme.example")
+    smtp.error_rate = 0.5
+    recipients = ["gone@acme.example", "cto@acme.example", "cfo@acme.example"]
+    batch, results, _ = deliver(recipients, workers=2)
+
+    assert sorted(email for _, email, _ in results) == sorted(recipients)
+    assert {batch_id for batch_id, _, _ in results} == {batch.id}
+    for _, email, state in results:
+        assert state == batch.status()[email]
+        assert state["status"] in (SENT, FAILED)
+
+
+def test_unconfigured_sender_fails_without_connecting(smtp, monkeypatch):
+    monkeypatch.setenv("EMAIL_SENDER", "")
+    batch, results, _ = deliver(["cto@acme.example"])
+
+    assert batch.status()["cto@acme.example"]["status"] == FAILED
+    assert [email for _, email, _ in results] == ["cto@acme.example"]
+    assert smtp.connections == 0
@@ -0,0 +1,98 @@
+import threading
+import time
+
+import pytest
+
+import rate_limit
+from rate_limit import RateLimiter, is_retryable
+
+
+class APIError(Exception):
+    def __init__(self, code):
+        super().__init__(f"{code} error")
+        self.code = code
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(rate_limit, "BASE_BACKOFF", 0.001)
+
+
+def flaky(failures):
+    """A call that raises each of `failures` in turn, then returns "ok"."""
+    remaining = list(failures)
+
+    def call():
+        if remaining:
+            raise remaining.pop(0)
+        return "ok"
+    return call
+
+
+def test_retryable_errors():
+    assert is_retryable(APIError(429))
+    assert is_retryable(APIError(503))
+    assert not is_retryable(APIError(400))
+    assert is_retryable(Exception("429 RESOURCE_EXHAUSTED"))
+    assert not is_retryable(ValueError("bad JSON"))
+
+
+def test_throttling_is_retried_and_halves_the_rate():
+    limiter = RateLimiter("test", 6000, 4, max_retries=4)
+    assert limiter.call(flaky([APIError(429), APIError(429)])) == "ok"
+
+    stats = limiter.stats()
+    assert (stats["calls"], stats["retries"], stats["throttled"], stats["failures"]) == (3, 2, 2, 0)
+    # Halved twice, then one success recovers 5% of the configured rate
+    assert stats["rate_per_min"] == pytest.approx(6000 * (0.25 + 0.05))
+
+
+def test_gives_up_after_max_retries_and_on_client_errors():
+    limiter = RateLimiter("test", 6000, 4, max_retries=2)
+    with pytest.raises(APIError):
+        limiter.call(flaky([APIError(500)] * 5))
+    with pytest.raises(APIError):
+        limiter.call(flaky([APIError(400)]))
+
+    stats = limiter.stats()
+    assert (stats["calls"], stats["retries"], stats["failures"]) == (4, 2, 2)
+
+
+def test_concurrency_gate():
+    limiter = RateLimiter("test", 60000, 2)
+    lock = threading.Lock()
+    active, peak = [0], [0]
+
+    def work():
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+
+    threads = [threading.Thread(target=limiter.call, args=(work,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert peak[0] == 2
+    stats = limiter.stats()
+    assert stats["calls"] == 8 and stats["in_flight"] == 0
+    # Callers beyond the two slots queued for the running ones
+    assert stats["queue_wait_max"] >= 0.015
+
+
+def test_token_bucket_spaces_calls_beyond_the_burst():
+    # 600/min = one call per 100 ms, with a burst of 2
+    limiter = RateLimiter("test", 600, 2)
+    start = time.monotonic()
+    for _ in range(4):
+        limiter.call(lambda: None)
+    elapsed = time.monotonic() - start
+
+    assert elapsed >= 0.18
+    stats = limiter.stats()
+    assert stats["queue_wait_max"] >= 0.08
+    assert stats["queue_wait_mean"] <= stats["queue_wait_p95"] <= stats["queue_wait_max"]
@@ -0,0 +1,48 @@
+from datetime import datetime
+
+from cache import response_cache_key
+from context_builder import assemble_context, chat_candidates, email_candidates
+from email_generator import generate_emails
+from llm import GEMINI_MODEL
+from research_pipeline import build_prompt, research_flight_key
+from teams_generator import generate_team_chat
+
+
+def prompt_at(now, company="Acme Corp"):
+    emails = generate_emails(company, now=now)
+    chats = [generate_team_chat(company, now=now)]
+    _, email_context, chat_context, _ = assemble_context([], email_candidates(emails), chat_candidates(chats))
+    return build_prompt(company, [], email_context, chat_context)
+
+
+def test_prompt_is_stable_within_a_day():
+    morning = prompt_at(datetime(2025, 3, 4, 10, 0, 50))
+    later = prompt_at(datetime(2025, 3, 4, 10, 1, 5))
+    evening = prompt_at(datetime(2025, 3, 4, 18, 45))
+    assert response_cache_key(GEMINI_MODEL, morning) == response_cache_key(GEMINI_MODEL, later)
+    assert response_cache_key(GEMINI_MODEL, morning) == response_cache_key(GEMINI_MODEL, evening)
+
+
+def test_generated_dates_follow_the_day():
+    today = generate_emails("Acme Corp", now=datetime(2025, 3, 4, 10, 0))
+    tomorrow = generate_emails("Acme Corp", now=datetime(2025, 3, 5, 10, 0))
+    assert [e["body"] for e in today] == [e["body"] for e in tomorrow]
+    assert [e["date"] for e in today] != [e["date"] for e in tomorrow]
+
+
+def test_flight_key_ignores_generated_dates():
+    def inputs(now):
+        return generate_emails("Acme Corp", now=now), [generate_team_chat("Acme Corp", now=now)]
+
+    first = research_flight_key("Acme Corp", *inputs(datetime(2025, 3, 4, 10, 0, 50)))
+    second = research_flight_key("ACME corp ", *inputs(datetime(2025, 3, 5, 10, 1, 5)))
+    assert first == second
+    assert first.startswith("acme corp:")
+
+
+def test_flight_key_separates_different_requests():
+    emails, chats = generate_emails("Acme Corp"), [generate_team_chat("Acme Corp")]
+    key = research_flight_key("Acme Corp", emails, chats)
+    assert research_flight_key("Acme Corp", emails, chats, refresh=True) != key
+    assert research_flight_key("Acme Corp", emails[1:], chats) != key
+    assert research_flight_key("Globex", emails, chats) != key
@@ -0,0 +1,28 @@
+from session_memory import compact_session, state_fingerprint
+
+
+def conversation():
+    return {
+        "messages": [
+            {"role": "assistant", "content": "Draft one", "show_editor": True, "id": 1},
+            {"role": "assistant", "content": "Draft two", "show_editor": True, "id": 2},
+        ],
+        "message_seq": 2,
+        "company_data": {"name": "Acme Corp", "ppt_theme": {"bg_color": [255, 255, 255]}},
+    }
+
+
+def test_fingerprint_is_stable_for_unchanged_state():
+    assert state_fingerprint(conversation()) == state_fingerprint(conversation())
+
+
+def test_fingerprint_follows_in_place_changes():
+    state = conversation()
+    before = state_fingerprint(state)
+
+    compact_session(state)
+    collapsed = state_fingerprint(state)
+    assert collapsed != before
+
+    state["company_data"]["ppt_theme"]["bg_color"][0] = 0
+    assert state_fingerprint(state) != collapsed
@@ -0,0 +1,133 @@
+import sqlite3
+import time
+
+import pytest
+
+import store
+from store import ProposalStore, get_store
+
+
+@pytest.fixture
+def proposals(tmp_path):
+    proposal_store = ProposalStore(str(tmp_path / "proposals.sqlite"), flush_ms=1)
+    yield proposal_store
+    proposal_store.close()
+
+
+def test_research_round_trip(proposals):
+    research_id = proposals.save_research(
+        "Acme Corp", [{"subject": "Budget"}], [], "context", {"full_draft": "draft"}, conversation_id="c1",
+    )
+    snapshot = proposals.latest_research("acme corp")
+
+    assert snapshot.key == research_id
+    assert (snapshot.emails, snapshot.chats) == (1, 0)
+    assert snapshot.load()["research_context"] == "context"
+    assert proposals.latest_research("Acme Corp", conversation_id="c2") is None
+    assert proposals.latest_research("Globex") is None
+
+
+def test_drafts_are_versioned_per_company_and_scoped_by_conversation(proposals):
+    assert proposals.save_draft("Acme Corp", "first", conversation_id="c1")
+    assert not proposals.save_draft("Acme Corp", "first", conversation_id="c1")
+    assert proposals.save_draft("Acme Corp", "second", conversation_id="c2")
+    assert proposals.save_draft("Acme Corp", "third", conversation_id="c1")
+
+    assert [v.version for v in proposals.draft_versions("Acme Corp")] == [3, 2, 1]
+    assert proposals.latest_draft("Acme Corp").load() == "third"
+    assert proposals.latest_draft("Acme Corp", conversation_id="c2").load() == "second"
+
+
+def test_conversation_is_not_requeued_when_unchanged(proposals):
+    state = {"messages": [{"role": "user", "content": "hi"}], "deck": b"\x00\x01"}
+    digest = proposals.save_conversation("c1", "Acme Corp", state)
+    proposals.flush()
+    writes = proposals.stats()["writes"]
+
+    assert proposals.save_conversation("c1", "Acme Corp", state, previous=digest) == digest
+    proposals.flush()
+    assert proposals.stats()["writes"] == writes
+    assert proposals.load_conversation("c1") == state
+
+
+def test_old_decks_and_drafts_are_trimmed(tmp_path):
+    proposals = ProposalStore(str(tmp_path / "proposals.sqlite"), flush_ms=1, keep_decks=2, keep_drafts=2)
+    try:
+        for i in range(4):
+            proposals.save_deck("Acme Corp", f"sig{i}", b"deck")
+            proposals.flush()
+        proposals.save_draft("Acme Corp", "kept by its conversation", conversation_id="old")
+        for i in range(4):
+            proposals.save_draft("Acme Corp", f"draft {i}", conversation_id="new")
+
+        assert [proposals.deck(f"sig{i}") for i in range(4)] == [None, None, b"deck", b"deck"]
+        assert [v.version for v in proposals.draft_versions("Acme Corp")] == [5, 4, 1]
+        assert proposals.stats()["pruned"] == 4
+    finally:
+        proposals.close()
+
+
+def test_retention_removes_expired_rows(tmp_path, monkeypatch):
+    path = str(tmp_path / "proposals.sqlite")
+    old = ProposalStore(path, flush_ms=1)
+    monkeypatch.setattr(store.time, "time", lambda: 1_000_000.0)
+    old.save_draft("Acme Corp", "ancient", conversation_id="c1")
+    old.save_conversation("c1", "Acme Corp", {"messages": []})
+    old.flush()
+    monkeypatch.undo()
+    old.close()
+
+    proposals = ProposalStore(path, flush_ms=1, retention_days=30)
+    try:
+        proposals.save_draft("Acme Corp", "recent", conversation_id="c2")
+        assert [v.load() for v in proposals.draft_versions("Acme Corp")] == ["recent"]
+        assert proposals.load_conversation("c1") is None
+        assert proposals.stats()["pruned"] == 2
+    finally:
+        proposals.close()
+
+
+def test_older_files_gain_conversation_columns(tmp_path):
+    path = str(tmp_path / "proposals.sqlite")
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        "CREATE TABLE research (id TEXT PRIMARY KEY, company_id INTEGER NOT NULL, created REAL NOT NULL, "
+        "emails INTEGER NOT NULL, chats INTEGER NOT NULL, payload BLOB NOT NULL);"
+        "CREATE TABLE drafts (id INTEGER PRIMARY KEY, company_id INTEGER NOT NULL, version INTEGER NOT NULL, "
+        "created REAL NOT NULL, source TEXT NOT NULL, sha TEXT NOT NULL, text BLOB NOT NULL, UNIQUE (company_id, version));"
+    )
+    conn.close()
+
+    proposals = ProposalStore(path, flush_ms=1)
+    try:
+        proposals.save_draft("Acme Corp", "draft", conversation_id="c1")
+        assert proposals.latest_draft("Acme Corp", conversation_id="c1").load() == "draft"
+    finally:
+        proposals.close()
+
+
+def test_close_commits_pending_writes_and_stops_the_writer(tmp_path):
+    path = str(tmp_path / "proposals.sqlite")
+    proposals = ProposalStore(path, flush_ms=10_000)
+    proposals.save_draft("Acme Corp", "queued", conversation_id="c1")
+    proposals.close()
+
+    assert not proposals._writer.is_alive()
+    reopened = ProposalStore(path, flush_ms=1)
+    try:
+        assert reopened.latest_draft("Acme Corp").load() == "queued"
+    finally:
+        reopened.close()
+
+
+def test_changing_the_path_closes_the_previous_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, "_store", None)
+    monkeypatch.setenv("SPG_STORE_PATH", str(tmp_path / "first.sqlite"))
+    first = get_store()
+    assert get_store() is first
+
+    monkeypatch.setenv("SPG_STORE_PATH", str(tmp_path / "second.sqlite"))
+    second = get_store()
+    assert second is not first
+    assert not first._writer.is_alive()
+    second.close()
@@ -0,0 +1,79 @@
+import pytest
+
+import themes
+from pptx_builder import DEFAULT_THEME
+from themes import COLORS, MODES, PALETTES, ThemeError, ThemeResolver, parse_suggestion
+
+NAVY, GOLD, WHITE = list(COLORS["navy"]), list(COLORS["gold"]), list(COLORS["white"])
+
+
+def test_roles_name_the_colour_before_them():
+    theme = parse_suggestion("Navy background with white text and gold accents", DEFAULT_THEME)
+    assert theme == {"bg_color": NAVY, "title_color": GOLD, "body_color": WHITE, "accent_color": GOLD}
+
+
+def test_role_before_colour():
+    assert parse_suggestion("accents in gold", DEFAULT_THEME)["accent_color"] == GOLD
+    assert parse_suggestion("gold accents", DEFAULT_THEME)["accent_color"] == GOLD
+
+
+def test_colour_pair_is_background_and_accent():
+    theme = parse_suggestion("navy and gold", DEFAULT_THEME)
+    assert theme["bg_color"] == NAVY
+    assert theme["accent_color"] == GOLD
+    # Body text is switched to a readable colour on the dark background
+    assert themes.contrast(theme["body_color"], theme["bg_color"]) >= 4.5
+
+
+def test_modes_and_palettes():
+    assert parse_suggestion("dark mode", DEFAULT_THEME) == MODES["dark"]
+    assert parse_suggestion("Ocean theme please", DEFAULT_THEME) == PALETTES["ocean"]
+    assert parse_suggestion("dark mode with orange accents", DEFAULT_THEME)["bg_color"] == MODES["dark"]["bg_color"]
+
+
+def test_modifiers_and_multi_word_names():
+    # A table entry wins over modifier + colour
+    assert parse_suggestion("light blue background", DEFAULT_THEME)["bg_color"] == list(COLORS["light blue"])
+    assert parse_suggestion("forest green background", DEFAULT_THEME)["bg_color"] == list(COLORS["forest green"])
+    dark_red = parse_suggestion("dark red background", DEFAULT_THEME)["bg_color"]
+    assert dark_red == [round(c * 0.6) for c in COLORS["red"]]
+
+
+def test_hex_codes():
+    assert parse_suggestion("#fc0 titles", DEFAULT_THEME)["title_color"] == [255, 204, 0]
+    assert parse_suggestion("#1A2B3C background", DEFAULT_THEME)["bg_color"] == [26, 43, 60]
+
+
+def test_unknown_words_are_not_guessed():
+    assert parse_suggestion("make it sparkly and festive", DEFAULT_THEME) is None
+    assert parse_suggestion("please", DEFAULT_THEME) is None
+
+
+def test_resolver_caches_and_falls_back_to_gemini(monkeypatch):
+    calls = []
+
+    def fake_llm(suggestion, current_theme):
+        calls.append(suggestion)
+        return dict(MODES["light"])
+
+    monkeypatch.setattr(themes, "_llm_theme", fake_llm)
+    resolver = ThemeResolver()
+
+    assert resolver.resolve("Navy and gold", DEFAULT_THEME)["bg_color"] == NAVY
+    assert resolver.resolve("navy  AND gold", DEFAULT_THEME)["bg_color"] == NAVY
+    assert resolver.resolve("something festive", DEFAULT_THEME) == MODES["light"]
+    assert calls == ["something festive"]
+
+    stats = resolver.stats()
+    assert (stats["local"], stats["llm"], stats["cache_hits"]) == (1, 1, 1)
+
+
+def test_resolver_reports_gemini_failures(monkeypatch):
+    def failing_llm(suggestion, current_theme):
+        raise ThemeError("no theme")
+
+    monkeypatch.setattr(themes, "_llm_theme", failing_llm)
+    resolver = ThemeResolver()
+    with pytest.raises(ThemeError):
+        resolver.resolve("something festive", DEFAULT_THEME)
+    assert resolver.stats()["llm_failures"] == 1
@@ -0,0 +1,70 @@
+import pytest
+
+import thread_summary
+from cache import DiskCache
+from context_builder import estimate_tokens
+from thread_summary import chunk_items, summarize_items, thread_brief
+
+
+def messages(count, start=0):
+    return [f"Sarah (10:{i:02d}): Message {i} about the CRM budget and data silos." for i in range(start, start + count)]
+
+
+@pytest.fixture
+def prompts(monkeypatch, tmp_path):
+    """Isolated summary cache and a stand-in Gemini that records every prompt it gets."""
+    cache = DiskCache(str(tmp_path / "cache.sqlite"), "thread_summary", ttl_seconds=3600, max_entries=1000)
+    monkeypatch.setattr(thread_summary, "get_summary_cache", lambda: cache)
+    seen = []
+
+    def fake_generate(prompt):
+        seen.append(prompt)
+        return f"- summary {len(seen)}"
+
+    monkeypatch.setattr(thread_summary, "generate_text", fake_generate)
+    return seen
+
+
+def test_chunks_respect_the_token_limit():
+    chunks = chunk_items(messages(50), max_tokens=100)
+    assert len(chunks) > 1
+    assert all(sum(estimate_tokens(item) for item in chunk.split("\n\n")) <= 100 for chunk in chunks)
+    assert "\n\n".join(chunks) == "\n\n".join(messages(50))
+
+
+def test_appending_only_changes_the_last_chunk():
+    before = chunk_items(messages(40), max_tokens=100)
+    after = chunk_items(messages(45), max_tokens=100)
+    assert after[:len(before) - 1] == before[:-1]
+    assert after[len(before) - 1].startswith(before[-1])
+
+
+def test_oversized_item_is_truncated_not_split():
+    long_item = "x" * 2000
+    chunks = chunk_items(["short", long_item, "tail"], max_tokens=100)
+    assert chunks == ["short", "x" * 400, "tail"]
+
+
+def test_new_messages_only_regenerate_the_tail(prompts):
+    summarize_items("Teams messages", messages(40), chunk_tokens=100, fanout=2)
+    first_run = len(prompts)
+    assert first_run > 1
+
+    prompts.clear()
+    summarize_items("Teams messages", messages(40), chunk_tokens=100, fanout=2)
+    assert prompts == []
+
+    summarize_items("Teams messages", messages(42), chunk_tokens=100, fanout=2)
+    map_prompts = [p for p in prompts if p.startswith("Summarize these")]
+    assert len(map_prompts) == 1
+    assert "Message 41" in map_prompts[0]
+    assert len(prompts) < first_run
+
+
+def test_short_threads_are_not_summarized(prompts, monkeypatch):
+    monkeypatch.setenv("SUMMARY_THRESHOLD_TOKENS", "1000")
+    assert thread_brief("Teams messages", messages(3)) is None
+    assert prompts == []
+
+    brief = thread_brief("Teams messages", messages(200))
+    assert brief.startswith("Summary of 200 Teams messages:\n- summary")
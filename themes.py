@@ -0,0 +1,399 @@
+"""
+Theme Resolver Module
+Turns deck theme suggestions into RGB themes locally, falling back to Gemini for free-form requests.
+
+The local resolver understands named colours ("navy", "forest green", "dark red"),
+hex codes ("#1a2b3c", "#fc0"), dark/light mode, named palettes ("ocean",
+"corporate") and roles ("gold accents", "white text", "navy background",
+"X with Y accents", "X and Y"). Anything with words it does not know goes to
+Gemini. Results are cached by suggestion and current theme; theme_stats()
+reports cache hits and how often each path was used.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from pptx_builder import DEFAULT_THEME
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THEME_CACHE_SIZE = 512
+
+THEME_KEYS = ("bg_color", "title_color", "body_color", "accent_color")
+
+COLORS = {
+    "black": (0, 0, 0),
+    "white": (255, 255, 255),
+    "off white": (248, 246, 240),
+    "ivory": (255, 255, 240),
+    "cream": (255, 253, 208),
+    "beige": (245, 245, 220),
+    "gray": (128, 128, 128),
+    "silver": (192, 192, 192),
+    "charcoal": (54, 69, 79),
+    "slate": (112, 128, 144),
+    "graphite": (65, 66, 68),
+    "red": (200, 30, 45),
+    "crimson": (220, 20, 60),
+    "maroon": (128, 0, 0),
+    "burgundy": (128, 0, 32),
+    "wine": (114, 47, 55),
+    "coral": (255, 127, 80),
+    "salmon": (250, 128, 114),
+    "pink": (255, 105, 180),
+    "hot pink": (255, 20, 147),
+    "rose": (255, 0, 127),
+    "magenta": (255, 0, 255),
+    "orange": (255, 140, 0),
+    "amber": (255, 191, 0),
+    "peach": (255, 218, 185),
+    "yellow": (255, 215, 0),
+    "gold": (212, 175, 55),
+    "mustard": (225, 173, 1),
+    "brown": (121, 85, 61),
+    "tan": (210, 180, 140),
+    "bronze": (205, 127, 50),
+    "copper": (184, 115, 51),
+    "green": (0, 128, 0),
+    "lime": (50, 205, 50),
+    "mint": (152, 255, 152),
+    "olive": (128, 128, 0),
+    "sage": (188, 184, 138),
+    "emerald": (0, 155, 119),
+    "forest green": (34, 139, 34),
+    "teal": (0, 128, 128),
+    "turquoise": (64, 224, 208),
+    "cyan": (0, 200, 220),
+    "aqua": (0, 255, 255),
+    "blue": (0, 102, 204),
+    "sky blue": (135, 206, 235),
+    "light blue": (173, 216, 230),
+    "royal blue": (65, 105, 225),
+    "cobalt": (0, 71, 171),
+    "azure": (0, 127, 255),
+    "navy": (0, 32, 96),
+    "navy blue": (0, 32, 96),
+    "midnight blue": (25, 25, 112),
+    "indigo": (75, 0, 130),
+    "purple": (102, 51, 153),
+    "violet": (143, 0, 255),
+    "lavender": (181, 126, 220),
+    "lilac": (200, 162, 200),
+    "plum": (142, 69, 133),
+    "neon": (57, 255, 20),
+    "neon green": (57, 255, 20),
+    "neon pink": (255, 16, 240),
+    "neon blue": (31, 81, 255),
+    # NexusCRM / Microsoft 365 brand blue used by the default theme
+    "brand": (0, 120, 212),
+    "microsoft blue": (0, 120, 212),
+}
+
+MODES = {
+    "dark": {"bg_color": [32, 33, 36], "title_color": [255, 255, 255], "body_color": [232, 234, 237], "accent_color": [138, 180, 248]},
+    "light": {"bg_color": [255, 255, 255], "title_color": [0, 120, 212], "body_color": [50, 49, 48], "accent_color": [0, 120, 212]},
+}
+
+# Whole-phrase palettes ("ocean", "corporate theme", "reset")
+PALETTES = {
+    "default": DEFAULT_THEME,
+    "reset": DEFAULT_THEME,
+    "original": DEFAULT_THEME,
+    "corporate": {"bg_color": [255, 255, 255], "title_color": [0, 51, 102], "body_color": [64, 64, 64], "accent_color": [0, 102, 204]},
+    "professional": {"bg_color": [250, 250, 250], "title_color": [31, 56, 100], "body_color": [60, 60, 60], "accent_color": [0, 112, 192]},
+    "minimal": {"bg_color": [255, 255, 255], "title_color": [33, 33, 33], "body_color": [85, 85, 85], "accent_color": [150, 150, 150]},
+    "monochrome": {"bg_color": [255, 255, 255], "title_color": [0, 0, 0], "body_color": [40, 40, 40], "accent_color": [110, 110, 110]},
+    "high contrast": {"bg_color": [0, 0, 0], "title_color": [255, 255, 0], "body_color": [255, 255, 255], "accent_color": [0, 255, 255]},
+    "ocean": {"bg_color": [0, 53, 84], "title_color": [144, 224, 239], "body_color": [230, 244, 248], "accent_color": [0, 180, 216]},
+    "forest": {"bg_color": [27, 67, 50], "title_color": [183, 228, 199], "body_color": [240, 247, 242], "accent_color": [82, 183, 136]},
+    "sunset": {"bg_color": [255, 244, 230], "title_color": [214, 40, 40], "body_color": [60, 40, 30], "accent_color": [247, 127, 0]},
+    "pastel": {"bg_color": [253, 247, 250], "title_color": [126, 100, 160], "body_color": [80, 80, 90], "accent_color": [162, 210, 255]},
+    "midnight": {"bg_color": [10, 17, 40], "title_color": [255, 255, 255], "body_color": [210, 215, 230], "accent_color": [100, 149, 237]},
+    "cyberpunk": {"bg_color": [13, 2, 33], "title_color": [255, 16, 240], "body_color": [230, 230, 250], "accent_color": [0, 255, 255]},
+}
+
+_ROLES = {
+    "background": "bg_color", "backgrounds": "bg_color", "bg": "bg_color", "backdrop": "bg_color",
+    "title": "title_color", "titles": "title_color", "heading": "title_color", "headings": "title_color",
+    "header": "title_color", "headers": "title_color", "headline": "title_color", "headlines": "title_color",
+    "text": "body_color", "body": "body_color", "font": "body_color", "fonts": "body_color", "copy": "body_color",
+    "accent": "accent_color", "accents": "accent_color", "highlight": "accent_color", "highlights": "accent_color",
+    "details": "accent_color", "trim": "accent_color", "pop": "accent_color", "pops": "accent_color",
+}
+
+_MODIFIERS = {"dark": 0.6, "deep": 0.5, "light": 1.6, "pale": 1.8, "bright": 1.2, "soft": 1.4}
+
+_STOPWORDS = {
+    "a", "an", "the", "and", "with", "plus", "in", "on", "for", "to", "of", "use", "using", "make", "it", "its",
+    "please", "more", "some", "mode", "theme", "themed", "style", "colors", "color", "scheme", "palette",
+    "look", "slides", "slide", "deck", "change", "switch", "set", "try", "go", "i", "want", "like", "would",
+    "let", "lets", "s", "but", "instead", "tone", "tones", "shade", "shades", "ish", "everything",
+}
+
+_TOKEN = re.compile(r"#(?:[0-9a-f]{6}|[0-9a-f]{3})\b|[a-z]+")
+_MAX_PHRASE = max(len(name.split()) for name in list(COLORS) + list(PALETTES))
+
+
+class ThemeError(ValueError):
+    """A suggestion could not be turned into a valid theme."""
+
+
+def _hex(token):
+    digits = token[1:]
+    if len(digits) == 3:
+        digits = "".join(c * 2 for c in digits)
+    return tuple(int(digits[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def _scale(rgb, factor):
+    if factor < 1:
+        return tuple(round(c * factor) for c in rgb)
+    # Lighten towards white
+    mix = min(1.0, factor - 1)
+    return tuple(round(c + (255 - c) * mix) for c in rgb)
+
+
+def _luminance(rgb):
+    def channel(c):
+        c /= 255
+        return c / 12.92 if c <= 0.03928 else ((c + 0.055) / 1.055) ** 2.4
+    r, g, b = (channel(c) for c in rgb)
+    return 0.2126 * r + 0.7152 * g + 0.0722 * b
+
+
+def contrast(a, b):
+    """WCAG contrast ratio between two RGB colours (1 to 21)."""
+    high, low = sorted((_luminance(a), _luminance(b)), reverse=True)
+    return (high + 0.05) / (low + 0.05)
+
+
+def _tokens(text):
+    text = text.lower().replace("colour", "color").replace("grey", "gray").replace("-", " ")
+    return _TOKEN.findall(text)
+
+
+def parse_suggestion(suggestion, current_theme):
+    """
+    Resolve a suggestion without the LLM.
+
+    Returns:
+        Theme dict, or None when the suggestion uses words the resolver doesn't know
+    """
+    tokens = _tokens(suggestion)
+    content = [t for t in tokens if t not in _STOPWORDS]
+    if not content:
+        return None
+
+    phrase = " ".join(content)
+    if phrase in PALETTES:
+        return {key: list(PALETTES[phrase][key]) for key in THEME_KEYS}
+
+    mode = None
+    colors = []  # [rgb, role or None]
+    pending_role = None
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token.startswith("#"):
+            colors.append([_hex(token), pending_role])
+            pending_role = None
+            i += 1
+            continue
+        # Longest colour name starting here, optionally after a dark/light modifier
+        factor = _MODIFIERS.get(token)
+        start = i + 1 if factor else i
+        for size in range(_MAX_PHRASE, 0, -1):
+            name = " ".join(tokens[start:start + size])
+            if len(tokens[start:start + size]) == size and name in COLORS:
+                # "light blue" / "dark mode": prefer the table entry over the modifier
+                whole = " ".join(tokens[i:start + size])
+                rgb = COLORS[whole] if whole in COLORS else (_scale(COLORS[name], factor) if factor else COLORS[name])
+                colors.append([rgb, pending_role])
+                pending_role = None
+                i = start + size
+                break
+        else:
+            if token in MODES:
+                mode = token
+            elif token in _ROLES:
+                role = _ROLES[token]
+                # "gold accents" names the previous colour; "accents in gold" the next one
+                if colors and colors[-1][1] is None and tokens[i - 1] not in ("with", "and"):
+                    colors[-1][1] = role
+                else:
+                    pending_role = role
+            elif token not in _STOPWORDS:
+                return None
+            i += 1
+
+    if not colors and not mode:
+        return None
+
+    theme = {key: list(MODES[mode][key] if mode else current_theme.get(key, DEFAULT_THEME[key])) for key in THEME_KEYS}
+    assigned = {}
+    unassigned = []
+    for rgb, role in colors:
+        if role and role not in assigned:
+            assigned[role] = list(rgb)
+        else:
+            unassigned.append(list(rgb))
+    # "navy and gold" / "navy with gold accents": the leading colour is the background;
+    # a lone colour (or colours after a mode) are accents
+    if unassigned and "bg_color" not in assigned and not mode and (len(unassigned) >= 2 or assigned):
+        assigned["bg_color"] = unassigned.pop(0)
+    for role in ("accent_color", "body_color"):
+        if unassigned and role not in assigned:
+            assigned[role] = unassigned.pop(0)
+    theme.update(assigned)
+
+    bg = theme["bg_color"]
+    readable = [240, 240, 240] if _luminance(bg) < 0.35 else [50, 49, 48]
+    if "body_color" not in assigned and ("bg_color" in assigned or mode) and contrast(theme["body_color"], bg) < 4.5:
+        theme["body_color"] = readable
+    if "title_color" not in assigned:
+        if "accent_color" in assigned and contrast(assigned["accent_color"], bg) >= 2.5:
+            theme["title_color"] = list(assigned["accent_color"])
+        elif contrast(theme["title_color"], bg) < 2.5:
+            theme["title_color"] = list(theme["body_color"])
+    if "accent_color" not in assigned and "title_color" in assigned:
+        theme["accent_color"] = list(assigned["title_color"])
+    return theme
+
+
+def parse_llm_theme(content):
+    """Extract the RGB theme JSON object from a Gemini response."""
+    if "```json" in content:
+        content = content.split("```json")[1].split("```")[0]
+    elif "```" in content:
+        content = content.split("```")[1].split("```")[0]
+    return json.loads(content.strip())
+
+
+def validate_theme(theme):
+    """Check a theme has the four keys as RGB triples; returns a clean copy with ints clamped to 0-255."""
+    if not isinstance(theme, dict):
+        raise ThemeError("Theme is not a JSON object")
+    clean = {}
+    for key in THEME_KEYS:
+        value = theme.get(key)
+        if not isinstance(value, (list, tuple)) or len(value) != 3:
+            raise ThemeError(f"Theme is missing an RGB value for {key}")
+        try:
+            clean[key] = [max(0, min(255, int(round(float(c))))) for c in value]
+        except (TypeError, ValueError):
+            raise ThemeError(f"Invalid RGB value for {key}: {value}")
+    return clean
+
+
+def _llm_theme(suggestion, current_theme):
+    from llm import generate_text
+
+    prompt = f"""
+    Current PPT Theme (RGB):
+    {json.dumps(current_theme)}
+
+    User Suggestion: "{suggestion}"
+
+    Translate this suggestion into a new RGB theme.
+    Return strictly a JSON object with these keys:
+    - bg_color: [R, G, B]
+    - title_color: [R, G, B]
+    - body_color: [R, G, B]
+    - accent_color: [R, G, B]
+    """
+    try:
+        theme = generate_text(prompt, parse=parse_llm_theme)
+    except Exception as e:
+        raise ThemeError(f"Gemini could not translate the suggestion: {e}") from e
+    return validate_theme(theme)
+
+
+class ThemeResolver:
+    """Local resolver with an LLM fallback and an LRU of resolved themes."""
+
+    def __init__(self, max_entries=DEFAULT_THEME_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.local = 0
+        self.llm = 0
+        self.llm_failures = 0
+
+    def resolve(self, suggestion, current_theme):
+        """
+        Theme for a suggestion, applied on top of the current theme.
+
+        Raises:
+            ThemeError: The suggestion needed Gemini and it failed or returned an invalid theme
+        """
+        key = (" ".join(_tokens(suggestion)), json.dumps(current_theme, sort_keys=True))
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return {k: list(v) for k, v in self._cache[key].items()}
+
+        with span("theme.resolve") as s:
+            theme = parse_suggestion(suggestion, current_theme)
+            if theme is not None:
+                s.set(source="local")
+                with self._lock:
+                    self.local += 1
+            else:
+                s.set(source="llm")
+                try:
+                    theme = _llm_theme(suggestion, current_theme)
+                except ThemeError:
+                    with self._lock:
+                        self.llm_failures += 1
+                    raise
+                with self._lock:
+                    self.llm += 1
+
+        with self._lock:
+            self._cache[key] = theme
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return {k: list(v) for k, v in theme.items()}
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.local + self.llm + self.llm_failures
+            resolved = self.local + self.llm
+            return {
+                "lookups": lookups,
+                "cache_hits": self.hits,
+                "local": self.local,
+                "llm": self.llm,
+                "llm_failures": self.llm_failures,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "local_rate": self.local / resolved if resolved else 0.0,
+                "entries": len(self._cache),
+            }
+
+
+_resolver = None
+_resolver_lock = threading.Lock()
+
+
+def get_theme_resolver():
+    """Shared ThemeResolver (THEME_CACHE_SIZE entries)."""
+    global _resolver
+    with _resolver_lock:
+        if _resolver is None:
+            _resolver = ThemeResolver(int(os.getenv("THEME_CACHE_SIZE", DEFAULT_THEME_CACHE_SIZE)))
+        return _resolver
+
+
+def resolve_theme(suggestion, current_theme):
+    return get_theme_resolver().resolve(suggestion, current_theme)
+
+
+def theme_stats():
+    return get_theme_resolver().stats()
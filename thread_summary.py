@@ -0,0 +1,200 @@
+"""
+Thread Summary Module
+Map-reduce summaries of long email threads and Teams chats, cached per chunk by content hash.
+
+Messages are cut oldest first into chunks of about SUMMARY_CHUNK_TOKENS. Gemini
+summarizes the chunks in parallel (map), and the summaries are merged
+SUMMARY_FANOUT at a time, level by level, into a single brief (reduce). Every
+summary is cached under a hash of the text it summarizes, so when new messages
+arrive only the last chunk and the merges above it are regenerated. The brief
+stays the same size however long the thread grows.
+
+Threads under SUMMARY_THRESHOLD_TOKENS are not summarized; the context builder
+ranks their messages directly, as before.
+"""
+
+import contextvars
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import get_summary_cache
+from context_builder import estimate_tokens
+from llm import generate_text
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Overridable via SUMMARY_THRESHOLD_TOKENS / SUMMARY_CHUNK_TOKENS / SUMMARY_FANOUT
+DEFAULT_THRESHOLD_TOKENS = 1500
+DEFAULT_CHUNK_TOKENS = 4000
+DEFAULT_FANOUT = 8
+
+# Target length of a chunk summary and of a merged summary (the brief)
+CHUNK_SUMMARY_WORDS = 120
+BRIEF_WORDS = 350
+
+# Bump when the prompts change so cached summaries are not reused
+SUMMARY_VERSION = "1"
+
+MAP_PROMPT = """Summarize these {kind} from a customer's CRM evaluation for a sales proposal.
+Keep the facts a proposal needs: pain points, requirements, budget, timeline, decision makers and objections.
+Write at most {words} words as "- " bullet points and return only the bullets.
+
+{text}
+"""
+
+REDUCE_PROMPT = """Merge these partial summaries of {kind} (oldest first) into one summary for a sales proposal.
+Drop repeated points; where they disagree, the later summary is more recent and wins.
+Write at most {words} words as "- " bullet points and return only the bullets.
+
+{text}
+"""
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="summary")
+
+_stats = {"briefs": 0, "chunks": 0, "generated": 0, "cached": 0}
+_stats_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return int(os.getenv(name, default))
+
+
+def _count(**deltas):
+    with _stats_lock:
+        for key, value in deltas.items():
+            _stats[key] += value
+
+
+def summary_stats():
+    """Counters since startup: briefs built, chunks seen, summaries generated and served from cache."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def email_items(emails):
+    """Emails as text, oldest first (generate_emails lists them newest first)."""
+    return [f"From {e['sender']} ({e['date']}): {e['subject']}\n{e['body']}" for e in reversed(emails or [])]
+
+
+def chat_items(chats):
+    """Teams messages as lines, in conversation order."""
+    return [f"{m['sender']} ({m['timestamp']}): {m['content']}" for chat in chats or [] for m in chat["messages"]]
+
+
+def chunk_items(items, max_tokens):
+    """
+    Group items, oldest first, into chunks of at most `max_tokens` (estimated).
+
+    An item is never divided across two chunks; an item longer than a whole chunk
+    is truncated to `max_tokens`. Appending items only changes the last chunk,
+    which keeps earlier chunk hashes stable.
+    """
+    chunks, current, used = [], [], 0
+    for item in items:
+        tokens = estimate_tokens(item)
+        if tokens > max_tokens:
+            item = item[:max_tokens * 4]
+            tokens = max_tokens
+        if current and used + tokens > max_tokens:
+            chunks.append("\n\n".join(current))
+            current, used = [], 0
+        current.append(item)
+        used += tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def _summary_key(stage, kind, text):
+    digest = hashlib.sha256()
+    for part in (SUMMARY_VERSION, stage, kind, text):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _summarize(stage, kind, text):
+    """One cached map or reduce step; returns (summary, served from cache)."""
+    cache = get_summary_cache()
+    key = _summary_key(stage, kind, text)
+    summary = cache.get(key)
+    if summary is not None:
+        return summary, True
+
+    if stage == "map":
+        prompt = MAP_PROMPT.format(kind=kind, words=CHUNK_SUMMARY_WORDS, text=text)
+    else:
+        prompt = REDUCE_PROMPT.format(kind=kind, words=BRIEF_WORDS, text=text)
+    summary = generate_text(prompt).strip()
+    cache.set(key, summary)
+    return summary, False
+
+
+def _parallel(stage, kind, texts):
+    # Carry the current tracing span into the worker threads
+    futures = [
+        _EXECUTOR.submit(contextvars.copy_context().run, _summarize, stage, kind, text)
+        for text in texts
+    ]
+    results = [future.result() for future in futures]
+    cached = sum(1 for _, hit in results if hit)
+    _count(cached=cached, generated=len(results) - cached)
+    return [summary for summary, _ in results]
+
+
+def summarize_items(kind, items, chunk_tokens=None, fanout=None):
+    """
+    Map-reduce a thread into one brief.
+
+    Args:
+        kind: What the items are ("emails", "Teams messages"), used in the prompts
+        items: Message texts, oldest first
+        chunk_tokens: Chunk size (defaults to SUMMARY_CHUNK_TOKENS)
+        fanout: Summaries merged per reduce step (defaults to SUMMARY_FANOUT)
+
+    Returns:
+        The brief as "- " bullet points
+    """
+    chunk_tokens = chunk_tokens or _setting("SUMMARY_CHUNK_TOKENS", DEFAULT_CHUNK_TOKENS)
+    fanout = max(2, fanout or _setting("SUMMARY_FANOUT", DEFAULT_FANOUT))
+
+    with span("summary.build", kind=kind, items=len(items)) as s:
+        chunks = chunk_items(items, chunk_tokens)
+        level = _parallel("map", kind, chunks)
+        depth = 0
+        while len(level) > 1:
+            # Groups start from the oldest summary, so new chunks only touch the last group
+            groups = [level[i:i + fanout] for i in range(0, len(level), fanout)]
+            merged = iter(_parallel("reduce", kind, ["\n\n".join(group) for group in groups if len(group) > 1]))
+            level = [next(merged) if len(group) > 1 else group[0] for group in groups]
+            depth += 1
+        s.set(chunks=len(chunks), depth=depth)
+    _count(briefs=1, chunks=len(chunks))
+    return level[0] if level else ""
+
+
+def thread_brief(kind, items):
+    """
+    Brief for a thread, or None when it is short enough to use as is.
+
+    Returns:
+        "Summary of N <kind>:" followed by the bullets, or None under SUMMARY_THRESHOLD_TOKENS
+    """
+    total = sum(estimate_tokens(item) for item in items)
+    if total <= _setting("SUMMARY_THRESHOLD_TOKENS", DEFAULT_THRESHOLD_TOKENS):
+        return None
+    brief = summarize_items(kind, items)
+    logger.info(f"Summarized {len(items)} {kind} ({total} tokens) into {estimate_tokens(brief)} tokens")
+    return f"Summary of {len(items)} {kind}:\n{brief}"
+
+
+def email_brief(emails):
+    return thread_brief("emails", email_items(emails))
+
+
+def chat_brief(chats):
+    return thread_brief("Teams messages", chat_items(chats))
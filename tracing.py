@@ -0,0 +1,240 @@
+"""
+Tracing Module
+Lightweight spans around pipeline stages, aggregated into per-stage latency histograms.
+
+Spans nest through a context variable. Finished spans are kept in a bounded
+buffer and can be exported as OpenTelemetry-style JSON records; set
+TRACE_EXPORT_PATH to also append every span to a JSON-lines file that an OTel
+collector (filelog receiver) can ingest.
+"""
+
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in milliseconds (the last bucket is unbounded)
+BUCKET_BOUNDS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+DEFAULT_BUFFER_SIZE = 2000
+
+_current = contextvars.ContextVar("spg_span", default=None)
+
+
+class Span:
+    """A timed operation; use span() or traced() rather than creating one directly."""
+
+    def __init__(self, name, attributes=None, root=False):
+        parent = None if root else _current.get()
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self._parent = parent
+        self.status = "OK"
+        self.error = None
+        self.start_ns = time.time_ns()
+        self._start = time.perf_counter()
+        self.duration = None
+        _current.set(self)
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self, error=None):
+        """Finish the span (idempotent) and restore its parent as the current span."""
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._start
+        if error is not None:
+            self.status = "ERROR"
+            self.error = f"{type(error).__name__}: {error}"
+        if _current.get() is self:
+            _current.set(self._parent)
+        get_tracer().record(self)
+
+    def to_record(self):
+        """OpenTelemetry-style JSON record."""
+        record = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.start_ns + int((self.duration or 0) * 1e9),
+            "attributes": self.attributes,
+            "status": {"code": self.status},
+        }
+        if self.error:
+            record["status"]["message"] = self.error
+        return record
+
+
+class Histogram:
+    """Fixed-bucket latency histogram for one stage."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, ms, error=False):
+        self.counts[bisect_left(BUCKET_BOUNDS_MS, ms)] += 1
+        self.count += 1
+        self.errors += int(error)
+        self.total += ms
+        self.min = ms if self.min is None else min(self.min, ms)
+        self.max = ms if self.max is None else max(self.max, ms)
+
+    def quantile(self, q):
+        """Estimate a quantile as the upper bound of the bucket containing it (capped at the max)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKET_BOUNDS_MS + (None,), self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max) if bound is not None else self.max
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean_ms": self.total / self.count if self.count else 0.0,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "min_ms": self.min or 0.0,
+            "max_ms": self.max or 0.0,
+            "buckets": dict(zip([str(b) for b in BUCKET_BOUNDS_MS] + ["+Inf"], self.counts)),
+        }
+
+
+class Tracer:
+    """Process-wide sink for finished spans."""
+
+    def __init__(self, buffer_size=DEFAULT_BUFFER_SIZE, export_path=None):
+        self._spans = deque(maxlen=buffer_size)
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self.export_path = export_path
+
+    def record(self, span):
+        ms = span.duration * 1000
+        with self._lock:
+            self._spans.append(span)
+            histogram = self._histograms.get(span.name)
+            if histogram is None:
+                histogram = self._histograms[span.name] = Histogram()
+            histogram.observe(ms, error=span.status == "ERROR")
+            if self.export_path:
+                try:
+                    with open(self.export_path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(span.to_record(), default=str) + "\n")
+                except OSError as e:
+                    logger.warning(f"Could not export span to {self.export_path}: {e}")
+                    self.export_path = None
+        logger.debug(f"{span.name} took {ms:.1f}ms")
+
+    def histograms(self):
+        with self._lock:
+            return {name: histogram.summary() for name, histogram in sorted(self._histograms.items())}
+
+    def spans(self):
+        with self._lock:
+            return [span.to_record() for span in self._spans]
+
+    def reset(self):
+        with self._lock:
+            self._spans.clear()
+            self._histograms.clear()
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer():
+    """Shared Tracer configured by TRACE_BUFFER_SIZE (default 2000) and TRACE_EXPORT_PATH."""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer(
+                buffer_size=int(os.getenv("TRACE_BUFFER_SIZE", DEFAULT_BUFFER_SIZE)),
+                export_path=os.getenv("TRACE_EXPORT_PATH") or None,
+            )
+        return _tracer
+
+
+def start_span(name, root=False, **attributes):
+    """Start a span that the caller ends explicitly (for code that cannot use a with-block)."""
+    return Span(name, attributes, root=root)
+
+
+class span:
+    """
+    Context manager timing a block as a child of the current span.
+
+    Usage:
+        with span("tavily.search", query=query) as s:
+            ...
+            s.set(results=len(results))
+    """
+
+    def __init__(self, name, **attributes):
+        self.name = name
+        self.attributes = attributes
+        self._span = None
+
+    def __enter__(self):
+        self._span = Span(self.name, self.attributes)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb):
+        self._span.end(error=exc)
+        return False
+
+
+def traced(name=None):
+    """Decorator wrapping every call of a function in a span (named after the function by default)."""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def histograms():
+    """Per-stage latency summaries (count, errors, mean/p50/p95/min/max in ms, bucket counts)."""
+    return get_tracer().histograms()
+
+
+def export_spans():
+    """Recently finished spans as OpenTelemetry-style records, oldest first."""
+    return get_tracer().spans()
+
+
+def export_json():
+    """JSON document with the recent spans and the per-stage histograms."""
+    return json.dumps({"spans": export_spans(), "histograms": histograms()}, indent=2, default=str)
+
+
+def reset():
+    get_tracer().reset()